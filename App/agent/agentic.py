@@ -1,10 +1,13 @@
 from langchain.agents import initialize_agent, AgentType
 from backroute.health_agents import health_summary, report_diff, doctor_availability_tool
 from langchain_google_genai import ChatGoogleGenerativeAI  
+from gemini import GEMINI_API_ENDPOINT, GEMINI_TRANSPORT
 
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",  # or gemini-1.5-pro
     temperature=0.3,
+    client_options={"api_endpoint": GEMINI_API_ENDPOINT} if GEMINI_API_ENDPOINT else None,
+    transport=GEMINI_TRANSPORT,
 )
 tools = [health_summary, report_diff,doctor_availability_tool]
 health_agent = initialize_agent(
@@ -1,5 +1,5 @@
 from fastapi import APIRouter,Form
-import google.generativeai as genai
+from gemini import safe_gpt
 from fastapi.responses import JSONResponse
 import re
 import logging
@@ -10,46 +10,13 @@ from dotenv import load_dotenv
 import os
 
 from models.umlsclient import search_symptom, get_related_cuis, map_condition_to_specialist,fallback_map_condition_to_specialist
+from backroute.symptomcheck import extract_symptoms
+from utils.clinical_matcher import apply_red_flag_advice
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-API_KEYS = [
-  os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4"),
-    os.getenv("GEMINI_API_KEY5"),
-]
-current_index = 0
-
-def configure_genai():
-    """Set the current API key for genai."""
-    global current_index
-    genai.configure(api_key=API_KEYS[current_index])
-def safe_gpt(prompt: str, role_prompt: str = "You are a rural health advisor. Give safe, simple advice in English only.") -> str:
-    global current_index
-    if not prompt.strip():
-        return "⚠️ Empty prompt given."
-    
-    full_prompt = f"{role_prompt}\nQ: {prompt}"
-    attempts = 0
-
-    while attempts < len(API_KEYS):
-        try:
-            configure_genai()
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content([full_prompt])
-            return response.text.strip()
-        except Exception as e:
-            if "quota exceeded" in str(e).lower() or "limit" in str(e).lower():
-                current_index = (current_index + 1) % len(API_KEYS)
-                attempts += 1
-            else:
-                return f"⚠️ GPT error: {str(e)}"
-    
-    return "⚠️ All API keys have reached their limits."
 
 
 
@@ -59,18 +26,6 @@ def safe_gpt(prompt: str, role_prompt: str = "You are a rural health advisor. Gi
 #     response = model.generate_content([prompt])
 #     return response.text
 
-RED_FLAG_SYMPTOMS = {
-    "chest pain": "⚠️ Chest pain can be serious. Please consult a doctor immediately.",
-    "loss of smell": "👃 Loss of smell might mean a sinus issue or post-viral symptom. Keep monitoring.",
-    "smell": "👃 Smell issues often point to congestion or sinus problems.",
-    "dizziness": "⚠️ Dizziness may be a sign of dehydration or something more serious. Please rest and monitor.",
-    "shortness of breath": "⚠️ Trouble breathing could be a sign of something serious. See a doctor if it continues.",
-    "numbness": "⚠️ Numbness can be a nerve issue. Please get checked if it continues.",
-    "severe headache": "⚠️ Severe headaches that don’t go away might need medical attention.",
-    "vomiting": "⚠️ Persistent vomiting can lead to dehydration. Keep fluids up, and see a doctor if it doesn’t improve."
-}
-
-
 CONVERSATIONAL_WRAPPER_PROMPT = (
     "You are a friendly, non-robotic health assistant. "
     "Rephrase the following response so it sounds like you're talking to a real person. "
@@ -106,18 +61,6 @@ VALID_SPECIALISTS = [
 
 
 
-def extract_symptoms(conversation):
-    keywords = []
-    for msg in conversation:
-        if msg["role"] == "user":
-            keyword = safe_gpt(
-                f"Extract symptom keyword from: {msg['message']}",
-                role_prompt="Give 1-word symptom like 'fever', 'pain', 'cough'. No full sentence."
-            )
-            if keyword and keyword.lower() not in keywords:
-                keywords.append(keyword.lower())
-    return keywords
-
 def extract_next_question(full_convo):
     # Naively extract last assistant question
     lines = full_convo.strip().split("\n")
@@ -132,15 +75,6 @@ def is_duplicate(conversation, message):
     return message.lower().strip() in recent
 
 
-def apply_red_flag_advice(text: str) -> str:
-    lower = text.lower()
-    messages = []
-    for symptom, message in RED_FLAG_SYMPTOMS.items():
-        if re.search(rf'\b{re.escape(symptom)}\b', lower):
-            messages.append(message)
-    return "\n".join(messages)
-
-
 def create_router(doctor_collection: Collection):
     router = APIRouter()
 
@@ -190,7 +124,8 @@ Task:
     if top_condition:
         severity = safe_gpt(
             f"Is '{top_condition}' serious (yes/no)?",
-            role_prompt="Just answer yes or no."
+            role_prompt="Just answer yes or no.",
+            prompt_class="severity"
         ).lower()
         if severity == "yes":
             follow_up = safe_gpt(
@@ -228,7 +163,7 @@ async def follow_up_loop(payload: dict):
     full_convo = "\n".join(
         f"{'User' if m['role']=='user' else 'Assistant'}: {m['message']}" for m in conversation
     )
-    known_symptoms = extract_symptoms(conversation)
+    known_symptoms = await extract_symptoms(conversation)
     last_question = extract_next_question(full_convo)
 
     # Count unhelpful/no-response user messages
@@ -5,7 +5,7 @@ from utils.doctor_available import check_doctor_availability,get_all_specializat
 from datetime import datetime 
 from langchain.tools import tool
 from pymongo.collection import Collection
-import google.generativeai as genai
+from gemini import safe_gpt
 from dateparser import parse
 from dateparser.search import search_dates
 from dotenv import load_dotenv
@@ -17,42 +17,6 @@ appointment_collection=None
 
 load_dotenv()
 
-API_KEYS = [
-    os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4"),
-    os.getenv("GEMINI_API_KEY5"),
-]
-current_index = 0
-
-def configure_genai():
-    """Set the current API key for genai."""
-    global current_index
-    genai.configure(api_key=API_KEYS[current_index])
-
-def safe_gpt(prompt: str, role_prompt: str = "") -> str:
-    global current_index
-    if not prompt.strip():
-        return "⚠️ Empty prompt given."
-    
-    full_prompt = f"{role_prompt}\nQ: {prompt}"
-    attempts = 0
-
-    while attempts < len(API_KEYS):
-        try:
-            configure_genai()
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content([full_prompt])
-            return response.text.strip()
-        except Exception as e:
-            if "quota exceeded" in str(e).lower() or "limit" in str(e).lower():
-                current_index = (current_index + 1) % len(API_KEYS)
-                attempts += 1
-            else:
-                return f"⚠️ GPT error: {str(e)}"
-    
-    return "⚠️ All API keys have reached their limits."
 
 role_prompt = """
 You are a compassionate and knowledgeable doctor. 
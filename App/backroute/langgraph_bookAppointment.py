@@ -1,20 +1,26 @@
 from langgraph.graph import StateGraph
 from typing import TypedDict
 from datetime import datetime
-from utils.doctor_available import get_all_specializations,extract_doctor_name
+from bson import ObjectId
+from utils.doctor_available import get_all_specializations,extract_doctor_name,resolve_doctor
+from utils.doctor_names import TITLE_RE
+from utils.slot_reservations import SlotTaken, claim_slot, release_slot
 
 
 doctor_collection=None
 appointment_collection=None
+slot_collection=None
 
-def init_collect(doc_col,appoint_col):
-    global doctor_collection,appointment_collection
+def init_collect(doc_col,appoint_col,slot_col):
+    global doctor_collection,appointment_collection,slot_collection
     doctor_collection=doc_col
     appointment_collection=appoint_col
+    slot_collection=slot_col
 
 class BookingState(TypedDict):
     user_input:str
     doctor_name:str
+    doctor_id:str
     date:str
     time:str
     phone:str
@@ -47,6 +53,29 @@ def parse_doctor_and_specialization(state: BookingState) -> BookingState:
 
     return state
 
+def _titled(name: str) -> str:
+    return name if TITLE_RE.match(name.strip()) else f"Dr. {name}"
+
+def resolve_doctor_node(state: BookingState) -> BookingState:
+    if state.get("error") or not state.get("doctor_name"):
+        return state
+    if state.get("doctor_id"):
+        # The doctor the user was shown when asked to confirm.
+        doctor=doctor_collection.find_one({"_id":ObjectId(state["doctor_id"])}) if ObjectId.is_valid(state["doctor_id"]) else None
+        exact=True
+    else:
+        doctor,exact=resolve_doctor(state["doctor_name"], state.get("specialization"), doctor_collection)
+    if not doctor:
+        state["error"] = f"Doctor '{state['doctor_name']}' not found."
+        return state
+    state["doctor_id"]=str(doctor["_id"])
+    state["doctor_name"]=doctor.get("name", state["doctor_name"])
+    print("🔍 Resolved doctor:", state["doctor_name"], "(exact)" if exact else "(guessed)")
+    if state.get("confirmed") and not exact:
+        # They confirmed the name they typed, not the doctor it was matched to.
+        state["confirmed"]=None
+    return state
+
 def ask_confirmation(state: BookingState) -> BookingState:
     if state.get("confirmed"):
         return state
@@ -54,12 +83,14 @@ def ask_confirmation(state: BookingState) -> BookingState:
         state["response"] = "❌ Appointment cancelled."
         state["error"] = "User cancelled."
         return state
-    state["response"]=(f"📌 Confirm appointment with Dr. {state['doctor_name']} on "
+    state["response"]=(f"📌 Confirm appointment with {_titled(state['doctor_name'])} on "
                        f"{state['date']} at {state['time']} in {state['city']}? (yes/no)")
     return state
 
 
 def check_slot_availability(state: BookingState) -> BookingState:
+    if state.get("error"):
+        return state
     if not state["doctor_name"]:
         state["error"]= "Missing doctor name."
         return state
@@ -79,18 +110,17 @@ def check_slot_availability(state: BookingState) -> BookingState:
 def confirm_booking_node(state: BookingState) -> BookingState:
     if state.get("error"):
         return state
-    doctor_query={"name":{"$regex":state["doctor_name"],"$options":"i"}}
-    if state["specialization"]:
-        doctor_query["specialization"]={"$regex":state["specialization"],"$options":"i"}
-
-    doctor=doctor_collection.find_one(doctor_query)
-    print("🔍 Doctor Query:", doctor_query)
-    
+    # resolve_doctor_node picked this doctor, and the user confirmed it unless
+    # the name they typed matched it exactly.
+    doctor=doctor_collection.find_one({"_id":ObjectId(state["doctor_id"])})
     if not doctor:
         state["error"] = f"Doctor '{state['doctor_name']}' not found."
         return state
     
-    appointment_collection.insert_one({
+    # The find_one in check_slot_availability is only an early answer; this
+    # atomic claim is what stops two users getting the same slot.
+    appointment = {
+        "_id": ObjectId(),
         "user_name": state["user_name"],
          "phone": state["phone"],
          "age":state["age"],
@@ -102,9 +132,19 @@ def confirm_booking_node(state: BookingState) -> BookingState:
          "date":state["date"],
          "time":state["time"],
          "created_at": datetime.now().isoformat()
-    })
+    }
+    try:
+        claim_slot(slot_collection, appointment["_id"], appointment["contact"], state["doctor_name"], state["date"], state["time"])
+    except SlotTaken:
+        state["error"] = f"❌ Slot already booked with {state['doctor_name']} on {state['date']} at {state['time']}."
+        return state
+    try:
+        appointment_collection.insert_one(appointment)
+    except Exception:
+        release_slot(slot_collection, appointment)
+        raise
     state["confirmed"]=True
-    state["response"] = f"✅ Appointment booked with Dr. {state['doctor_name']} on {state['date']} at {state['time']}."
+    state["response"] = f"✅ Appointment booked with {_titled(state['doctor_name'])} on {state['date']} at {state['time']}."
     return state
 
 def check_missing_info(state: BookingState) -> str:
@@ -116,6 +156,7 @@ graph = StateGraph(BookingState)
 
 
 graph.add_node("parse_doctor", parse_doctor_and_specialization)
+graph.add_node("resolve_doctor", resolve_doctor_node)
 graph.add_node("check_slot", check_slot_availability)
 graph.add_node("confirm", confirm_booking_node)
 
@@ -124,7 +165,8 @@ graph.add_node("ask_confirmation", ask_confirmation)
 
 graph.set_entry_point("parse_doctor")
 
-graph.add_edge("parse_doctor", "check_slot")
+graph.add_edge("parse_doctor", "resolve_doctor")
+graph.add_edge("resolve_doctor", "check_slot")
 
 graph.add_conditional_edges(
     "check_slot",  # Name of the node
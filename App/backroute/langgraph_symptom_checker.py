@@ -1,6 +1,6 @@
 from langgraph.graph import StateGraph, END
 from typing import TypedDict
-import google.generativeai as genai
+from gemini import safe_gpt
 import re
 from fastapi import APIRouter, Form
 from models.umlsclient import (
@@ -8,47 +8,13 @@ from models.umlsclient import (
     map_condition_to_specialist,
     fallback_map_condition_to_specialist
 )
+from utils.clinical_matcher import red_flag_matcher
+from utils.keyword_extractor import match_keyword
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-API_KEYS = [
-  os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4"),
-    os.getenv("GEMINI_API_KEY5"),
-]
-current_index = 0
-
-def configure_genai():
-    """Set the current API key for genai."""
-    global current_index
-    genai.configure(api_key=API_KEYS[current_index])
-
-def safe_gpt(prompt: str, role_prompt: str = "You are a rural health advisor. Give safe, simple advice in English only.") -> str:
-    global current_index
-    if not prompt.strip():
-        return "⚠️ Empty prompt given."
-    
-    full_prompt = f"{role_prompt}\nQ: {prompt}"
-    attempts = 0
-
-    while attempts < len(API_KEYS):
-        try:
-            configure_genai()
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content([full_prompt])
-            return response.text.strip()
-        except Exception as e:
-            if "quota exceeded" in str(e).lower() or "limit" in str(e).lower():
-                current_index = (current_index + 1) % len(API_KEYS)
-                attempts += 1
-            else:
-                return f"⚠️ GPT error: {str(e)}"
-    
-    return "⚠️ All API keys have reached their limits."
 
 
 # def safe_gpt(question: str, role_prompt: str = "You are a rural health advisor. Give safe, simple advice in English only.") -> str:
@@ -66,17 +32,6 @@ def safe_gpt(prompt: str, role_prompt: str = "You are a rural health advisor. Gi
 #     except Exception as e:
 #         return f"⚠️ GPT error: {str(e)}"
     
-RED_FLAG_SYMPTOMS = {
-    "chest pain": "⚠️ Chest pain can be serious. Please consult a doctor immediately.",
-    "loss of smell": "👃 Loss of smell might mean a sinus issue or post-viral symptom. Keep monitoring.",
-    "smell": "👃 Smell issues often point to congestion or sinus problems.",
-    "dizziness": "⚠️ Dizziness may be a sign of dehydration or something more serious. Please rest and monitor.",
-    "shortness of breath": "⚠️ Trouble breathing could be a sign of something serious. See a doctor if it continues.",
-    "numbness": "⚠️ Numbness can be a nerve issue. Please get checked if it continues.",
-    "severe headache": "⚠️ Severe headaches that don’t go away might need medical attention.",
-    "vomiting": "⚠️ Persistent vomiting can lead to dehydration. Keep fluids up, and see a doctor if it doesn’t improve."
-}
-
 class SymptomState(TypedDict):
     user_input:str
     symptom:str
@@ -89,8 +44,8 @@ class SymptomState(TypedDict):
 
 #__nodes__
 def extract_symptom_node(state: SymptomState) -> SymptomState:
-    state["symptom"]=safe_gpt( f"Extract a clinical keyword from this: {state['user_input']}",
-        role_prompt="Return a short keyword like 'fever', 'pain', 'cough'.").lower()
+    state["symptom"]=(match_keyword(state["user_input"]) or safe_gpt( f"Extract a clinical keyword from this: {state['user_input']}",
+        role_prompt="Return a short keyword like 'fever', 'pain', 'cough'.", prompt_class="keyword")).lower()
     return state
 
 def search_condition_node(state: SymptomState) -> SymptomState:
@@ -107,16 +62,12 @@ def specialist_mapping_node(state: SymptomState) -> SymptomState:
     return state
 
 def red_flag_node(state: SymptomState) -> SymptomState:
-    found=[]
-    for symptom,msg in RED_FLAG_SYMPTOMS.items():
-        if symptom in state["condition_name"].lower():
-            found.append(msg)
-    state["red_flags"]="\n".join(found)
+    state["red_flags"]="\n".join(red_flag_matcher.all(state["condition_name"]))
     return state
 
 def condition_info_node(state: SymptomState) -> SymptomState:
     explanation=safe_gpt(f"Explain '{state['condition_name']}' in 2 lines",
-        role_prompt="Friendly explanation in 2 lines. Avoid medical jargon.")
+        role_prompt="Friendly explanation in 2 lines. Avoid medical jargon.", prompt_class="explain")
     
     state["advice"]=safe_gpt(explanation + f"\nUser is feeling: {state['symptom']}",
                              role_prompt="You are a warm health assistant. Rephrase kindly in under 2 lines. Avoid clinical words.")
@@ -1,68 +1,29 @@
 from fastapi import APIRouter,Form
-import google.generativeai as genai
+from gemini import safe_gpt_async, safe_gpt_streamed
 from fastapi.responses import JSONResponse
 import re
+import asyncio
+import hashlib
+import json
 import logging
+import time
 from pymongo import ASCENDING
-from pymongo.collection import Collection
+from pymongo.asynchronous.collection import AsyncCollection
 
 from dotenv import load_dotenv
 import os
 
 from models.umlsclient import search_symptom, get_related_cuis, map_condition_to_specialist,fallback_map_condition_to_specialist
+from utils.call_graph import CallGraph
+from utils.clinical_matcher import apply_red_flag_advice, red_flag_matcher
+from utils.keyword_extractor import match_keyword
+from utils.llm_cache import LRUTier
+from utils.sse import sse_response
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-API_KEYS = [
-    os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4"),
-    os.getenv("GEMINI_API_KEY5"),
-]
-current_index = 0
-
-def configure_genai():
-    """Set the current API key for genai."""
-    global current_index
-    genai.configure(api_key=API_KEYS[current_index])
-
-def safe_gpt(prompt: str, role_prompt: str = "You are a rural health advisor. Give safe, simple advice in English only.") -> str:
-    global current_index
-    if not prompt.strip():
-        return "⚠️ Empty prompt given."
-    
-    full_prompt = f"{role_prompt}\nQ: {prompt}"
-    attempts = 0
-
-    while attempts < len(API_KEYS):
-        try:
-            configure_genai()
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content([full_prompt])
-            return response.text.strip()
-        except Exception as e:
-            if "quota exceeded" in str(e).lower() or "limit" in str(e).lower():
-                current_index = (current_index + 1) % len(API_KEYS)
-                attempts += 1
-            else:
-                return f"⚠️ GPT error: {str(e)}"
-    
-    return "⚠️ All API keys have reached their limits."
-
-
-RED_FLAG_SYMPTOMS = {
-    "chest pain": "⚠️ Chest pain can be serious. Please consult a doctor immediately.",
-    "loss of smell": "👃 Loss of smell might mean a sinus issue or post-viral symptom. Keep monitoring.",
-    "smell": "👃 Smell issues often point to congestion or sinus problems.",
-    "dizziness": "⚠️ Dizziness may be a sign of dehydration or something more serious. Please rest and monitor.",
-    "shortness of breath": "⚠️ Trouble breathing could be a sign of something serious. See a doctor if it continues.",
-    "numbness": "⚠️ Numbness can be a nerve issue. Please get checked if it continues.",
-    "severe headache": "⚠️ Severe headaches that don’t go away might need medical attention.",
-    "vomiting": "⚠️ Persistent vomiting can lead to dehydration. Keep fluids up, and see a doctor if it doesn’t improve."
-}
 
 
 CONVERSATIONAL_WRAPPER_PROMPT = (
@@ -100,16 +61,84 @@ VALID_SPECIALISTS = [
 
 
 
-def extract_symptoms(conversation):
+# Symptom keyword per user message, keyed by message hash. A conversation is
+# resent in full on every /follow-up turn, so only new messages reach Gemini.
+_keyword_memo = LRUTier(maxsize=4096)
+
+
+def _message_key(message: str) -> str:
+    return hashlib.sha1(message.strip().lower().encode("utf-8")).hexdigest()
+
+
+def _parse_keyword_batch(text: str, expected: int):
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        return None
+    try:
+        keywords = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(keywords, list) or len(keywords) != expected:
+        return None
+    return [k if isinstance(k, str) else "" for k in keywords]
+
+
+async def _extract_keyword(message: str) -> str:
+    return await safe_gpt_async(
+        f"Extract symptom keyword from: {message}",
+        role_prompt="Give 1-word symptom like 'fever', 'pain', 'cough'. No full sentence."
+    )
+
+
+async def _extract_keywords_batch(messages):
+    numbered = "\n".join(f"{i}. {msg}" for i, msg in enumerate(messages, start=1))
+    raw = await safe_gpt_async(
+        f"Extract the symptom keyword from each numbered message:\n{numbered}\n"
+        f"Return a JSON array of exactly {len(messages)} strings in the same order. "
+        "Use \"\" for a message with no symptom.",
+        role_prompt="Give 1-word symptoms like 'fever', 'pain', 'cough'. Output JSON only, no full sentences."
+    )
+    if raw.startswith("⚠️"):
+        # Quota or upstream error: one call per message would only multiply the failures.
+        return [raw] * len(messages)
+    keywords = _parse_keyword_batch(raw, len(messages))
+    if keywords is None:
+        # Malformed batch answer: fall back to one call per new message.
+        keywords = await asyncio.gather(*(_extract_keyword(msg) for msg in messages))
+    return keywords
+
+
+async def extract_symptoms(conversation):
+    user_messages = [msg["message"] for msg in conversation if msg["role"] == "user"]
+    now = time.time()
+    known = {}
+    new_messages = {}
+    for message in user_messages:
+        key = _message_key(message)
+        entry = _keyword_memo.get(key, now)
+        if entry is not None:
+            known[key] = entry[0]
+        elif key not in new_messages:
+            local = match_keyword(message)
+            if local:
+                known[key] = local
+                _keyword_memo.set(key, local, float("inf"))
+            else:
+                new_messages[key] = message
+
+    if new_messages:
+        extracted = await _extract_keywords_batch(list(new_messages.values()))
+        for key, keyword in zip(new_messages, extracted):
+            keyword = keyword.strip().lower()
+            known[key] = keyword
+            if not keyword.startswith("⚠️"):
+                _keyword_memo.set(key, keyword, float("inf"))
+
     keywords = []
-    for msg in conversation:
-        if msg["role"] == "user":
-            keyword = safe_gpt(
-                f"Extract symptom keyword from: {msg['message']}",
-                role_prompt="Give 1-word symptom like 'fever', 'pain', 'cough'. No full sentence."
-            )
-            if keyword and keyword.lower() not in keywords:
-                keywords.append(keyword.lower())
+    for message in user_messages:
+        keyword = known[_message_key(message)]
+        if keyword and not keyword.startswith("⚠️") and keyword not in keywords:
+            keywords.append(keyword)
     return keywords
 
 def extract_next_question(full_convo):
@@ -126,91 +155,118 @@ def is_duplicate(conversation, message):
     return message.lower().strip() in recent
 
 
-def apply_red_flag_advice(text: str) -> str:
-    lower = text.lower()
-    messages = []
-    for symptom, message in RED_FLAG_SYMPTOMS.items():
-        if re.search(rf'\b{re.escape(symptom)}\b', lower):
-            messages.append(message)
-    return "\n".join(messages)
-
-
-def create_router(doctor_collection: Collection):
+def create_router(doctor_collection: AsyncCollection):
     router = APIRouter()
 
     async def get_doctors_by_specialist(specialist: str):
         cursor = doctor_collection.find({"specialist": specialist})
-        return cursor.to_list(length=5)
+        return await cursor.to_list(length=5)
 
-    @router.post("/symptom-check")
-    async def symptom_check(query: str = Form(...)):
+    async def run_symptom_check(query: str, emit=None) -> dict:
         print("query",query)
-        rewritten = safe_gpt(
+        rewritten = match_keyword(query) or await safe_gpt_async(
             f"Extract a clean clinical keyword from this user message: {query}",
-            role_prompt="You're a clinical parser. Return a single-word or short medical phrase like 'cough', 'fever', 'leg pain'. Only output the keyword — no full sentences."
+            role_prompt="You're a clinical parser. Return a single-word or short medical phrase like 'cough', 'fever', 'leg pain'. Only output the keyword — no full sentences.",
+            prompt_class="keyword",
+            hedge=True
         )
         print("Rewritten keyword for UMLS search:", rewritten)
-        res = search_symptom(rewritten)
-        explanation = ""
+        res = await asyncio.to_thread(search_symptom, rewritten)
         specialist = "general physician"
-        follow_up = ""
         final = False
+        graph = CallGraph()
 
         if res and res[0]["name"]:
             top = res[0]["name"]
             specialist = map_condition_to_specialist(top) or fallback_map_condition_to_specialist(top)
 
-            severity = safe_gpt(
-                f"Is '{top}' serious (yes/no)?",
-                role_prompt="You are a medical assistant. Just answer yes or no."
-            ).lower()
-
-            explanation = safe_gpt(
-                f"Explain '{top}' in 2 lines",
-                role_prompt="Friendly explanation in 2 lines. Avoid medical jargon."
-            )
-
-            answer = safe_gpt(
-                explanation + f"\nUser is feeling: {rewritten}",
-                role_prompt=CONVERSATIONAL_WRAPPER_PROMPT
-            )
-
-            red_flag_addon = apply_red_flag_advice(query)
-            if red_flag_addon:
-                answer += "\n" + red_flag_addon
-            
+            async def severity(_):
+                return (await safe_gpt_async(
+                    f"Is '{top}' serious (yes/no)?",
+                    role_prompt="You are a medical assistant. Just answer yes or no.",
+                    prompt_class="severity",
+                    hedge=True
+                )).lower()
+
+            async def explanation(_):
+                return await safe_gpt_async(
+                    f"Explain '{top}' in 2 lines",
+                    role_prompt="Friendly explanation in 2 lines. Avoid medical jargon.",
+                    prompt_class="explain"
+                )
 
-            if severity == "no":
-                remedy = safe_gpt(
+            # Only needed when severity is "no", so it waits for severity rather
+            # than spending quota on a remedy that gets thrown away. It still
+            # overlaps the explanation call.
+            async def remedy(_):
+                return await safe_gpt_async(
                     f"Suggest 1-line home remedy for '{top}'",
-                    role_prompt="Friendly, warm tone. No complex terms."
+                    role_prompt="Friendly, warm tone. No complex terms.",
+                    prompt_class="remedy"
                 )
-                explanation += f"\n💡 Remedy: {remedy}"
-                answer=safe_gpt(
-                    explanation,
-                    role_prompt=CONVERSATIONAL_WRAPPER_PROMPT
+
+            async def answer(r):
+                if r["severity"] == "no":
+                    remedy_text = await graph.get("remedy")
+                    return await safe_gpt_streamed(
+                        emit,
+                        r["explanation"] + f"\n💡 Remedy: {remedy_text}",
+                        role_prompt=CONVERSATIONAL_WRAPPER_PROMPT,
+                        prompt_class="wrapper"
+                    )
+                text = await safe_gpt_streamed(
+                    emit,
+                    r["explanation"] + f"\nUser is feeling: {rewritten}",
+                    role_prompt=CONVERSATIONAL_WRAPPER_PROMPT,
+                    prompt_class="wrapper"
                 )
-                
-            else:
-                follow_up = safe_gpt(
+                red_flag_addon = apply_red_flag_advice(query)
+                if red_flag_addon:
+                    text += "\n" + red_flag_addon
+                    if emit:
+                        await emit("\n" + red_flag_addon)
+                return text
+
+            async def follow_up(_):
+                return await safe_gpt_async(
                     f"You are a rural doctor. Ask a gentle, non-repeating follow-up for symptom: {rewritten}. Prioritize duration, severity, or triggers.",
                     role_prompt="Polite follow-up question only. 1 line. Avoid repeating previous ones."
                 )
+
+            graph.add("severity", severity)
+            graph.add("explanation", explanation)
+            graph.add("remedy", remedy, deps=("severity",), when=lambda r: r["severity"] == "no")
+            graph.add("answer", answer, deps=("severity", "explanation"))
+            graph.add("follow_up", follow_up, deps=("severity",), when=lambda r: r["severity"] != "no")
         else:
-            explanation = safe_gpt(
-                f"User said: '{query}'. Clarify or ask follow-up.",
-                role_prompt="If unclear, ask 1-line follow-up. If clear, give short advice."
-            )
-            answer = safe_gpt(
-                explanation,
-                role_prompt=CONVERSATIONAL_WRAPPER_PROMPT
-            )
-            follow_up = safe_gpt(
-                f"Ask a soft, helpful follow-up for: {rewritten}",
-                role_prompt="1 short follow-up question. No jargon."
-            )
+            async def explanation(_):
+                return await safe_gpt_async(
+                    f"User said: '{query}'. Clarify or ask follow-up.",
+                    role_prompt="If unclear, ask 1-line follow-up. If clear, give short advice."
+                )
+
+            async def answer(r):
+                return await safe_gpt_streamed(
+                    emit,
+                    r["explanation"],
+                    role_prompt=CONVERSATIONAL_WRAPPER_PROMPT
+                )
+
+            async def follow_up(_):
+                return await safe_gpt_async(
+                    f"Ask a soft, helpful follow-up for: {rewritten}",
+                    role_prompt="1 short follow-up question. No jargon."
+                )
+
+            graph.add("explanation", explanation)
+            graph.add("answer", answer, deps=("explanation",))
+            graph.add("follow_up", follow_up)
             specialist = fallback_map_condition_to_specialist(query)
 
+        results = await graph.run()
+        answer = results["answer"]
+        follow_up = results["follow_up"] or ""
+
         if not follow_up:
             follow_up = "Can you tell me how long this has been happening?"
 
@@ -221,8 +277,15 @@ def create_router(doctor_collection: Collection):
             "specialist": specialist
         }
 
-    @router.post("/follow-up")
-    async def follow_up_loop(payload: dict):
+    @router.post("/symptom-check")
+    async def symptom_check(query: str = Form(...)):
+        return await run_symptom_check(query)
+
+    @router.post("/symptom-check/stream")
+    async def symptom_check_stream(query: str = Form(...)):
+        return sse_response(lambda emit: run_symptom_check(query, emit))
+
+    async def run_follow_up(payload: dict, emit=None) -> dict:
         conversation = payload["conversation"]
         symptom_question_count = payload.get("count", 1)
         emergency_asked = payload.get("emergency_asked", False)
@@ -237,7 +300,6 @@ def create_router(doctor_collection: Collection):
             for msg in conversation
         )
 
-        known_symptoms = extract_symptoms(conversation)
         last_question = extract_next_question(full)
         latest_input = conversation[-1]["message"].strip().lower()
 
@@ -246,43 +308,51 @@ def create_router(doctor_collection: Collection):
         answer = ""
         doctors = []
 
-        answer = safe_gpt(
-        full + "\nGive clear and useful health advice based on the above conversation in 1–2 lines. Do NOT include any questions, bookings, or suggestions like 'see me soon'. Be kind but stay factual.",
-        role_prompt="You're a neutral, responsible doctor. Give concise advice. Do NOT offer to book or meet. Avoid saying things like 'I'll see you soon' or 'I'll book you'. Stay grounded and realistic."
-)
-
-        answer = safe_gpt(answer, role_prompt=CONVERSATIONAL_WRAPPER_PROMPT)
-
-        if is_duplicate(conversation, answer):
-            answer = "Thanks for the update. Be sure to keep resting and staying hydrated — your body needs it."
-
-        specialist = safe_gpt(
-            full + "\nSuggest specialist.",
-            role_prompt="Return only 1 word like 'cardiologist', 'ENT', 'therapist', etc."
-        ).strip().lower()
+        red_flag_note = red_flag_matcher.first(latest_input, "")
 
-        if specialist not in [
-            "cardiologist", "dermatologist", "neurologist", "orthopedist", "pulmonologist",
-            "endocrinologist", "therapist", "general physician", "ent"
-        ]:
-            specialist = fallback_map_condition_to_specialist(full)
+        async def say(text: str):
+            if emit:
+                await emit(text)
 
-        
-        red_flag_note = ""
-        for symptom, note in RED_FLAG_SYMPTOMS.items():
-            if symptom in latest_input:
-               red_flag_note = note
-               break
+        async def advice():
+            text = await safe_gpt_async(
+                full + "\nGive clear and useful health advice based on the above conversation in 1–2 lines. Do NOT include any questions, bookings, or suggestions like 'see me soon'. Be kind but stay factual.",
+                role_prompt="You're a neutral, responsible doctor. Give concise advice. Do NOT offer to book or meet. Avoid saying things like 'I'll see you soon' or 'I'll book you'. Stay grounded and realistic."
+            )
+            text = await safe_gpt_streamed(emit, text, role_prompt=CONVERSATIONAL_WRAPPER_PROMPT)
+            if is_duplicate(conversation, text):
+                text = "Thanks for the update. Be sure to keep resting and staying hydrated — your body needs it."
+            if red_flag_note:
+                text += "\n" + red_flag_note
+                await say("\n" + red_flag_note)
+            return text
+
+        async def suggest_specialist():
+            specialist = (await safe_gpt_async(
+                full + "\nSuggest specialist.",
+                role_prompt="Return only 1 word like 'cardiologist', 'ENT', 'therapist', etc."
+            )).strip().lower()
+            if specialist not in [
+                "cardiologist", "dermatologist", "neurologist", "orthopedist", "pulmonologist",
+                "endocrinologist", "therapist", "general physician", "ent"
+            ]:
+                specialist = fallback_map_condition_to_specialist(full)
+            return specialist
+
+        # Each branch below only generates the answer it actually returns, so
+        # the streamed tokens always belong to the final answer and no call is
+        # spent on text that gets replaced. The specialist lookup runs
+        # alongside it.
         if red_flag_note:
-            answer += "\n" + red_flag_note
-            
             if (  emergency_asked and latest_input in ["yes", "yeah", "ok", "okay", "sure", "please", "yess"]):
-                summary = safe_gpt(
-                    full +  "\nSummarize the issue urgently in 2 lines:",
-                    role_prompt="You are a doctor responding to a possible emergency. Summarize the key issue briefly and explain what should be done immediately. Do NOT suggest waiting. Be clear, kind, and take the issue seriously."
+                answer, specialist = await asyncio.gather(
+                    safe_gpt_streamed(
+                        emit,
+                        full +  "\nSummarize the issue urgently in 2 lines:",
+                        role_prompt="You are a doctor responding to a possible emergency. Summarize the key issue briefly and explain what should be done immediately. Do NOT suggest waiting. Be clear, kind, and take the issue seriously."
+                    ),
+                    suggest_specialist()
                 )
-                
-                answer =summary
                 final = True
 
                 doctors = await get_doctors_by_specialist(specialist)
@@ -295,14 +365,17 @@ def create_router(doctor_collection: Collection):
                      "emergency_asked": False
                 }
             elif emergency_asked and latest_input in ["no", "nah", "not now"]:
+                answer = "Okay, no pressure. But if symptoms get worse, please seek medical help."
+                await say(answer)
                 return {
-                 "answer": "Okay, no pressure. But if symptoms get worse, please seek medical help.",
+                 "answer": answer,
                  "follow_up_question": None,
                   "final": True,
-                 "specialist": specialist,
+                 "specialist": await suggest_specialist(),
                  "emergency_asked": False
           }
             elif not emergency_asked:
+                answer, specialist = await asyncio.gather(advice(), suggest_specialist())
                 follow_up = "Is it urgent? Can I suggest a doctor now?"
                 emergency_asked = True
                 return {
@@ -315,18 +388,25 @@ def create_router(doctor_collection: Collection):
 
         if no_response_count >= 2 or symptom_question_count >= 3:
             if "remedy" in latest_input or "home remedy" in latest_input:
-                answer = safe_gpt(
-                    full + "\nGive 1 best home remedy for the symptoms above.",
-                    role_prompt="You're a caring doctor. Suggest only 1 simple home remedy clearly."
+                answer, specialist = await asyncio.gather(
+                    safe_gpt_streamed(
+                        emit,
+                        full + "\nGive 1 best home remedy for the symptoms above.",
+                        role_prompt="You're a caring doctor. Suggest only 1 simple home remedy clearly."
+                    ),
+                    suggest_specialist()
                 )
                 final = True
             elif "doctor" in latest_input or "specialist" in latest_input:
+                specialist = await suggest_specialist()
                 doctors = await get_doctors_by_specialist(specialist)
                 answer = f"Here are some {specialist.title()}s near you:\n" + "\n".join(
                     [f"- Dr. {doc['name']} ({doc['location']})" for doc in doctors]
                 )
+                await say(answer)
                 final = True
             else:
+                answer, specialist = await asyncio.gather(advice(), suggest_specialist())
                 follow_up = "Would you like a specialist or a home remedy suggestion?"
 
             if answer.strip() == "":
@@ -338,6 +418,7 @@ def create_router(doctor_collection: Collection):
                     final = True
                 else:
                     answer = "Thanks for sharing. Let me know if you'd like to talk to a doctor or get a remedy."
+                await say(answer)
 
             if not follow_up and not final:
                 follow_up = "Is there anything else you'd like to tell me about how you're feeling?"
@@ -350,9 +431,11 @@ def create_router(doctor_collection: Collection):
                 "doctors": doctors
             }
 
-        if not follow_up and not final:
-            if symptom_question_count < 4:
-                follow_up = safe_gpt(
+        async def next_question():
+            if symptom_question_count >= 4:
+                return "Would you like me to suggest a specialist or share a home remedy?"
+            known_symptoms = await extract_symptoms(conversation)
+            return await safe_gpt_async(
                     f"""
 Conversation so far:
 {full}
@@ -369,11 +452,12 @@ Latest user input: "{conversation[-1]['message']}"
 """,
                     role_prompt="You're a kind doctor. Don't repeat. Ask a single, helpful question to get more detail."
                 )
-            else:
-                follow_up = "Would you like me to suggest a specialist or share a home remedy?"
+
+        answer, specialist, follow_up = await asyncio.gather(advice(), suggest_specialist(), next_question())
 
         if not answer:
             answer = "Thanks for sharing. Let me know if you'd like to talk to a doctor or get a remedy."
+            await say(answer)
 
         if not follow_up and not final:
             follow_up = "Is there anything else you'd like to tell me about how you're feeling?"
@@ -385,6 +469,14 @@ Latest user input: "{conversation[-1]['message']}"
             "specialist": specialist
         }
 
+    @router.post("/follow-up")
+    async def follow_up_loop(payload: dict):
+        return await run_follow_up(payload)
+
+    @router.post("/follow-up/stream")
+    async def follow_up_stream(payload: dict):
+        return sse_response(lambda emit: run_follow_up(payload, emit))
+
     return router
 
 
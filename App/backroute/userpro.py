@@ -2,25 +2,27 @@ from fastapi import APIRouter,Form
 from typing import List
 from bson import ObjectId
 from fastapi.responses import JSONResponse
-from pymongo.collection import Collection
+from pymongo.asynchronous.collection import AsyncCollection
+from utils.slot_reservations import release_slot_async
 router = APIRouter()
 
 
 
-def profile_router(appointments_collection: Collection):
+def profile_router(appointments_collection: AsyncCollection, slot_collection: AsyncCollection):
     router = APIRouter()
     @router.get("/get-user-appointments")
     async def get_user_appointments(phone:str):
         phone = str(phone).strip()
-        appointments=list(appointments_collection.find({"phone":phone})) 
+        appointments=await appointments_collection.find({"phone":phone}).to_list()
         for appt in appointments:
             appt["_id"]=str(appt["_id"])
         return {"appointments":appointments}
            
     @router.delete("/cancel-appointment/{appt_id}")
     async def cancel_appointment(appt_id: str):
-        result = appointments_collection.delete_one({"_id": ObjectId(appt_id)})
-        if result.deleted_count == 1:
+        appt = await appointments_collection.find_one_and_delete({"_id": ObjectId(appt_id)})
+        if appt:
+            await release_slot_async(slot_collection, appt)
             return {"message": "Appointment cancelled successfully"}
         return JSONResponse(status_code=404, content={"message": "Appointment not found"})
     
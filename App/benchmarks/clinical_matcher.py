@@ -0,0 +1,109 @@
+"""
+Microbenchmark: keyword matching over long conversations.
+
+Builds synthetic conversations of increasing length and times specialist
+mapping and red-flag detection over the whole transcript three ways: the old
+code (dict walk, `re.search` with a fresh pattern per keyword), one
+overlapping alternation regex per table, and `utils.clinical_matcher`.
+Times are microseconds per call.
+
+    python -m benchmarks.clinical_matcher --turns 10,100,1000
+"""
+import argparse
+import random
+import re
+import timeit
+
+from models.umlsclient import FALLBACK_SPECIALIST_RULES, FALLBACK_SPECIALIST_MATCHER
+from utils.clinical_matcher import RED_FLAG_SYMPTOMS, red_flag_matcher
+
+FILLER = (
+    "i have been feeling this since yesterday and it gets worse at night "
+    "my family says i should rest and drink water but it is not helping"
+).split()
+SYMPTOMS = ["fever", "cough", "chest pain", "dizziness", "rash", "vomiting", "back ache", "blurry eyes"]
+
+
+def conversation(turns: int) -> str:
+    rng = random.Random(turns)
+    lines = []
+    for i in range(turns):
+        words = rng.sample(FILLER, 12)
+        if i % 3 == 0:
+            words.insert(rng.randrange(len(words)), rng.choice(SYMPTOMS))
+        lines.append(("User: " if i % 2 == 0 else "Assistant: ") + " ".join(words))
+    return "\n".join(lines)
+
+
+def old_specialist(text: str) -> str:
+    text = text.lower()
+    for keyword, doctor in FALLBACK_SPECIALIST_RULES.items():
+        if keyword in text:
+            return doctor
+    return "general physician"
+
+
+def old_red_flags(text: str) -> str:
+    lower = text.lower()
+    return "\n".join(
+        message for symptom, message in RED_FLAG_SYMPTOMS.items()
+        if re.search(rf'\b{re.escape(symptom)}\b', lower)
+    )
+
+
+def _alternation(table, whole_words=False):
+    alternation = "|".join(re.escape(key) for key in table)
+    if whole_words:
+        alternation = rf"\b(?:{alternation})"
+    return re.compile(rf"(?=({alternation}))")
+
+
+SPECIALIST_RE = _alternation(FALLBACK_SPECIALIST_RULES)
+RED_FLAG_RE = _alternation(RED_FLAG_SYMPTOMS, whole_words=True)
+SPECIALIST_KEYS = list(FALLBACK_SPECIALIST_RULES)
+RED_FLAG_KEYS = list(RED_FLAG_SYMPTOMS)
+
+
+def regex_specialist(text: str) -> str:
+    found = [SPECIALIST_KEYS.index(m.group(1)) for m in SPECIALIST_RE.finditer(text.lower())]
+    return FALLBACK_SPECIALIST_RULES[SPECIALIST_KEYS[min(found)]] if found else "general physician"
+
+
+def regex_red_flags(text: str) -> str:
+    found = sorted({RED_FLAG_KEYS.index(m.group(1)) for m in RED_FLAG_RE.finditer(text.lower())})
+    return "\n".join(RED_FLAG_SYMPTOMS[RED_FLAG_KEYS[i]] for i in found)
+
+
+def new_specialist(text: str) -> str:
+    return FALLBACK_SPECIALIST_MATCHER.first(text, "general physician")
+
+
+def new_red_flags(text: str) -> str:
+    return "\n".join(red_flag_matcher.all(text))
+
+
+def bench(fn, text: str, number: int) -> float:
+    return min(timeit.repeat(lambda: fn(text), number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="10,100,1000", help="comma separated conversation lengths")
+    parser.add_argument("--number", type=int, default=200, help="calls per timing run")
+    args = parser.parse_args()
+
+    variants = {
+        "specialist": (old_specialist, regex_specialist, new_specialist),
+        "red flags": (old_red_flags, regex_red_flags, new_red_flags),
+    }
+    print(f"{'':<12} {'turns':>6} {'chars':>8} {'old':>10} {'regex':>10} {'matcher':>10}")
+    for turns in (int(t) for t in args.turns.split(",")):
+        text = conversation(turns)
+        for label, fns in variants.items():
+            assert len({fn(text) for fn in fns}) == 1, f"{label} variants disagree"
+            old, regex, new = (bench(fn, text, args.number) for fn in fns)
+            print(f"{label:<12} {turns:>6} {len(text):>8} {old:>10.1f} {regex:>10.1f} {new:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Free-slot computation: one find_one per slot vs. one `$in` query.
+
+Builds 50 doctors x 30 days x 16 slots with a share of them booked and
+computes the free slots both ways. By default the appointments live in an
+in-memory collection that counts round trips. The printed wall times add
+`--rtt-ms` per round trip to the measured CPU time, since the round trips are
+what dominate against a real cluster. With `--mongo` the same data is seeded
+into a scratch database on MONGO_URL and timed for real.
+
+    python -m benchmarks.doctor_availability --rtt-ms 1,20,50
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.doctor_availability --mongo
+"""
+import argparse
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from utils.doctor_available import free_slots
+
+BENCH_DB = "ruralbot_bench"
+
+
+class CountingAppointments:
+    """Just enough of a pymongo collection for both versions, counting round trips."""
+
+    def __init__(self, appointments):
+        self.appointments = appointments
+        self.keys = {(a["doctor_name"], a["date"], a["time"]) for a in appointments}
+        self.round_trips = 0
+
+    def find_one(self, query):
+        self.round_trips += 1
+        key = (query["doctor_name"], query["date"], query["time"])
+        return {"doctor_name": key[0]} if key in self.keys else None
+
+    def find(self, query, projection=None):
+        self.round_trips += 1
+        names, dates = set(query["doctor_name"]["$in"]), set(query["date"]["$in"])
+        return [a for a in self.appointments if a["doctor_name"] in names and a["date"] in dates]
+
+
+def dataset(doctors: int, days: int, slots: int, booked_share: float, seed: int = 3):
+    rng = random.Random(seed)
+    start = date.today()
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    times = [f"{9 + i // 2:02d}:{30 * (i % 2):02d}" for i in range(slots)]
+    docs, appointments = [], []
+    for d in range(doctors):
+        name = f"Dr Bench {d}"
+        docs.append({"name": name, "available_slots": {day: list(times) for day in dates}})
+        for day in dates:
+            for t in times:
+                if rng.random() < booked_share:
+                    appointments.append({"doctor_name": name, "date": day, "time": t})
+    return docs, appointments
+
+
+def per_slot_free_slots(doctors, appointment_collection, target_date, today):
+    """The old loop: one find_one for every (doctor, date, time)."""
+    result = []
+    for doc in doctors:
+        grouped = defaultdict(list)
+        for slot_date, times in doc.get("available_slots", {}).items():
+            if (target_date and slot_date != target_date) or slot_date < today:
+                continue
+            for t in times:
+                if not appointment_collection.find_one({"doctor_name": doc["name"], "date": slot_date, "time": t}):
+                    grouped[slot_date].append(t)
+        result.append((doc, dict(grouped)))
+    return result
+
+
+def timed(fn, docs, collection, today):
+    started = time.perf_counter()
+    result = fn(docs, collection, "", today)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--booked", type=float, default=0.3, help="share of slots already booked")
+    parser.add_argument("--rtt-ms", default="1,20,50", help="round-trip times to project, comma separated")
+    parser.add_argument("--mongo", action="store_true", help="time against a scratch database on MONGO_URL")
+    args = parser.parse_args()
+
+    docs, appointments = dataset(args.doctors, args.days, args.slots, args.booked)
+    today = date.today().isoformat()
+    print(f"{args.doctors} doctors x {args.days} days x {args.slots} slots, {len(appointments)} booked")
+
+    if args.mongo:
+        from pymongo import ASCENDING, MongoClient
+
+        client = MongoClient(os.getenv("MONGO_URL"))
+        coll = client[BENCH_DB]["appointments"]
+        try:
+            coll.drop()
+            coll.insert_many([dict(a) for a in appointments])
+            coll.create_index([("doctor_name", ASCENDING), ("date", ASCENDING), ("time", ASCENDING)])
+            old_time, old = timed(per_slot_free_slots, docs, coll, today)
+            new_time, new = timed(free_slots, docs, coll, today)
+        finally:
+            client.drop_database(BENCH_DB)
+            client.close()
+        assert [g for _, g in old] == [g for _, g in new], "results differ"
+        print(f"per-slot find_one: {old_time * 1000:.0f}ms")
+        print(f"single $in query:  {new_time * 1000:.0f}ms  ({old_time / new_time:.0f}x faster)")
+        return
+
+    old_coll, new_coll = CountingAppointments(appointments), CountingAppointments(appointments)
+    old_time, old = timed(per_slot_free_slots, docs, old_coll, today)
+    new_time, new = timed(free_slots, docs, new_coll, today)
+    assert [g for _, g in old] == [g for _, g in new], "results differ"
+    print(f"{'':<18} {'round trips':>12} {'cpu':>9}" + "".join(f"{f'@{r}ms':>12}" for r in args.rtt_ms.split(",")))
+    for label, trips, cpu in (("per-slot find_one", old_coll.round_trips, old_time),
+                              ("single $in query", new_coll.round_trips, new_time)):
+        projected = "".join(f"{(cpu + trips * float(r) / 1000):>11.2f}s" for r in args.rtt_ms.split(","))
+        print(f"{label:<18} {trips:>12} {cpu * 1000:>7.1f}ms{projected}")
+
+
+if __name__ == "__main__":
+    main()
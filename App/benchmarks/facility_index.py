@@ -0,0 +1,107 @@
+"""
+Nearby-facility search over a synthetic 100k-facility index.
+
+Scatters facilities around random towns in India, builds the R*Tree index
+(models/facility_index.py) in a temp file, then times k-nearest and radius
+queries against a brute-force haversine scan over the same rows. Every
+k-nearest result is checked against the scan.
+
+    python -m benchmarks.facility_index --facilities 100000 --queries 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.load_test import percentile
+from models.facility_index import FacilityIndex, build_index, haversine
+
+KINDS = ["hospital", "clinic", "pharmacy", "doctors"]
+
+
+def synthetic_rows(count: int, towns: int, seed: int = 7):
+    rng = random.Random(seed)
+    centres = [(rng.uniform(8, 35), rng.uniform(68, 97)) for _ in range(towns)]
+    rows = []
+    for i in range(count):
+        lat, lng = rng.choice(centres)
+        # ~3 km spread around each town centre.
+        rows.append((f"Facility {i}", rng.choice(KINDS), "", lat + rng.gauss(0, 0.03), lng + rng.gauss(0, 0.03)))
+    return rows, centres
+
+
+def brute_nearest(rows, lat, lng, k, kind, radius_m):
+    found = []
+    for name, row_kind, _, lat2, lng2 in rows:
+        if row_kind == kind:
+            distance = haversine(lat, lng, lat2, lng2)
+            if distance <= radius_m:
+                found.append((distance, name))
+    found.sort()
+    return [name for _, name in found[:k]]
+
+
+def timed(fn, queries):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(*query))
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies, results
+
+
+def report(label: str, latencies):
+    print(
+        f"{label:<14} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:.3f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.3f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facilities", type=int, default=100000)
+    parser.add_argument("--towns", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--radius", type=float, default=5000, help="metres")
+    parser.add_argument("--brute-queries", type=int, default=50, help="queries also run as a full scan")
+    args = parser.parse_args()
+
+    rows, centres = synthetic_rows(args.facilities, args.towns)
+    rng = random.Random(11)
+    queries = []
+    for _ in range(args.queries):
+        lat, lng = rng.choice(centres)
+        queries.append((lat + rng.gauss(0, 0.02), lng + rng.gauss(0, 0.02), rng.choice(KINDS)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "facilities.db")
+        started = time.perf_counter()
+        build_index(rows, db_path)
+        print(f"built {len(rows)} facilities in {time.perf_counter() - started:.2f}s "
+              f"({os.path.getsize(db_path) / 1e6:.1f} MB)")
+        index = FacilityIndex(db_path)
+
+        knn, knn_results = timed(
+            lambda lat, lng, kind: [f["name"] for f in index.nearest(lat, lng, args.k, kind, args.radius)], queries
+        )
+        radius, _ = timed(lambda lat, lng, kind: index.within(lat, lng, args.radius, kind), queries)
+        sample = queries[:args.brute_queries]
+        brute, brute_results = timed(
+            lambda lat, lng, kind: brute_nearest(rows, lat, lng, args.k, kind, args.radius), sample
+        )
+        index.conn.close()
+
+    mismatches = sum(a != b for a, b in zip(knn_results, brute_results))
+    report("rtree k-NN", knn)
+    report("rtree radius", radius)
+    report("brute k-NN", brute)
+    print(f"k-NN mismatches vs brute force: {mismatches}/{len(sample)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Load test for the main backend routes.
+
+Drives /symptom-check, /follow-up, /chat-agent, /all_doctors and
+/book-appointment at each concurrency level and prints p50/p95/p99 latency,
+throughput and error counts per route. Run it against a backend wired to
+benchmarks/stand_in.py (see its docstring) and a throwaway Mongo database,
+since /book-appointment writes real appointments.
+
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --concurrency 1,8,32 --requests 200
+
+Save a run with `--out results.json` and compare a later one with
+`--baseline results.json`; the exit code is 1 when any route's p95 got worse
+by more than `--max-regression` (default 20%), so it can gate a deploy.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+import httpx
+
+QUERIES = [
+    "I have fever since two days",
+    "my head hurts since morning",
+    "I have a dry cough and sore throat",
+    "pain in my lower back",
+    "I feel dizzy when I stand up",
+    "I have itchy rash on my arm",
+]
+SPECIALIZATIONS = ["all", "general physician", "neurologist", "dermatologist", "cardiologist"]
+CITIES = ["all", "delhi", "mumbai", "lucknow"]
+SLOTS = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 30)]
+
+_booking_seq = itertools.count()
+
+
+def symptom_check():
+    return {"method": "POST", "url": "/symptom-check", "data": {"query": random.choice(QUERIES)}}
+
+
+def follow_up():
+    query = random.choice(QUERIES)
+    return {"method": "POST", "url": "/follow-up", "json": {
+        "conversation": [
+            {"role": "user", "message": query},
+            {"role": "assistant", "message": "How long have you had this?"},
+            {"role": "user", "message": "since yesterday"},
+        ],
+        "count": 1,
+        "user_id": "load-test",
+    }}
+
+
+def chat_agent():
+    return {"method": "POST", "url": "/chat-agent", "json": {
+        "query": random.choice(QUERIES), "phone": "+910000000000",
+    }}
+
+
+def all_doctors():
+    return {"method": "GET", "url": "/all_doctors", "params": {
+        "specialization": random.choice(SPECIALIZATIONS), "city": random.choice(CITIES),
+    }}
+
+
+def book_appointment():
+    # Every request gets its own slot so conflicts don't skew the numbers.
+    n = next(_booking_seq)
+    day, slot = divmod(n, len(SLOTS))
+    return {"method": "POST", "url": "/book-appointment", "json": {
+        "user_name": "Load Test", "phone": "+910000000000", "age": 30, "location": "delhi",
+        "doctor_name": "Load Test Doctor", "specialization": "general physician",
+        "date": f"2099-{day // 28 % 12 + 1:02d}-{day % 28 + 1:02d}", "time": SLOTS[slot],
+        "amount": 0, "contact": "+910000000001",
+    }}
+
+
+SCENARIOS = {
+    "symptom-check": symptom_check,
+    "follow-up": follow_up,
+    "chat-agent": chat_agent,
+    "all_doctors": all_doctors,
+    "book-appointment": book_appointment,
+}
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_level(client, make_request, concurrency: int, total: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                res = await client.request(**make_request())
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def run(args) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for route in args.routes:
+            for concurrency in args.concurrency:
+                stats = await run_level(client, SCENARIOS[route], concurrency, args.requests)
+                results[f"{route}@{concurrency}"] = stats
+                print(
+                    f"{route:<18} c={concurrency:<4} rps={stats['throughput_rps']:<8} "
+                    f"p50={stats['p50_ms']:<8} p95={stats['p95_ms']:<8} p99={stats['p99_ms']:<8} "
+                    f"errors={stats['errors']}/{stats['requests']}"
+                )
+    return results
+
+
+def regressions(results: dict, baseline: dict, max_regression: float):
+    found = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before and before["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            found.append(f"{name}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--routes", default=",".join(SCENARIOS), help="comma separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per route and level")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --out run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+    args.routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    unknown = set(args.routes) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.max_regression)
+        for line in found:
+            print("⚠️ Regression:", line)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Per-worker throughput of sync vs. async MongoDB calls inside async handlers.
+
+Simulates one uvicorn worker: a single event loop runs `--concurrency`
+handlers at a time, each making `--queries` indexed `find_one` calls. The
+"sync" variant calls pymongo's MongoClient from the coroutine, the way the
+routes used to, so every query blocks the loop. The "async" variant uses
+AsyncMongoClient like the routes do now. The gap grows with the round-trip
+time to the cluster.
+
+Seeds and drops a scratch database, so point it at a test cluster:
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.mongo_concurrency --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from pymongo import AsyncMongoClient, MongoClient
+
+from benchmarks.load_test import percentile
+
+BENCH_DB = "ruralbot_bench"
+
+
+def seed(client: MongoClient, docs: int):
+    coll = client[BENCH_DB]["appointments"]
+    coll.drop()
+    coll.insert_many([
+        {"phone": str(i), "doctor_name": f"Dr {i % 50}", "date": "2025-01-01", "time": f"{9 + i % 8}:00"}
+        for i in range(docs)
+    ])
+    coll.create_index("phone")
+
+
+async def run(handler, requests: int, concurrency: int):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            started = time.perf_counter()
+            await handler(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def report(label: str, elapsed: float, latencies):
+    print(
+        f"{label:<6} {len(latencies) / elapsed:>9.1f} req/s  "
+        f"p50={percentile(latencies, 50) * 1000:.1f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.1f}ms"
+    )
+
+
+async def main_async(args):
+    url = os.getenv("MONGO_URL")
+    sync_client = MongoClient(url, maxPoolSize=args.pool_size)
+    async_client = AsyncMongoClient(url, maxPoolSize=args.pool_size)
+    try:
+        seed(sync_client, args.docs)
+        sync_coll = sync_client[BENCH_DB]["appointments"]
+        async_coll = async_client[BENCH_DB]["appointments"]
+
+        async def sync_handler(i):
+            for q in range(args.queries):
+                sync_coll.find_one({"phone": str((i + q) % args.docs)})
+
+        async def async_handler(i):
+            for q in range(args.queries):
+                await async_coll.find_one({"phone": str((i + q) % args.docs)})
+
+        # Warm both pools before timing.
+        await run(sync_handler, args.concurrency, args.concurrency)
+        await run(async_handler, args.concurrency, args.concurrency)
+        sync_elapsed, sync_latencies = await run(sync_handler, args.requests, args.concurrency)
+        async_elapsed, async_latencies = await run(async_handler, args.requests, args.concurrency)
+        report("sync", sync_elapsed, sync_latencies)
+        report("async", async_elapsed, async_latencies)
+        print(f"throughput gain per worker: {sync_elapsed / async_elapsed:.1f}x")
+    finally:
+        sync_client.drop_database(BENCH_DB)
+        sync_client.close()
+        await async_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50, help="handlers in flight at once")
+    parser.add_argument("--queries", type=int, default=3, help="find_one calls per handler")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--pool-size", type=int, default=100)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Concurrency test: hundreds of simultaneous bookings of one slot.
+
+Exactly one booking must win; every other one must get a conflict, and get
+it quickly. Two modes:
+
+    # Against the reservation helpers, in a scratch database
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.slot_booking --bookings 500
+
+    # End to end through POST /book-appointment on a running server
+    python -m benchmarks.slot_booking --api http://127.0.0.1:8000 --bookings 300
+
+Exits 1 if anything other than exactly one booking succeeded.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+import httpx
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+
+from benchmarks.load_test import percentile
+from utils.slot_reservations import SLOT_COLLECTION, SlotTaken, claim_slot_async
+
+BENCH_DB = "ruralbot_bench"
+
+
+async def fire(book, bookings: int):
+    results, latencies = [], []
+    start = asyncio.Event()
+
+    async def one(i):
+        await start.wait()
+        started = time.perf_counter()
+        results.append(await book(i))
+        latencies.append(time.perf_counter() - started)
+
+    tasks = [asyncio.create_task(one(i)) for i in range(bookings)]
+    await asyncio.sleep(0.1)  # let every task reach the barrier
+    start.set()
+    await asyncio.gather(*tasks)
+    return results, sorted(latencies)
+
+
+async def direct(args):
+    client = AsyncMongoClient(os.getenv("MONGO_URL"), maxPoolSize=args.pool_size)
+    reservations = client[BENCH_DB][SLOT_COLLECTION]
+    contact = f"bench-{uuid.uuid4().hex[:8]}"
+    try:
+        await reservations.find_one({})  # connect before the barrier opens
+
+        async def book(i):
+            try:
+                await claim_slot_async(reservations, ObjectId(), contact, "Dr Bench", "2030-01-01", "10:00")
+                return "booked"
+            except SlotTaken:
+                return "conflict"
+            except Exception as e:
+                return type(e).__name__
+
+        return await fire(book, args.bookings)
+    finally:
+        await client.drop_database(BENCH_DB)
+        await client.close()
+
+
+async def api(args):
+    limits = httpx.Limits(max_connections=args.bookings)
+    contact = f"bench-{uuid.uuid4().hex[:8]}"
+    async with httpx.AsyncClient(base_url=args.api, limits=limits, timeout=60) as client:
+
+        async def book(i):
+            try:
+                res = await client.post("/book-appointment", json={
+                    "user_name": f"bench {i}", "phone": f"99{i:08d}", "age": 30, "location": "bench",
+                    "doctor_name": "Dr Bench", "specialization": "general physician",
+                    "date": "2030-01-01", "time": "10:00", "amount": 0, "contact": contact,
+                })
+            except httpx.HTTPError as e:
+                return type(e).__name__
+            return {200: "booked", 409: "conflict"}.get(res.status_code, str(res.status_code))
+
+        results = await fire(book, args.bookings)
+    print(f"(the winning booking is stored with contact {contact}; cancel it from the dashboard)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--api", help="base URL of a running server; default tests the helpers directly")
+    parser.add_argument("--pool-size", type=int, default=100)
+    args = parser.parse_args()
+
+    results, latencies = asyncio.run(api(args) if args.api else direct(args))
+    counts = {outcome: results.count(outcome) for outcome in sorted(set(results))}
+    print(f"outcomes: {counts}")
+    print(
+        f"latency p50={percentile(latencies, 50) * 1000:.1f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.1f}ms"
+    )
+    if counts.get("booked") != 1 or counts.get("conflict", 0) != len(results) - 1:
+        print("⚠️ Expected exactly one booking and conflicts for the rest")
+        sys.exit(1)
+    print("✅ Exactly one booking won")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Local stand-in for the external APIs the backend calls.
+
+Mimics just enough of Gemini (REST), UMLS (UTS auth + REST), LocationIQ and
+the Firebase identity toolkit for every route to run without network access
+or API quota. Each service has its own latency, jitter, error rate and
+quota-exceeded rate, set on the command line or changed while running with
+`POST /_config`. Call counts are at `GET /_stats`.
+
+    python -m benchmarks.stand_in --port 8900 --latency gemini=800 --quota-rate gemini=0.05
+
+then start the backend with
+
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8900 GEMINI_TRANSPORT=rest
+    UMLS_AUTH_URL=http://127.0.0.1:8900/cas/v1/api-key UMLS_API_URL=http://127.0.0.1:8900/rest
+    LOCATIONIQ_BASE_URL=http://127.0.0.1:8900/v1 FIREBASE_AUTH_URL=http://127.0.0.1:8900/identitytoolkit/v1
+
+Firestore itself is not mimicked; use the Firebase emulator
+(FIRESTORE_EMULATOR_HOST) for that.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import defaultdict, deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+SERVICES = ("gemini", "umls", "locationiq", "firebase")
+
+# Per-service behaviour. Latencies are in milliseconds, rates are 0..1.
+config = {
+    "gemini": {"latency_ms": 600, "jitter_ms": 300, "error_rate": 0.0, "quota_rate": 0.0, "key_rpm": 0},
+    "umls": {"latency_ms": 250, "jitter_ms": 100, "error_rate": 0.0, "quota_rate": 0.0},
+    "locationiq": {"latency_ms": 200, "jitter_ms": 80, "error_rate": 0.0, "quota_rate": 0.0},
+    "firebase": {"latency_ms": 150, "jitter_ms": 50, "error_rate": 0.0, "quota_rate": 0.0},
+}
+counters = defaultdict(lambda: defaultdict(int))
+_key_calls = defaultdict(deque)  # Gemini api key -> call timestamps in the last minute
+
+app = FastAPI(title="RuralBot external API stand-in")
+
+
+async def _delay(service: str):
+    cfg = config[service]
+    ms = max(0.0, cfg["latency_ms"] + random.uniform(-cfg["jitter_ms"], cfg["jitter_ms"]))
+    await asyncio.sleep(ms / 1000)
+
+
+def _key_over_rpm(key: str) -> bool:
+    rpm = config["gemini"].get("key_rpm") or 0
+    if not rpm:
+        return False
+    now = time.monotonic()
+    calls = _key_calls[key]
+    while calls and calls[0] <= now - 60:
+        calls.popleft()
+    if len(calls) >= rpm:
+        return True
+    calls.append(now)
+    return False
+
+
+def _failure(service: str, key: str = ""):
+    """Decide whether this call fails: None, "quota" or "error"."""
+    cfg = config[service]
+    roll = random.random()
+    if roll < cfg["quota_rate"] or (service == "gemini" and _key_over_rpm(key)):
+        counters[service]["quota"] += 1
+        return "quota"
+    if roll < cfg["quota_rate"] + cfg["error_rate"]:
+        counters[service]["error"] += 1
+        return "error"
+    counters[service]["ok"] += 1
+    return None
+
+
+# ---------------------------------------------------------------- Gemini
+
+def _gemini_error(kind: str):
+    if kind == "quota":
+        return JSONResponse(status_code=429, content={"error": {
+            "code": 429,
+            "message": "Quota exceeded for quota metric 'Generate Content API requests per minute'.",
+            "status": "RESOURCE_EXHAUSTED",
+        }})
+    return JSONResponse(status_code=503, content={"error": {
+        "code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE",
+    }})
+
+
+def _canned_answer(prompt: str) -> str:
+    """Something each caller can parse: JSON for batch prompts, yes/no for severity, etc."""
+    lowered = prompt.lower()
+    batch = re.search(r"json array of exactly (\d+)", lowered)
+    if batch:
+        return json.dumps(["fever"] * int(batch.group(1)))
+    if "yes/no" in lowered or "answer yes or no" in lowered:
+        return "no"
+    if "keyword" in lowered:
+        return "fever"
+    if "final answer" in lowered:
+        return "Thought: I can answer this directly.\nFinal Answer: Please rest, drink fluids and see a doctor if it gets worse."
+    return (
+        "Rest well, drink plenty of fluids and eat light meals. Take paracetamol for fever if needed. "
+        "If symptoms last more than three days or get worse, please see a doctor."
+    )
+
+
+def _gemini_response(text: str, prompt: str) -> dict:
+    prompt_tokens = max(1, len(prompt) // 4)
+    answer_tokens = max(1, len(text) // 4)
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": answer_tokens,
+            "totalTokenCount": prompt_tokens + answer_tokens,
+        },
+    }
+
+
+def _prompt_text(body: dict) -> str:
+    return "\n".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def gemini_generate(model: str, request: Request):
+    body = await request.json()
+    key = request.headers.get("x-goog-api-key") or request.query_params.get("key", "")
+    await _delay("gemini")
+    failure = _failure("gemini", key)
+    if failure:
+        return _gemini_error(failure)
+    prompt = _prompt_text(body)
+    return _gemini_response(_canned_answer(prompt), prompt)
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def gemini_stream(model: str, request: Request):
+    body = await request.json()
+    key = request.headers.get("x-goog-api-key") or request.query_params.get("key", "")
+    # Time to first chunk is about a third of a full answer.
+    cfg = config["gemini"]
+    await asyncio.sleep(max(0.0, cfg["latency_ms"] / 3000))
+    failure = _failure("gemini", key)
+    if failure:
+        return _gemini_error(failure)
+    prompt = _prompt_text(body)
+    words = _canned_answer(prompt).split(" ")
+    pieces = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+
+    async def chunks():
+        yield "["
+        for i, piece in enumerate(pieces):
+            if i:
+                yield ","
+                await asyncio.sleep(cfg["latency_ms"] / 1000 * 2 / 3 / len(pieces))
+            yield json.dumps(_gemini_response(piece, prompt))
+        yield "]"
+
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+# ---------------------------------------------------------------- UMLS
+
+CONDITIONS = {
+    "fever": ("C0015967", "Fever"),
+    "cough": ("C0010200", "Coughing"),
+    "headache": ("C0018681", "Headache"),
+    "chest pain": ("C0008031", "Chest Pain"),
+    "rash": ("C0015230", "Exanthema"),
+}
+
+
+@app.post("/cas/v1/api-key")
+async def umls_tgt(request: Request):
+    await _delay("umls")
+    if _failure("umls"):
+        return PlainTextResponse("Unauthorized", status_code=401)
+    base = str(request.base_url).rstrip("/")
+    tgt = f"TGT-{uuid.uuid4().hex}-cas"
+    return PlainTextResponse(
+        f'<html><body><form action="{base}/cas/v1/tickets/{tgt}" method="POST"></form></body></html>',
+        status_code=201,
+    )
+
+
+@app.post("/cas/v1/tickets/{tgt}")
+async def umls_st(tgt: str):
+    await _delay("umls")
+    return PlainTextResponse(f"ST-{uuid.uuid4().hex}-cas")
+
+
+@app.get("/rest/search/current")
+async def umls_search(string: str = "", ticket: str = "", pageSize: int = 5):
+    await _delay("umls")
+    failure = _failure("umls")
+    if failure:
+        return JSONResponse(status_code=429 if failure == "quota" else 500, content={"error": failure})
+    cui, name = CONDITIONS.get(string.strip().lower(), ("C0000001", string.strip().title() or "Unknown"))
+    results = [{"ui": cui, "name": name, "rootSource": "MTH"}]
+    results += [{"ui": f"C99{i:05d}", "name": f"{name} variant {i}", "rootSource": "MTH"} for i in range(1, pageSize)]
+    return {"pageSize": pageSize, "pageNumber": 1, "result": {"classType": "searchResults", "results": results}}
+
+
+@app.get("/rest/content/current/CUI/{cui}/relations")
+async def umls_relations(cui: str, ticket: str = ""):
+    await _delay("umls")
+    failure = _failure("umls")
+    if failure:
+        return JSONResponse(status_code=429 if failure == "quota" else 500, content={"error": failure})
+    return {"result": [
+        {"relationLabel": "RO", "relatedIdName": f"Related concept {i}", "relatedId": f"{cui}-{i}"}
+        for i in range(5)
+    ]}
+
+
+# ---------------------------------------------------------------- LocationIQ
+
+def _places(lat: float, lon: float, label: str, count: int = 5):
+    return [
+        {
+            "display_name": f"{label.title()} {i + 1}, Test District",
+            "name": f"{label.title()} {i + 1}",
+            "address": {"road": f"Road {i + 1}"},
+            "lat": str(lat + random.uniform(-0.02, 0.02)),
+            "lon": str(lon + random.uniform(-0.02, 0.02)),
+        }
+        for i in range(count)
+    ]
+
+
+async def _locationiq(make):
+    await _delay("locationiq")
+    failure = _failure("locationiq")
+    if failure == "quota":
+        return JSONResponse(status_code=429, content={"error": "Rate Limited Second"})
+    if failure:
+        return JSONResponse(status_code=500, content={"error": "Internal Server Error"})
+    return make()
+
+
+@app.get("/v1/search")
+@app.get("/v1/search.php")
+async def locationiq_search(q: str = "", limit: int = 5):
+    return await _locationiq(lambda: _places(28.61, 77.21, q or "place", min(limit, 5)))
+
+
+@app.get("/v1/nearby.php")
+async def locationiq_nearby(lat: float = 0.0, lon: float = 0.0, tag: str = "hospital"):
+    return await _locationiq(lambda: _places(lat, lon, tag))
+
+
+# ---------------------------------------------------------------- Firebase identity toolkit
+
+@app.post("/identitytoolkit/v1/accounts:{action}")
+async def firebase_accounts(action: str, request: Request):
+    body = await request.json()
+    await _delay("firebase")
+    failure = _failure("firebase")
+    if failure:
+        message = "TOO_MANY_ATTEMPTS_TRY_LATER" if failure == "quota" else "INTERNAL_ERROR"
+        return JSONResponse(status_code=400, content={"error": {"code": 400, "message": message}})
+    uid = uuid.uuid5(uuid.NAMESPACE_DNS, body.get("email", "anon")).hex[:28]
+    if action == "lookup":
+        return {"users": [{"localId": uid, "email": "user@example.com", "emailVerified": True}]}
+    if action == "sendOobCode":
+        return {"email": "user@example.com"}
+    return {"localId": uid, "email": body.get("email"), "idToken": f"stand-in-token-{uid}", "refreshToken": "r"}
+
+
+# ---------------------------------------------------------------- control
+
+@app.get("/_stats")
+async def get_stats():
+    return {service: dict(counts) for service, counts in counters.items()}
+
+
+@app.post("/_config")
+async def set_config(request: Request):
+    """Merge `{"gemini": {"quota_rate": 0.2}, ...}` into the running config."""
+    for service, values in (await request.json()).items():
+        if service in config:
+            config[service].update(values)
+    counters.clear()
+    return config
+
+
+def _apply(pairs, field: str):
+    # "gemini=800" sets one service, a bare "800" sets all of them.
+    for pair in pairs or []:
+        service, _, value = pair.rpartition("=")
+        for name in ([service] if service else SERVICES):
+            config[name][field] = float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", action="append", help="[service=]milliseconds")
+    parser.add_argument("--jitter", action="append", help="[service=]milliseconds")
+    parser.add_argument("--error-rate", action="append", help="[service=]fraction of 5xx responses")
+    parser.add_argument("--quota-rate", action="append", help="[service=]fraction of quota-exceeded responses")
+    parser.add_argument("--key-rpm", type=float, default=0, help="per-key Gemini requests per minute before 429s")
+    args = parser.parse_args()
+    _apply(args.latency, "latency_ms")
+    _apply(args.jitter, "jitter_ms")
+    _apply(args.error_rate, "error_rate")
+    _apply(args.quota_rate, "quota_rate")
+    config["gemini"]["key_rpm"] = args.key_rpm
+    print("Stand-in config:", json.dumps(config, indent=2))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
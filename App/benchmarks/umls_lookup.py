@@ -0,0 +1,62 @@
+"""
+Local vs. remote UMLS lookup latency.
+
+Looks up each term with the offline index (models/umls_index.py) and with the
+UTS REST API, and prints p50/p95/p99 latency for both plus the local hit rate.
+Point UMLS_AUTH_URL/UMLS_API_URL at benchmarks/stand_in.py to run without a
+UMLS key.
+
+    python -m benchmarks.umls_lookup --db umls_index.db --rounds 5
+"""
+import argparse
+import time
+
+from benchmarks.load_test import percentile
+from models import umlsclient
+from models.umls_index import UMLS_INDEX_DB, UMLSIndex
+
+TERMS = [
+    "fever", "cough", "headache", "chest pain", "back pain", "dizziness", "rash", "itching",
+    "shortness of breath", "vomiting", "diarrhea", "sore throat", "fatigue", "anxiety",
+    "palpitations", "stomach pain", "blurred vision", "joint pain", "insomnia", "common cold",
+]
+
+
+def timed(fn, terms, rounds: int):
+    latencies, hits = [], 0
+    for _ in range(rounds):
+        for term in terms:
+            started = time.perf_counter()
+            if fn(term):
+                hits += 1
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies, hits
+
+
+def report(label: str, latencies, hits: int):
+    print(
+        f"{label:<7} n={len(latencies):<5} hits={hits:<5} "
+        f"p50={percentile(latencies, 50) * 1000:.2f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=UMLS_INDEX_DB)
+    parser.add_argument("--rounds", type=int, default=5, help="passes over the term list")
+    parser.add_argument("--remote-rounds", type=int, default=1, help="passes against UTS (rate limited)")
+    parser.add_argument("--skip-remote", action="store_true")
+    args = parser.parse_args()
+
+    index = UMLSIndex(args.db)
+    report("local", *timed(index.search, TERMS, args.rounds))
+    if not args.skip_remote:
+        # The uncached path, so every lookup really goes to UTS.
+        report("remote", *timed(umlsclient._search_symptom, TERMS, args.remote_rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, auth as admin_auth
-import requests
+from utils import http_client
 
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 firebase_api_key =os.getenv("FIREBASE_API_KEY")
+FIREBASE_AUTH_URL = os.getenv("FIREBASE_AUTH_URL", "https://identitytoolkit.googleapis.com/v1").rstrip("/")
 cred = credentials.Certificate("health-assistant-7fc4e-firebase-adminsdk-fbsvc-cbd7ba0d75.json")
 firebase_admin.initialize_app(cred)
 db = firestore.client()
@@ -14,13 +15,13 @@ db = firestore.client()
 
 
 def signup_user(name, email, password,role, phone_number=None):
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={firebase_api_key}"
+    url = f"{FIREBASE_AUTH_URL}/accounts:signUp?key={firebase_api_key}"
     payload={
         "email":email,
         "password":password,
         "returnSecureToken": True
     }
-    re=requests.post(url,json=payload)
+    re=http_client.post(url,json=payload)
     data=re.json()
     if "error" in data:
         return {"error": data["error"]["message"]}
@@ -44,12 +45,12 @@ def signup_user(name, email, password,role, phone_number=None):
     }
 
 def send_email_verification(id_token):
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:sendOobCode?key={firebase_api_key}"
+    url = f"{FIREBASE_AUTH_URL}/accounts:sendOobCode?key={firebase_api_key}"
     payload = {
         "requestType": "VERIFY_EMAIL",
         "idToken": id_token
     }
-    res = requests.post(url, json=payload)
+    res = http_client.post(url, json=payload)
     data = res.json()
     if "error" in data:
         print("Email verification error:", data["error"]["message"])
@@ -59,23 +60,23 @@ def send_email_verification(id_token):
 
 
 def login_user(email, password):
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={firebase_api_key}"
+    url = f"{FIREBASE_AUTH_URL}/accounts:signInWithPassword?key={firebase_api_key}"
     payload = {
         "email": email,
         "password": password,
         "returnSecureToken": True
     }
-    res = requests.post(url, json=payload)
+    res = http_client.post(url, json=payload, retry=True)
     data = res.json()
     print(data)
     if "error" in data:
         return {"error": data["error"]["message"]}
 
-    info_url = f"https://identitytoolkit.googleapis.com/v1/accounts:lookup?key={firebase_api_key}"
+    info_url = f"{FIREBASE_AUTH_URL}/accounts:lookup?key={firebase_api_key}"
     info_payload = {
         "idToken": data["idToken"]
     }
-    info_res = requests.post(info_url, json=info_payload)
+    info_res = http_client.post(info_url, json=info_payload, retry=True)
     info_data = info_res.json()
 
     if "error" in info_data:
@@ -1,49 +1,627 @@
-import google.generativeai as genai
+"""
+Shared Gemini client used by every route.
+
+All modules go through one key pool so a key that hits its quota in one
+router is skipped everywhere. Each key gets its own token bucket and its own
+cached `GenerativeModel` bound to a per-key client, so we never touch the
+global `genai.configure` state while other requests are in flight.
+
+Use `await safe_gpt_async(...)` from async handlers and `safe_gpt(...)` from
+sync code (LangChain tools, LangGraph nodes). `stream_gpt_async(...)` yields
+the answer chunk by chunk for Server-Sent Events routes. Pass `prompt_class` for prompts
+that are fully determined by their input so the answer is served from
+`utils.llm_cache` on repeat. Identical prompts that are already in flight are
+coalesced into one upstream call.
+
+Every attempt has a timeout and every call a deadline. Keys that return 429s,
+5xx errors or time out are ejected by a per-key circuit breaker for a while,
+and `hedge=True` races a second key for latency-critical prompts.
+
+Every upstream call is recorded in `utils.metrics` with the calling route,
+prompt class, key, latency, token counts and key rotation events.
+"""
+import asyncio
+import logging
 import os
+import threading
+import time
+from collections import deque
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core import exceptions as google_exceptions
 from dotenv import load_dotenv
 
+from utils.llm_cache import response_cache
+from utils.single_flight import SingleFlight
+from utils.metrics import Counter, Histogram, current_route
+
 load_dotenv()
+logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "models/gemini-2.5-flash"
 
 API_KEYS = [
-   os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4"),
-    os.getenv("GEMINI_API_KEY5"),
+    key for key in (os.getenv(f"GEMINI_API_KEY{i}") for i in range(1, 6)) if key
 ]
-current_index = 0
 
-def configure_genai():
-    """Set the current API key for genai."""
-    global current_index
-    genai.configure(api_key=API_KEYS[current_index])
+KEY_RPM = float(os.getenv("GEMINI_KEY_RPM", "10"))  # requests per minute per key
+QUOTA_COOLDOWN = float(os.getenv("GEMINI_QUOTA_COOLDOWN", "60"))  # seconds a key sits out after a quota error
+MAX_KEY_WAIT = float(os.getenv("GEMINI_MAX_KEY_WAIT", "10"))  # longest we queue for a free token
+CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "20"))  # one attempt on one key
+CALL_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "45"))  # whole call, retries and key waits included
+BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "3"))  # 5xx/timeouts in a row before a key is ejected
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))  # seconds an ejected key sits out
+HEDGE_DEFAULT_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "2"))  # used until enough latencies are recorded
+HEDGE_MIN_SAMPLES = 20
+
+# Point these at benchmarks/stand_in.py (e.g. GEMINI_API_ENDPOINT=http://127.0.0.1:8900
+# GEMINI_TRANSPORT=rest) to run without the real API. The REST transport has
+# no async client, so in that mode calls run on the sync client in a thread.
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT") or None
+
+
+class TokenBucket:
+    """Simple token bucket refilled continuously at `rate_per_min`."""
+
+    def __init__(self, rate_per_min: float, capacity: float = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or max(1.0, rate_per_min)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
 
-def safe_gpt(prompt: str, role_prompt: str = "") -> str:
+
+class CircuitBreaker:
+    """
+    Per-key breaker. A quota error opens it straight away for
+    QUOTA_COOLDOWN; 5xx responses and timeouts open it after
+    BREAKER_THRESHOLD in a row. Once the cooldown is over a single probe call
+    is let through: success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def available(self, now: float) -> bool:
+        return self.open_until <= now and not self.probing
+
+    def on_acquire(self):
+        if self.open_until:
+            self.probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def record_failure(self, now: float, cooldown: float = None) -> bool:
+        """Count a failure; True when it (re)opens the breaker."""
+        self.probing = False
+        self.failures += 1
+        if cooldown is None:
+            if self.failures < BREAKER_THRESHOLD:
+                return False
+            cooldown = BREAKER_COOLDOWN
+        self.open_until = now + cooldown
+        return True
+
+
+class KeySlot:
+    def __init__(self, index: int, api_key: str):
+        self.index = index
+        self.api_key = api_key
+        self.bucket = TokenBucket(KEY_RPM)
+        self.breaker = CircuitBreaker()
+        self.models = {}
+
+
+class KeyPool:
     """
-    Call Gemini safely using multiple API keys with rotation if quota exceeded.
+    Process-wide view of the Gemini keys.
+
+    The lock only guards bookkeeping (buckets, cooldowns, model cache), never
+    a network call, so it is safe to share between the worker loop and any
+    sync caller.
+    """
+
+    def __init__(self, api_keys):
+        self.slots = [KeySlot(i, key) for i, key in enumerate(api_keys)]
+        self.lock = threading.Lock()
+        self.cursor = 0
+
+    def acquire(self, skip=()):
+        """
+        Return `(slot, 0)` when a key has a token, `(None, wait)` when the
+        soonest usable key frees up in `wait` seconds, or `(None, None)` when
+        every key is exhausted or already tried.
+        """
+        with self.lock:
+            now = time.monotonic()
+            usable = [
+                s for s in self.slots
+                if s.index not in skip and s.breaker.available(now)
+            ]
+            if not usable:
+                return None, None
+            usable.sort(key=lambda s: (s.index - self.cursor) % len(self.slots))
+            for slot in usable:
+                if slot.bucket.try_take(now):
+                    slot.breaker.on_acquire()
+                    self.cursor = (slot.index + 1) % len(self.slots)
+                    return slot, 0.0
+            return None, min(s.bucket.wait_time(now) for s in usable)
+
+    def record_success(self, slot: KeySlot):
+        with self.lock:
+            slot.breaker.record_success()
+
+    def record_failure(self, slot: KeySlot, outcome: str) -> bool:
+        """Feed a failed call into the key's breaker; True when the key got ejected."""
+        with self.lock:
+            cooldown = QUOTA_COOLDOWN if outcome == "quota" else None
+            opened = slot.breaker.record_failure(time.monotonic(), cooldown)
+        if opened:
+            logger.warning(
+                "Gemini key #%d ejected after %s, cooling down for %.0fs",
+                slot.index + 1, outcome, slot.breaker.open_until - time.monotonic(),
+            )
+        return opened
+
+    def release(self, slot: KeySlot):
+        """The call was cancelled before it said anything about the key."""
+        with self.lock:
+            slot.breaker.probing = False
+
+    def model(self, slot: KeySlot, model_name: str):
+        with self.lock:
+            model = slot.models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                # Bind the model to this key instead of the global genai config.
+                options = {"api_key": slot.api_key}
+                if GEMINI_API_ENDPOINT:
+                    options["api_endpoint"] = GEMINI_API_ENDPOINT
+                model._client = glm.GenerativeServiceClient(client_options=options, transport=GEMINI_TRANSPORT)
+                if GEMINI_TRANSPORT != "rest":
+                    model._async_client = glm.GenerativeServiceAsyncClient(client_options=options)
+                slot.models[model_name] = model
+            return model
+
+
+pool = KeyPool(API_KEYS)
+llm_flight = SingleFlight("llm")
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 1.5, 2, 3, 5, 8, 13, 21)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "Latency of upstream Gemini calls",
+    ["route", "prompt_class", "key", "outcome"], LATENCY_BUCKETS,
+)
+LLM_FIRST_CHUNK = Histogram(
+    "llm_time_to_first_chunk_seconds", "Time until the first streamed chunk arrives",
+    ["route", "prompt_class", "key"], LATENCY_BUCKETS,
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Prompt tokens per Gemini call",
+    ["route", "prompt_class"], (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+LLM_RESPONSE_TOKENS = Histogram(
+    "llm_response_tokens", "Response tokens per Gemini call",
+    ["route", "prompt_class"], (8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+LLM_KEY_EVENTS = Counter(
+    "llm_key_events_total", "Key rotations after quota errors, breaker ejections and waits for a free token",
+    ["key", "event"],
+)
+LLM_TOKEN_WAIT = Counter(
+    "llm_token_wait_seconds_total", "Time spent waiting for a key's token bucket to refill",
+)
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total", "Hedged second requests: sent, won the race, or skipped for lack of a free key",
+    ["result"],
+)
+
+
+def _call_tags(prompt_class: str) -> dict:
+    """Labels for a call, captured in the caller's context before it hops to the worker loop."""
+    return {"route": current_route.get(), "prompt_class": prompt_class or "-"}
+
+
+def _record_call(tags: dict, slot: KeySlot, outcome: str, started: float, usage=None):
+    LLM_LATENCY.observe(time.perf_counter() - started, key=slot.index + 1, outcome=outcome, **tags)
+    if usage is not None:
+        LLM_PROMPT_TOKENS.observe(usage.prompt_token_count, **tags)
+        LLM_RESPONSE_TOKENS.observe(usage.candidates_token_count, **tags)
+
+
+def _record_failure(slot: KeySlot, outcome: str):
+    if outcome == "error":
+        # The key answered; a bad or blocked prompt says nothing about its health.
+        pool.record_success(slot)
+        return
+    if pool.record_failure(slot, outcome):
+        LLM_KEY_EVENTS.inc(key=slot.index + 1, event="ejected")
+    if outcome == "quota":
+        LLM_KEY_EVENTS.inc(key=slot.index + 1, event="rotation")
+
+
+def _is_quota_error(e: Exception) -> bool:
+    # ResourceExhausted over gRPC, plain TooManyRequests (HTTP 429) over REST.
+    # Not message matching: "input token limit exceeded" is a bad request, and
+    # benching the key for it would bench every key in turn.
+    return isinstance(e, google_exceptions.TooManyRequests)
+
+
+def _classify(e: Exception) -> str:
+    """Outcome label for a failed call. Everything but "error" is worth retrying on another key."""
+    if isinstance(e, asyncio.TimeoutError):
+        return "timeout"
+    if _is_quota_error(e):
+        return "quota"
+    if isinstance(e, google_exceptions.ServerError):
+        return "unavailable"
+    return "error"
+
+
+def _error_text(outcome: str, e: Exception) -> str:
+    if outcome == "quota":
+        return "⚠️ All API keys have reached their limits."
+    if outcome == "timeout":
+        return "⚠️ GPT error: Gemini did not answer in time."
+    return f"⚠️ GPT error: {str(e)}"
+
+
+class LatencyWindow:
+    """Recent successful call latencies per model, for picking a hedge delay."""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self.samples = {}
+
+    def add(self, model_name: str, seconds: float):
+        self.samples.setdefault(model_name, deque(maxlen=self.size)).append(seconds)
+
+    def hedge_delay(self, model_name: str) -> float:
+        samples = sorted(self.samples.get(model_name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+latencies = LatencyWindow()  # only touched on the worker loop
+
+
+async def _next_slot(tried, max_wait: float = MAX_KEY_WAIT):
+    """Wait for a key with a free token; None once every key is spent."""
+    waited = 0.0
+    while True:
+        slot, wait = pool.acquire(skip=tried)
+        if slot is not None:
+            return slot
+        if wait is None or waited + wait > max_wait:
+            LLM_KEY_EVENTS.inc(key="-", event="exhausted")
+            return None
+        waited += wait
+        LLM_KEY_EVENTS.inc(key="-", event="throttled")
+        LLM_TOKEN_WAIT.inc(wait)
+        await asyncio.sleep(wait)
+
+
+async def _generate_content(model, full_prompt: str, timeout: float, stream: bool = False):
+    options = {"timeout": timeout}
+    if GEMINI_TRANSPORT == "rest":
+        return await asyncio.to_thread(model.generate_content, [full_prompt], stream=stream, request_options=options)
+    return await model.generate_content_async([full_prompt], stream=stream, request_options=options)
+
+
+async def _chunks(response, timeout: float, deadline: float):
+    """
+    Iterate a streamed response, giving up if the next chunk takes longer than
+    `timeout` or arrives after `deadline` (a `time.monotonic()` value).
+    """
+    def wait():
+        return max(0.0, min(timeout, deadline - time.monotonic()))
+
+    if GEMINI_TRANSPORT != "rest":
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), wait())
+            except StopAsyncIteration:
+                return
+            yield chunk
+    chunks = iter(response)
+    while (chunk := await asyncio.wait_for(asyncio.to_thread(next, chunks, None), wait())) is not None:
+        yield chunk
+
+
+async def _attempt(slot: KeySlot, full_prompt: str, model_name: str, tags: dict, timeout: float):
+    """One call on one key. Returns `(outcome, text)`; the breaker is updated either way."""
+    started = time.perf_counter()
+    try:
+        model = pool.model(slot, model_name)
+        response = await asyncio.wait_for(_generate_content(model, full_prompt, timeout), timeout)
+        text = response.text.strip()
+    except asyncio.CancelledError:
+        # Lost a hedge race: says nothing about the key.
+        pool.release(slot)
+        raise
+    except Exception as e:
+        outcome = _classify(e)
+        _record_call(tags, slot, outcome, started)
+        _record_failure(slot, outcome)
+        return outcome, _error_text(outcome, e)
+    _record_call(tags, slot, "ok", started, getattr(response, "usage_metadata", None))
+    pool.record_success(slot)
+    latencies.add(model_name, time.perf_counter() - started)
+    return "ok", text
+
+
+async def _hedged(slot: KeySlot, full_prompt: str, model_name: str, tags: dict, timeout: float, tried: set):
+    """
+    `_attempt` that fires a second request on another key when the first has
+    not answered within the recent p95 latency, and keeps whichever succeeds
+    first. The hedge only goes out if a key has a token right now, so it never
+    queues behind the rate limit.
+    """
+    first = asyncio.create_task(_attempt(slot, full_prompt, model_name, tags, timeout))
+    second = None
+    try:
+        delay = latencies.hedge_delay(model_name)
+        if delay >= timeout:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        backup, _ = pool.acquire(skip=tried)
+        if backup is None:
+            LLM_HEDGES.inc(result="skipped")
+            return await first
+        tried.add(backup.index)
+        LLM_HEDGES.inc(result="sent")
+        second = asyncio.create_task(_attempt(backup, full_prompt, model_name, tags, timeout - delay))
+
+        pending = {first, second}
+        failed = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcome, text = task.result()
+                if outcome == "ok":
+                    if task is second:
+                        LLM_HEDGES.inc(result="won")
+                    return outcome, text
+                if failed is None or failed[0] != "error":
+                    failed = (outcome, text)
+        return failed
+    finally:
+        # Also when the caller gives up on us: orphaned attempts would keep
+        # spending tokens and feeding the breakers.
+        for task in (first, second):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def _generate(full_prompt: str, model_name: str, tags: dict, hedge: bool = False) -> str:
+    deadline = time.monotonic() + CALL_DEADLINE
+    tried = set()
+    text = "⚠️ All API keys have reached their limits."
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return "⚠️ GPT error: Gemini did not answer in time."
+        slot = await _next_slot(tried, min(MAX_KEY_WAIT, remaining))
+        if slot is None:
+            return text
+        tried.add(slot.index)
+        timeout = min(CALL_TIMEOUT, deadline - time.monotonic())
+        if timeout <= 0:
+            pool.release(slot)
+            return "⚠️ GPT error: Gemini did not answer in time."
+        if hedge and len(pool.slots) > 1:
+            outcome, text = await _hedged(slot, full_prompt, model_name, tags, timeout, tried)
+        else:
+            outcome, text = await _attempt(slot, full_prompt, model_name, tags, timeout)
+        if outcome in ("ok", "error"):
+            return text
+
+
+_STREAM_END = object()
+
+
+async def _stream(full_prompt: str, model_name: str, put, tags: dict):
+    """Push chunks to `put` as they arrive; always finishes with `_STREAM_END`."""
+    deadline = time.monotonic() + CALL_DEADLINE
+    tried = set()
+    try:
+        while True:
+            slot = await _next_slot(tried, max(0.0, min(MAX_KEY_WAIT, deadline - time.monotonic())))
+            if slot is None:
+                put("⚠️ All API keys have reached their limits.")
+                return
+            tried.add(slot.index)
+            timeout = min(CALL_TIMEOUT, deadline - time.monotonic())
+            if timeout <= 0:
+                pool.release(slot)
+                put("⚠️ GPT error: Gemini did not answer in time.")
+                return
+            started = time.perf_counter()
+            first_chunk = True
+            usage = None
+            try:
+                model = pool.model(slot, model_name)
+                response = await asyncio.wait_for(
+                    _generate_content(model, full_prompt, timeout, stream=True), timeout
+                )
+                async for chunk in _chunks(response, CALL_TIMEOUT, deadline):
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.parts:
+                        if first_chunk:
+                            first_chunk = False
+                            LLM_FIRST_CHUNK.observe(time.perf_counter() - started, key=slot.index + 1, **tags)
+                        put(chunk.text)
+            except asyncio.CancelledError:
+                pool.release(slot)
+                raise
+            except Exception as e:
+                outcome = _classify(e)
+                _record_call(tags, slot, outcome, started)
+                _record_failure(slot, outcome)
+                # A key can only be swapped before the user has seen any text.
+                if first_chunk and outcome != "error" and time.monotonic() < deadline:
+                    continue
+                put(_error_text(outcome, e))
+                return
+            _record_call(tags, slot, "ok", started, usage)
+            pool.record_success(slot)
+            return
+    finally:
+        put(_STREAM_END)
+
+
+# All Gemini traffic runs on one private event loop. The async gRPC clients
+# are bound to the loop they were first used on, and sync callers can block
+# on it without nesting inside FastAPI's loop.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-client", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+async def _complete(prompt: str, role_prompt: str, model: str, prompt_class: str, tags: dict, hedge: bool) -> str:
+    if prompt_class:
+        cached = response_cache.get(model, role_prompt, prompt, prompt_class)
+        if cached is not None:
+            return cached
+
+    async def call():
+        text = await _generate(f"{role_prompt}\nQ: {prompt}", model, tags, hedge)
+        if prompt_class and not text.startswith("⚠️"):
+            response_cache.set(model, role_prompt, prompt, prompt_class, text)
+        return text
+
+    return await llm_flight.do(response_cache.make_key(model, role_prompt, prompt), call)
+
+
+async def safe_gpt_async(
+    prompt: str, role_prompt: str = "", model: str = DEFAULT_MODEL, prompt_class: str = None, hedge: bool = False
+) -> str:
+    """
+    Call Gemini using the shared key pool, moving to another key when one
+    hits its quota, fails with a 5xx or times out. Set `hedge=True` for
+    prompts on a latency-critical path to race a second key once the first
+    is slower than the recent p95.
+    """
+    if not prompt.strip():
+        return "⚠️ Empty prompt given."
+    if not pool.slots:
+        return "⚠️ No Gemini API keys configured."
+    coro = _complete(prompt, role_prompt, model, prompt_class, _call_tags(prompt_class), hedge)
+    loop = _worker_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def safe_gpt(
+    prompt: str, role_prompt: str = "", model: str = DEFAULT_MODEL, prompt_class: str = None, hedge: bool = False
+) -> str:
+    """
+    Blocking version of `safe_gpt_async` for sync callers.
     """
-    global current_index
     if not prompt.strip():
         return "⚠️ Empty prompt given."
+    if not pool.slots:
+        return "⚠️ No Gemini API keys configured."
+    coro = _complete(prompt, role_prompt, model, prompt_class, _call_tags(prompt_class), hedge)
+    return asyncio.run_coroutine_threadsafe(coro, _worker_loop()).result()
 
-    full_prompt = f"{role_prompt}\nQ: {prompt}"
-    attempts = 0
-
-    while attempts < len(API_KEYS):
-        try:
-            configure_genai()
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content([full_prompt])
-            return response.text.strip()
-        except Exception as e:
-            if "quota exceeded" in str(e).lower() or "limit" in str(e).lower():
-                current_index = (current_index + 1) % len(API_KEYS)
-                attempts += 1
-            else:
-                return f"⚠️ GPT error: {str(e)}"
-    
-    return "⚠️ All API keys have reached their limits."
+
+async def stream_gpt_async(prompt: str, role_prompt: str = "", model: str = DEFAULT_MODEL, prompt_class: str = None):
+    """
+    Async generator over the answer's text chunks, using Gemini's streaming API.
+
+    A cached answer for `prompt_class` is yielded as a single chunk, and a
+    completed stream is stored in the cache like `safe_gpt_async` would.
+    """
+    if not prompt.strip():
+        yield "⚠️ Empty prompt given."
+        return
+    if not pool.slots:
+        yield "⚠️ No Gemini API keys configured."
+        return
+    if prompt_class:
+        cached = response_cache.get(model, role_prompt, prompt, prompt_class)
+        if cached is not None:
+            yield cached
+            return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def put(item):
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    producer = asyncio.run_coroutine_threadsafe(
+        _stream(f"{role_prompt}\nQ: {prompt}", model, put, _call_tags(prompt_class)), _worker_loop()
+    )
+    parts = []
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            parts.append(item)
+            yield item
+    finally:
+        producer.cancel()
+
+    text = "".join(parts).strip()
+    if prompt_class and text and not text.startswith("⚠️"):
+        response_cache.set(model, role_prompt, prompt, prompt_class, text)
+
+
+async def safe_gpt_streamed(emit, prompt: str, role_prompt: str = "", model: str = DEFAULT_MODEL, prompt_class: str = None) -> str:
+    """
+    `safe_gpt_async` that also forwards chunks to `await emit(chunk)` while
+    they arrive. With `emit=None` it is a plain `safe_gpt_async` call, so a
+    route can share one code path between its JSON and SSE variants.
+    """
+    if emit is None:
+        return await safe_gpt_async(prompt, role_prompt=role_prompt, model=model, prompt_class=prompt_class)
+    parts = []
+    async for chunk in stream_gpt_async(prompt, role_prompt=role_prompt, model=model, prompt_class=prompt_class):
+        parts.append(chunk)
+        await emit(chunk)
+    return "".join(parts).strip()
 
 
 def test_gemini_key():
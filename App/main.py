@@ -1,4 +1,4 @@
-import google.generativeai as genai
+from gemini import safe_gpt, safe_gpt_async
 import sqlite3
 from datetime import datetime 
 import os
@@ -6,13 +6,14 @@ import random
 from bson import ObjectId
 from pydantic import BaseModel
 from fastapi import FastAPI, Form,Query,HTTPException,Request,Body,UploadFile,File
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from twilio.rest import Client
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from langchain_bot import query_health_bot
 from models.location import get_nearby_places
+from models.umlsclient import warm_relation_cache
 from collections import defaultdict
 from typing import Optional,List,Dict
 from backroute.symptomcheck import create_router
@@ -20,64 +21,62 @@ from backroute.userpro import profile_router
 from backroute.health_agents import init_collections
 from agent.agentic import health_agent
 from backroute.langgraph_bookAppointment import book_app_graph,init_collect
+from utils.llm_cache import response_cache
+from utils import single_flight
+from utils import keyword_extractor
+from utils.sse import sse_response
+from utils import metrics
+from utils import http_client
+from utils.db_indexes import ensure_indexes
+from utils.doctor_directory import directory as doctor_directory
+from utils.doctor_names import backfill_norm_fields, norm_fields
+from utils.slot_reservations import (
+    SLOT_COLLECTION, SlotTaken, backfill_reservations, claim_slot_async, is_closed, release_slot_async,
+)
 import json
+import asyncio
+import threading
 load_dotenv()
 
 
 app=FastAPI()
 
-API_KEYS = [
-   os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4"),
-    os.getenv("GEMINI_API_KEY5"),
-]
-current_index = 0
-
-def configure_genai():
-    """Set the current API key for genai."""
-    global current_index
-    genai.configure(api_key=API_KEYS[current_index])
-
-def safe_gpt(prompt: str, role_prompt: str = "") -> str:
-    global current_index
-    if not prompt.strip():
-        return "⚠️ Empty prompt given."
-    
-    full_prompt = f"{role_prompt}\nQ: {prompt}"
-    attempts = 0
-
-    while attempts < len(API_KEYS):
-        try:
-            configure_genai()
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content([full_prompt])
-            return response.text.strip()
-        except Exception as e:
-            if "quota exceeded" in str(e).lower() or "limit" in str(e).lower():
-                current_index = (current_index + 1) % len(API_KEYS)
-                attempts += 1
-            else:
-                return f"⚠️ GPT error: {str(e)}"
-    
-    return "⚠️ All API keys have reached their limits."
 
 
 # MongoDB setup
 mongo_url = os.getenv("MONGO_URL")
-client = MongoClient(mongo_url, tls=True)
+MONGO_POOL = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "5")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+}
+# Sync client for code that runs in worker threads: agent tools, the booking
+# graph, startup jobs and the doctor directory watcher. Routes no longer use
+# it, so it gets its own, much smaller pool instead of a second copy of
+# MONGO_POOL; at most the default thread pool (min(32, cpus + 4) threads)
+# plus a few daemon threads can use it at once.
+MONGO_SYNC_POOL = {
+    **MONGO_POOL,
+    "maxPoolSize": int(os.getenv("MONGO_SYNC_MAX_POOL_SIZE", "10")),
+    "minPoolSize": int(os.getenv("MONGO_SYNC_MIN_POOL_SIZE", "0")),
+}
+client = MongoClient(mongo_url, tls=True, **MONGO_SYNC_POOL)
 print(client.list_database_names())
 db = client["ruralbot"]
-users_collection = db["users"]
-appointments_collection = db["appointments"]
-doctor_collection=db["doctors"]
-report_collection=db["symptom_reports"]
-med_collection=db["report"]
-chat_histroy=db["chat-hi"]
+# Route handlers use the async driver so a slow query never blocks the event loop.
+async_client = AsyncMongoClient(mongo_url, tls=True, **MONGO_POOL)
+adb = async_client["ruralbot"]
+users_collection = adb["users"]
+appointments_collection = adb["appointments"]
+doctor_collection=adb["doctors"]
+report_collection=adb["symptom_reports"]
+med_collection=adb["report"]
+chat_histroy=adb["chat-hi"]
+slot_collection=adb[SLOT_COLLECTION]
 
 init_collections(report_col=db["symptom_reports"],med_col=db["report"],doc_col=db["doctors"],appoint_col=db["appointments"])
-init_collect(doc_col=db["doctors"],appoint_col=db["appointments"])
+init_collect(doc_col=db["doctors"],appoint_col=db["appointments"],slot_col=db[SLOT_COLLECTION])
  
 app.add_middleware(
     CORSMiddleware,
@@ -87,8 +86,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def track_route(request: Request, call_next):
+    # Lets outbound LLM calls be attributed to the route that made them.
+    token = metrics.current_route.set(request.url.path)
+    try:
+        return await call_next(request)
+    finally:
+        metrics.current_route.reset(token)
+
+@app.on_event("shutdown")
+def close_http_clients():
+    http_client.close()
+
+@app.on_event("shutdown")
+async def close_mongo_clients():
+    await async_client.close()
+    client.close()
+
+@app.on_event("startup")
+def create_mongo_indexes():
+    # Idempotent; `python -m utils.db_indexes --check` verifies the query plans.
+    if os.getenv("MONGO_ENSURE_INDEXES", "1") == "1":
+        try:
+            ensure_indexes(db)
+        except Exception as e:
+            print("⚠️ Could not create MongoDB indexes:", e)
+    try:
+        backfill_reservations(db["appointments"], db[SLOT_COLLECTION])
+    except Exception as e:
+        print("⚠️ Could not backfill slot reservations:", e)
+    try:
+        backfill_norm_fields(db["doctors"])
+    except Exception as e:
+        print("⚠️ Could not backfill normalized doctor fields:", e)
+
+@app.on_event("startup")
+def load_doctor_directory():
+    # Lookups fall back to MongoDB if this fails.
+    try:
+        doctor_directory.start(db["doctors"])
+    except Exception as e:
+        print("⚠️ Could not load the doctor directory:", e)
+
+UMLS_WARM_TOP_N = int(os.getenv("UMLS_WARM_TOP_N", "50"))
+
+@app.on_event("startup")
+def warm_umls_relations():
+    # In the background so a slow UTS never holds up startup.
+    if UMLS_WARM_TOP_N > 0:
+        threading.Thread(
+            target=warm_relation_cache, args=(db["symptom_reports"], UMLS_WARM_TOP_N), name="umls-warm", daemon=True
+        ).start()
+
 app.include_router(create_router(doctor_collection))
-app.include_router(profile_router(appointments_collection))
+app.include_router(profile_router(appointments_collection, slot_collection))
 
 
 
@@ -102,24 +154,32 @@ class DoctorModel(BaseModel):
 
 @app.post("/doctor-login")
 async def doctor_login(doctor:DoctorModel):
-    exist= doctor_collection.find_one({"contact":doctor.contact})
+    exist= await doctor_collection.find_one({"contact":doctor.contact})
     if exist:
-        doctor_collection.update_one({"contact":doctor.contact},{"$set":doctor.dict()})
+        fields={**doctor.dict(), **norm_fields(doctor.dict())}
+        await doctor_collection.update_one({"contact":doctor.contact},{"$set":fields})
+        doctor_directory.upsert({**exist, **fields})
         return {"success":True,"message":"Doctor profile Updated."}
-    doctor_collection.insert_one({
+    new_doctor={
         "name":doctor.name,
         "specialization":doctor.specialization,
         "contact":doctor.contact,
         "city":doctor.city,
         "fee":doctor.fee,
         "available_slots":doctor.available_slots
-    })
+    }
+    new_doctor.update(norm_fields(new_doctor))
+    await doctor_collection.insert_one(new_doctor)  # sets new_doctor["_id"]
+    doctor_directory.upsert(new_doctor)
     return {"success":True,"message":"Doctor Profile Created."}
 
 
 @app.get("/get-doctor-profile")
 async def get_doctor_profile(contact:str):
-    doctor=doctor_collection.find_one({"contact":contact},{"_id":0})
+    if doctor_directory.ready:
+        doctor=doctor_directory.get_by_contact(contact, with_id=False)
+    else:
+        doctor=await doctor_collection.find_one({"contact":contact},{"_id":0})
     if doctor:
         return {"success":True,"doctor":doctor}
     return {"success": False, "message": "Doctor not found"}
@@ -127,10 +187,10 @@ async def get_doctor_profile(contact:str):
 
 @app.get("/get-doctor-appointment")
 async def get_doctor_appointment(contact:str):
-    doctor= doctor_collection.find_one({"contact":contact})
+    doctor= await doctor_collection.find_one({"contact":contact})
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    appointment=list(appointments_collection.find({"contact":contact}))
+    appointment=await appointments_collection.find({"contact":contact}).to_list()
     appoint=[]
     for appt in appointment:
         appt["_id"]=str(appt["_id"])
@@ -140,8 +200,9 @@ async def get_doctor_appointment(contact:str):
 
 @app.delete("/cancel-appointment/{id}")
 async def cancel_appointment(id:str):
-    appoint=appointments_collection.delete_one({"_id":ObjectId(id)})
-    if appoint.deleted_count==1:
+    appoint=await appointments_collection.find_one_and_delete({"_id":ObjectId(id)})
+    if appoint:
+         await release_slot_async(slot_collection, appoint)
          return {"success": True, "message": "Appointment cancelled"}
     else:
         raise HTTPException(status_code=404, detail="Appointment not found")
@@ -152,12 +213,17 @@ class StatusUpdate(BaseModel):
 
 @app.put("/update-appointment-status/{id}")
 async def update_appointment_status(id: str,payload: StatusUpdate):
-    res=appointments_collection.update_one(
+    res=await appointments_collection.update_one(
         {"_id":ObjectId(id)},
          {"$set":{"status":payload.status}}
     )
    
     if res.modified_count == 1:
+        if is_closed(payload.status):
+            # A rejected or cancelled appointment frees its slot for someone else.
+            appt=await appointments_collection.find_one({"_id":ObjectId(id)})
+            if appt:
+                await release_slot_async(slot_collection, appt)
         return {"success": True, "message": "Status updated"}
     raise HTTPException(status_code=404, detail="Appointment not found")
 
@@ -167,64 +233,131 @@ class RescheduleUpdate(BaseModel):
 
 @app.put("/reschedule-appointment/{id}")
 async def reschedule_appointment(id:str,payload:RescheduleUpdate):
-    re=appointments_collection.update_one(
-        {"_id":ObjectId(id)},
+    appt=await appointments_collection.find_one({"_id":ObjectId(id)})
+    if not appt:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    try:
+        await claim_slot_async(slot_collection, appt["_id"], appt.get("contact"), appt.get("doctor_name"), payload.date, payload.time)
+    except SlotTaken:
+        return JSONResponse(status_code=409, content={"success": False, "message": "Slot already booked"})
+
+    await appointments_collection.update_one(
+        {"_id":appt["_id"]},
         {
             "$set":{"date":payload.date,"time":payload.time}
         }
     )
-
-    if re.modified_count==1:
-        return {"success": True, "message": "Meeting Rescheduled"}
-    raise HTTPException(status_code=404, detail="Appointment not found")
+    if (appt.get("date"), appt.get("time")) != (payload.date, payload.time):
+        await release_slot_async(slot_collection, appt)
+    return {"success": True, "message": "Meeting Rescheduled"}
+
+
+async def save_chat_turn(phone: str, user_query: str, response: str):
+    # Find existing session for this phone
+    existing_chat = await chat_histroy.find_one({"phone": phone}, sort=[("created_at", -1)])
+
+    if existing_chat:
+        # Append new messages
+        await chat_histroy.update_one(
+            {"_id": existing_chat["_id"]},
+            {"$push": {
+                "messages": {
+                    "$each": [
+                        {"sender": "user", "text": user_query, "timestamp": datetime.now().isoformat()},
+                        {"sender": "bot", "text": response, "timestamp": datetime.now().isoformat()}
+                    ]
+                }
+            }}
+        )
+    else:
+        # Create new session
+        await chat_histroy.insert_one({
+            "phone": phone,
+            "messages": [
+                {"sender": "user", "text": user_query, "timestamp": datetime.now().isoformat()},
+                {"sender": "bot", "text": response, "timestamp": datetime.now().isoformat()}
+            ],
+            "created_at": datetime.now().isoformat()
+        })
 
 
-@app.post("/chat-agent")
-async def chat_agent(request: Request):
-    data = await request.json()
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+async def stream_agent(full_prompt: str, emit) -> str:
+    """
+    Run the agent with astream_events and forward only the text after the
+    ReAct "Final Answer:" marker, so thoughts and tool calls never reach
+    the user. Tools with return_direct answer without that marker, so their
+    output is sent in one piece at the end.
+    """
+    buffers = {}
+    sent = {}
+    streamed = False
+    output = None
+    async for event in health_agent.astream_events(full_prompt, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            if not isinstance(content, str):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            run_id = event["run_id"]
+            text = buffers.get(run_id, "") + content
+            buffers[run_id] = text
+            pos = text.find(FINAL_ANSWER_MARKER)
+            if pos == -1:
+                continue
+            piece = text[max(pos + len(FINAL_ANSWER_MARKER), sent.get(run_id, 0)):]
+            if run_id not in sent:
+                piece = piece.lstrip()
+            sent[run_id] = len(text)
+            if piece:
+                streamed = True
+                await emit(piece)
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            output = event["data"].get("output")
+
+    if isinstance(output, dict):
+        output = output.get("output", str(output))
+    output = str(output or "")
+    if not streamed:
+        await emit(output)
+    return output
+
+
+async def run_chat_agent(data: dict, emit=None) -> dict:
     user_query = data.get("query")
     phone = data.get("phone")
     full_prompt = f"{user_query}\nPhone: {phone}"
 
-    try:
-        # Get bot response
-        response = health_agent.invoke(full_prompt)
+    # Get bot response
+    if emit is None:
+        response = await asyncio.to_thread(health_agent.invoke, full_prompt)
         if isinstance(response, dict):
             response = response.get("output", str(response))
+    else:
+        response = await stream_agent(full_prompt, emit)
 
-        # Find existing session for this phone
-        existing_chat = chat_histroy.find_one({"phone": phone}, sort=[("created_at", -1)])
-
-        if existing_chat:
-            # Append new messages
-            chat_histroy.update_one(
-                {"_id": existing_chat["_id"]},
-                {"$push": {
-                    "messages": {
-                        "$each": [
-                            {"sender": "user", "text": user_query, "timestamp": datetime.now().isoformat()},
-                            {"sender": "bot", "text": response, "timestamp": datetime.now().isoformat()}
-                        ]
-                    }
-                }}
-            )
-        else:
-            # Create new session
-            chat_histroy.insert_one({
-                "phone": phone,
-                "messages": [
-                    {"sender": "user", "text": user_query, "timestamp": datetime.now().isoformat()},
-                    {"sender": "bot", "text": response, "timestamp": datetime.now().isoformat()}
-                ],
-                "created_at": datetime.now().isoformat()
-            })
-
-        return {"text": response}
+    # History is written once the full answer exists, never mid-stream.
+    await save_chat_turn(phone, user_query, response)
+    return {"text": response}
+
+
+@app.post("/chat-agent")
+async def chat_agent(request: Request):
+    data = await request.json()
+    try:
+        return await run_chat_agent(data)
 
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.post("/chat-agent/stream")
+async def chat_agent_stream(request: Request):
+    data = await request.json()
+    return sse_response(lambda emit: run_chat_agent(data, emit))
+
+
 
 @app.post("/rag-summary")
 async def get_summary(
@@ -246,8 +379,8 @@ Keep response under 5 lines. Use emojis.
 If report is unclear, say: "⚠️ Could not understand this report."
 """
     
-    summary=safe_gpt(question=ocr_text,role_prompt=role_prompt)
-    med_collection.insert_one({
+    summary=await safe_gpt_async(ocr_text,role_prompt=role_prompt)
+    await med_collection.insert_one({
         "phone": phone,
         "summary": summary,
         "timestamp": datetime.now().isoformat(),
@@ -266,7 +399,7 @@ class SymptomReport(BaseModel):
     full_conversation: List[dict]
     phone:str
 
-def compress_conversation(convo: List[dict]) -> str:
+async def compress_conversation(convo: List[dict]) -> str:
     """Summarize the full conversation into 4-5 lines using Gemini"""
     dialogue_lines = []
     for msg in convo:
@@ -286,7 +419,7 @@ Use empathetic and simple language.
 Avoid giving false hope. No prescriptions.
 Just tell the issue, cause (if known), and what to do.
 """
-    return safe_gpt(prompt,role_prompt="You are a doctor.Summarize the following health chat in 3-4 short lines.")
+    return await safe_gpt_async(prompt,role_prompt="You are a doctor.Summarize the following health chat in 3-4 short lines.")
 
 
 @app.post("/save-report")
@@ -294,8 +427,8 @@ async def save_report(report:SymptomReport): # ye fucntion uss pydantic model ko
     report_dict=report.dict()
     report_dict["date"] = report.date.isoformat()
     print("Saving report:", report_dict)
-    report_dict["summary"] = compress_conversation(report.full_conversation)
-    result=report_collection.insert_one(report_dict)
+    report_dict["summary"] = await compress_conversation(report.full_conversation)
+    result=await report_collection.insert_one(report_dict)
     print("Inserted ID:", result.inserted_id)
     return {"status": "success", "message": "Report saved"}
 
@@ -305,14 +438,14 @@ class PhoneRequest(BaseModel):
 
 @app.post("/get-reports")
 async def get_reports(request: PhoneRequest):
-    reports=list(db["symptom_reports"].find({"phone":request.phone}))
+    reports=await report_collection.find({"phone":request.phone}).to_list()
     for report in reports:
         report["_id"]=str(report["_id"])
     return {"reports":reports}
 
 @app.delete("/delete-report/{rep_id}")
 async def delete_report(rep_id:str):
-    re=report_collection.delete_one({"_id":ObjectId(rep_id)})
+    re=await report_collection.delete_one({"_id":ObjectId(rep_id)})
     if re.deleted_count == 1:
         return {"status": "success", "message": "Report deleted successfully"}
     else:
@@ -320,6 +453,31 @@ async def delete_report(rep_id:str):
 
 
 
+async def attach_booked_slots(doctors):
+    """
+    Set each doctor's `booked_slots` ({date: [times]}) from their accepted
+    appointments, using one aggregation for the whole list instead of a query
+    per doctor. Computed on read, never written back.
+    """
+    contacts = list({doctor["contact"] for doctor in doctors if doctor.get("contact")})
+    booked = defaultdict(dict)
+    if contacts:
+        rows = await appointments_collection.aggregate([
+            {"$match": {
+                "contact": {"$in": contacts},
+                "status": {"$regex": "^accepted$", "$options": "i"},
+                "date": {"$nin": [None, ""]},
+                "time": {"$nin": [None, ""]},
+            }},
+            {"$group": {"_id": {"contact": "$contact", "date": "$date"}, "times": {"$push": "$time"}}},
+        ])
+        async for row in rows:
+            booked[row["_id"]["contact"]][row["_id"]["date"]] = row["times"]
+    for doctor in doctors:
+        doctor["booked_slots"] = booked.get(doctor.get("contact"), {})
+    return doctors
+
+
 @app.get("/all_doctors")
 async def get_all_doctor(
     specialization: Optional[str] = Query(None),
@@ -333,30 +491,12 @@ async def get_all_doctor(
     if city and city.lower() != "all":
         query["city"] = city.lower()
 
-    doctors = list(doctor_collection.find(query, {"_id": 0}))
+    if doctor_directory.ready:
+        doctors = doctor_directory.find(query.get("specialization"), query.get("city"), with_id=False)
+    else:
+        doctors = await doctor_collection.find(query, {"_id": 0}).to_list()
      #to not include id otherwise _id b to hota h agr qury na ho to use {}
-    for doctor in doctors:
-        contact=doctor["contact"]
-        booked = defaultdict(list)
-        appointment=appointments_collection.find({
-            "contact":contact
-        })
-        for app in appointment:
-            if app.get("status", "").lower() == "accepted":
-                date=app.get("date")
-                time=app.get("time")
-                print("→ App Date:", repr(date), "Time:", repr(time))
-                if date and time:
-                    booked[date].append(time)
-        print("Doctor:", doctor["contact"], "Booked Slots:", dict(booked))   
-        doctor["booked_slots"] = dict(booked) 
-        # convert defaultdict to regular dict
-        doctor_collection.update_one(
-            {"contact":contact},
-            {
-                "$set":{"booked_slots":dict(booked)}
-            }
-        )
+    await attach_booked_slots(doctors)
     return {"doctors": doctors}
 
 @app.post("/book-appoint")
@@ -365,7 +505,8 @@ async def book_appoint(payload:dict):
     state = {**payload}
     state["user_input"] = payload.get("user_input", "")
 
-    result=book_app_graph.invoke(state)
+    # The graph's nodes use the sync driver, so keep them off the event loop.
+    result=await asyncio.to_thread(book_app_graph.invoke, state)
     print("🧾 Final state result:", result)
     if result.get("error"):
         return {"error":result["error"]}
@@ -390,18 +531,16 @@ class AppointmentRequest(BaseModel): #pydantic model for appointment requests
 
 @app.post("/book-appointment")
 async def book_appointment(appt: AppointmentRequest):
-    existing=appointments_collection.find_one({
-        "doctor_name": appt.doctor_name,
-        "specialization":appt.specialization,
-        "date": appt.date,
-        "time": appt.time,
-        "contact":appt.contact
-    })
-    if existing:
-        return JSONResponse(status_code=400, content={"message": "Slot already booked"})
+    # Claiming the slot is one atomic insert; a concurrent booking of the same slot fails here.
+    appt_id = ObjectId()
+    try:
+        await claim_slot_async(slot_collection, appt_id, appt.contact, appt.doctor_name, appt.date, appt.time)
+    except SlotTaken:
+        return JSONResponse(status_code=409, content={"message": "Slot already booked"})
 
-    appointments_collection.insert_one({
-          "user_name": appt.user_name,
+    appointment = {
+        "_id": appt_id,
+        "user_name": appt.user_name,
         "phone": appt.phone,
         "age":appt.age,
         "location":appt.location,
@@ -411,9 +550,14 @@ async def book_appointment(appt: AppointmentRequest):
         "contact":appt.contact,
         "date": appt.date,
         "time": appt.time,
-         "status": "Pending",
+        "status": "Pending",
         "created_at": datetime.now().isoformat()
-    })
+    }
+    try:
+        await appointments_collection.insert_one(appointment)
+    except Exception:
+        await release_slot_async(slot_collection, appointment)
+        raise
     msg = f"Appointment confirmed with Dr. {appt.doctor_name} on {appt.date} at {appt.time}."
     return {"message": msg}
 
@@ -424,7 +568,7 @@ async def get_doctor_slots(doctor_name: str, date: str):
         "doctor_name": doctor_name,
         "date": date
     })
-    slots = [b["time"] for b in booked_slots]
+    slots = [b["time"] async for b in booked_slots]
     return {"booked_slots": slots}
 
 class DoctorSearchRequest(BaseModel):
@@ -432,28 +576,23 @@ class DoctorSearchRequest(BaseModel):
 
 @app.post('/find-doctors')
 async def find_doctors(req: DoctorSearchRequest):
-    doctors=list(db["doctors"].find({"specialization": req.specialization}))
+    if doctor_directory.ready:
+        doctors=doctor_directory.find(req.specialization)
+    else:
+        doctors=await doctor_collection.find({"specialization": req.specialization}).to_list()
     unique={}
     for doc in doctors:
         key=(doc["name"],doc["contact"])
         if key not in unique:
             doc["_id"] = str(doc["_id"])
             unique[key]=doc
-    return {"doctors":list(unique.values())}
+    # booked_slots used to be refreshed as a side effect of /all_doctors.
+    return {"doctors":await attach_booked_slots(list(unique.values()))}
 
 
 
 def translate(text:str,dest:str="en")->str:
-    model = genai.GenerativeModel('models/gemini-2.5-flash')
-    prompt = f"Translate this to {dest} language:\n\n{text}"
-    return model.generate_content(prompt).text.strip()
-
-
-def safe_gpt(question: str, role_prompt: str ="you are a rural health advisor give advice to health related in friendly way.") -> str:
-    model = genai.GenerativeModel('models/gemini-2.5-flash')
-    prompt = f"{role_prompt}\nQ: {question}"
-    response = model.generate_content([prompt])
-    return response.text
+    return safe_gpt(f"Translate this to {dest} language:\n\n{text}")
 
 class LocationInput(BaseModel):
     lat:float
@@ -464,13 +603,13 @@ class LocationInput(BaseModel):
 async def nearby_places(data:LocationInput):
     print("Received lat/lng:", data.lat, data.lng, data.tag)
     return {
-        "places":get_nearby_places(data.lat,data.lng,data.tag)
+        "places":await get_nearby_places(data.lat,data.lng,data.tag)
     }
 
 @app.get("/history")
 async def get_chat_history(phone: str):
     print(f"📞 Fetching history for phone: {phone}")
-    chats = list(chat_histroy.find({"phone": phone}).sort("created_at", -1))
+    chats = await chat_histroy.find({"phone": phone}).sort("created_at", -1).to_list()
 
     history = [
         {
@@ -485,7 +624,7 @@ async def get_chat_history(phone: str):
 @app.delete("/history/{chat_id}")
 async def delete_chat(chat_id: str):
     try:
-        result = chat_histroy.delete_one({"_id": ObjectId(chat_id)})
+        result = await chat_histroy.delete_one({"_id": ObjectId(chat_id)})
         if result.deleted_count == 1:
             return {"success": True}
         else:
@@ -514,7 +653,7 @@ async def ask(name: str = Form(...),
         "address": address,
         "last_updated": now
     }
-    users_collection.update_one(
+    await users_collection.update_one(
         {"phone": phone},
         {"$set": profile_data},
         upsert=True
@@ -522,6 +661,19 @@ async def ask(name: str = Form(...),
 
     return {"message": "✅ Profile saved successfully"}
     
+@app.get("/stats")
+async def get_stats():
+    return {
+        "llm_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "keyword_fast_path": keyword_extractor.stats(),
+        "doctor_directory": doctor_directory.stats()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     return {"msg": "Ruralbot API is live."}
@@ -0,0 +1,178 @@
+"""
+Cached UMLS relation graph.
+
+`RelationCache` keeps the relations UTS returned for each CUI in a SQLite
+table, bounded to `max_entries` rows (least recently used rows go first)
+and refreshed after `ttl` seconds. The database (UMLS_RELATION_DB, next to
+the app by default) is only opened on first use, so importing this module
+writes nothing. `RelationGraph` puts it in front of a
+fetch function: `get` for one CUI, `prefetch` for many at once (one SELECT
+for the cached ones, a small thread pool for the rest) and `traverse` for a
+breadth-limited walk over related concepts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from utils.metrics import Counter
+
+load_dotenv()
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UMLS_RELATION_DB = os.getenv("UMLS_RELATION_DB") or os.path.join(APP_DIR, "umls_relations.db")
+UMLS_RELATION_CACHE_SIZE = int(os.getenv("UMLS_RELATION_CACHE_SIZE", "20000"))
+UMLS_RELATION_TTL = float(os.getenv("UMLS_RELATION_TTL", str(30 * 24 * 3600)))  # UMLS ships twice a year
+PREFETCH_WORKERS = int(os.getenv("UMLS_PREFETCH_WORKERS", "8"))
+
+RELATION_LOOKUPS = Counter("umls_relation_lookups_total", "CUI relation lookups by result", ["result"])
+
+
+def related_cui(relation: dict) -> str:
+    """CUI at the other end of a UTS relation (`relatedId` is a URL ending in it)."""
+    return (relation.get("relatedId") or "").rstrip("/").rsplit("/", 1)[-1]
+
+
+class RelationCache:
+    def __init__(self, path: str = UMLS_RELATION_DB, max_entries: int = UMLS_RELATION_CACHE_SIZE,
+                 ttl: float = UMLS_RELATION_TTL, table: str = "cui_relations"):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = None
+        self.size = 0
+
+    def _db(self):
+        """The connection, opened on first use; call with `self.lock` held."""
+        if self.conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            with conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} "
+                    "(cui TEXT PRIMARY KEY, relations TEXT, fetched_at REAL, last_used REAL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table} (last_used)")
+                self.size = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            self.conn = conn
+        return self.conn
+
+    def get_many(self, cuis) -> dict:
+        """Fresh cached relations for the given CUIs; missing or stale ones are left out."""
+        cuis = list(dict.fromkeys(cuis))
+        if not cuis:
+            return {}
+        now = time.time()
+        marks = ",".join("?" * len(cuis))
+        with self.lock, self._db() as conn:
+            rows = conn.execute(
+                f"SELECT cui, relations FROM {self.table} WHERE cui IN ({marks}) AND fetched_at > ?",
+                (*cuis, now - self.ttl),
+            ).fetchall()
+            if rows:
+                hit = [cui for cui, _ in rows]
+                conn.execute(
+                    f"UPDATE {self.table} SET last_used = ? WHERE cui IN ({','.join('?' * len(hit))})",
+                    (now, *hit),
+                )
+        return {cui: json.loads(relations) for cui, relations in rows}
+
+    def set_many(self, relations_by_cui: dict):
+        if not relations_by_cui:
+            return
+        now = time.time()
+        with self.lock, self._db() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (cui, relations, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+                [(cui, json.dumps(rels), now, now) for cui, rels in relations_by_cui.items()],
+            )
+            self.size += conn.total_changes - before
+            if self.size > self.max_entries:
+                # Evict down to 90% so we don't pay for a DELETE on every insert.
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE cui IN "
+                    f"(SELECT cui FROM {self.table} ORDER BY last_used LIMIT ?)",
+                    (self.size - int(self.max_entries * 0.9),),
+                )
+                self.size = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def clear(self):
+        with self.lock, self._db() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+            self.size = 0
+
+
+class RelationGraph:
+    def __init__(self, cache: RelationCache, fetch, workers: int = PREFETCH_WORKERS):
+        self.cache = cache
+        self.fetch = fetch  # cui -> list of UTS relation dicts
+        self.workers = workers
+
+    def get(self, cui: str):
+        return self.prefetch([cui]).get(cui, [])
+
+    def prefetch(self, cuis) -> dict:
+        """Relations for every CUI in `cuis`, fetching the uncached ones concurrently."""
+        cuis = [cui for cui in dict.fromkeys(cuis) if cui]
+        found = self.cache.get_many(cuis)
+        missing = [cui for cui in cuis if cui not in found]
+        RELATION_LOOKUPS.inc(len(found), result="hit")
+        if not missing:
+            return found
+        RELATION_LOOKUPS.inc(len(missing), result="miss")
+
+        def fetch_one(cui):
+            try:
+                return cui, self.fetch(cui)
+            except Exception as e:
+                print(f"⚠️ Relation fetch failed for {cui}:", e)
+                return cui, None
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as executor:
+            fetched = {cui: rels for cui, rels in executor.map(fetch_one, missing) if rels is not None}
+        self.cache.set_many(fetched)
+        found.update(fetched)
+        return found
+
+    def traverse(self, cui: str, depth: int = 2, breadth: int = 10, max_nodes: int = 100, labels=None):
+        """
+        Concepts reachable from `cui` in at most `depth` hops, following at most
+        `breadth` relations per concept (optionally only the given
+        `relationLabel`s) and stopping after `max_nodes` concepts.
+        """
+        seen = {cui}
+        frontier = [cui]
+        found = []
+        for level in range(1, depth + 1):
+            relations = self.prefetch(frontier)
+            next_frontier = []
+            for parent in frontier:
+                taken = 0
+                for rel in relations.get(parent, []):
+                    if taken >= breadth or len(found) >= max_nodes:
+                        break
+                    if labels and rel.get("relationLabel") not in labels:
+                        continue
+                    child = related_cui(rel)
+                    if not child or child in seen:
+                        continue
+                    seen.add(child)
+                    taken += 1
+                    next_frontier.append(child)
+                    found.append({
+                        "cui": child,
+                        "name": rel.get("relatedIdName", ""),
+                        "relation": rel.get("relationLabel", ""),
+                        "parent": parent,
+                        "depth": level,
+                    })
+            if len(found) >= max_nodes or not next_frontier:
+                break
+            frontier = next_frontier
+        return found
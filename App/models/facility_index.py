@@ -0,0 +1,187 @@
+"""
+Offline spatial index of health facilities.
+
+A SQLite file with an R*Tree over facility coordinates, built from a local
+dataset such as an OSM extract of hospitals, clinics and pharmacies.
+`nearest()` and `within()` answer in milliseconds, so
+`location.get_nearby_places` only goes to LocationIQ when the area is not
+covered.
+
+Build it from a GeoJSON export (Overpass turbo, `osmium export`) or a CSV
+with `name,lat,lon,kind[,address]` columns:
+
+    python -m models.facility_index --input health_facilities.geojson --db facilities.db
+
+The R*Tree narrows a query to a bounding box and exact distances are then
+computed with the haversine formula. k-nearest searches start with a small box
+and double it until enough facilities are found or `max_radius` is reached.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FACILITY_INDEX_DB = os.getenv("FACILITY_INDEX_DB", "facilities.db")
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+FIRST_RADIUS_M = 1000
+
+# OSM tags that say what kind of facility a feature is, in priority order.
+KIND_TAGS = ("amenity", "healthcare")
+KINDS = {"hospital", "clinic", "doctors", "pharmacy", "dentist", "health_post", "laboratory"}
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _bbox(lat: float, lng: float, radius_m: float):
+    dlat = radius_m / METERS_PER_DEGREE
+    dlng = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+class FacilityIndex:
+    def __init__(self, path: str = FACILITY_INDEX_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def within(self, lat: float, lng: float, radius_m: float, kind: str = None, limit: int = None):
+        """Facilities within `radius_m` of (lat, lng), nearest first, each with `distance_m`."""
+        min_lat, max_lat, min_lng, max_lng = _bbox(lat, lng, radius_m)
+        sql = (
+            "SELECT f.name, f.kind, f.address, f.lat, f.lon FROM facility_rtree r "
+            "JOIN facilities f ON f.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?"
+        )
+        params = [min_lat, max_lat, min_lng, max_lng]
+        if kind:
+            sql += " AND f.kind = ?"
+            params.append(kind)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        found = []
+        for name, row_kind, address, lat2, lng2 in rows:
+            distance = haversine(lat, lng, lat2, lng2)
+            if distance <= radius_m:
+                found.append({
+                    "name": name, "kind": row_kind, "address": address,
+                    "lat": lat2, "lon": lng2, "distance_m": round(distance),
+                })
+        found.sort(key=lambda f: f["distance_m"])
+        return found[:limit] if limit else found
+
+    def nearest(self, lat: float, lng: float, k: int = 5, kind: str = None, max_radius_m: float = 5000):
+        """The `k` facilities closest to (lat, lng), no further than `max_radius_m`."""
+        radius = min(FIRST_RADIUS_M, max_radius_m)
+        while True:
+            found = self.within(lat, lng, radius, kind, limit=k)
+            if len(found) >= k or radius >= max_radius_m:
+                return found
+            radius = min(radius * 2, max_radius_m)
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM facilities").fetchone()[0]
+
+
+def load_index(path: str = FACILITY_INDEX_DB):
+    """The index at `path`, or None when it has not been built."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return FacilityIndex(path)
+    except sqlite3.Error as e:
+        print("⚠️ Could not open facility index:", e)
+        return None
+
+
+def _feature_point(geometry: dict):
+    """(lat, lon) of a GeoJSON geometry; the vertex average for lines and polygons."""
+    coords = geometry.get("coordinates")
+    kind = geometry.get("type")
+    if kind == "Point":
+        return coords[1], coords[0]
+    while coords and isinstance(coords[0][0], list):  # unwrap (Multi)Polygon rings
+        coords = coords[0]
+    if not coords:
+        return None
+    return sum(c[1] for c in coords) / len(coords), sum(c[0] for c in coords) / len(coords)
+
+
+def _address(props: dict) -> str:
+    parts = [props.get("addr:street") or props.get("addr:full", ""), props.get("addr:city", "")]
+    return ", ".join(p for p in parts if p)
+
+
+def read_geojson(path: str):
+    """(name, kind, address, lat, lon) for every health facility in a GeoJSON file."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    for feature in data.get("features", []):
+        props = feature.get("properties") or {}
+        props = props.get("tags", props)  # Overpass turbo nests tags one level down
+        kind = next((props[tag] for tag in KIND_TAGS if props.get(tag) in KINDS), None)
+        geometry = feature.get("geometry")
+        if kind is None or not geometry:
+            continue
+        point = _feature_point(geometry)
+        if point is None:
+            continue
+        yield props.get("name") or kind.replace("_", " ").title(), kind, _address(props), point[0], point[1]
+
+
+def read_csv(path: str):
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            yield row["name"], row["kind"].strip().lower(), row.get("address", ""), float(row["lat"]), float(row["lon"])
+
+
+def build_index(rows, db_path: str) -> int:
+    """(Re)build the index from (name, kind, address, lat, lon) rows; returns the row count."""
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript("""
+        CREATE TABLE facilities (id INTEGER PRIMARY KEY, name TEXT, kind TEXT, address TEXT, lat REAL, lon REAL);
+        CREATE VIRTUAL TABLE facility_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+    """)
+    count = 0
+    for name, kind, address, lat, lon in rows:
+        count += 1
+        conn.execute("INSERT INTO facilities VALUES (?, ?, ?, ?, ?, ?)", (count, name, kind, address, lat, lon))
+        conn.execute("INSERT INTO facility_rtree VALUES (?, ?, ?, ?, ?)", (count, lat, lat, lon, lon))
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline health facility index.")
+    parser.add_argument("--input", required=True, help="GeoJSON export or CSV (name,lat,lon,kind[,address])")
+    parser.add_argument("--db", default=FACILITY_INDEX_DB)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    reader = read_csv if args.input.lower().endswith(".csv") else read_geojson
+    count = build_index(reader(args.input), args.db)
+    print(f"✅ Indexed {count} facilities into {args.db} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
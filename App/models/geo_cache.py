@@ -0,0 +1,221 @@
+"""
+Geohash-tiled cache for nearby-place lookups.
+
+Coordinates are snapped to a geohash tile (precision 6 is roughly
+1.2 km x 0.6 km) and the upstream lookup is made for the tile's centre, so
+every request from the same village shares one cached answer per tag. At a
+5 km search radius, moving the centre by at most a few hundred metres makes
+no practical difference to the result.
+
+Entries are fresh for `ttl` seconds and are then still served for up to
+`stale_ttl` more while one background refresh replaces them
+(stale-while-revalidate). Storage reuses the LLM cache tiers: memory LRU,
+plus SQLite when NEARBY_CACHE_DB is set.
+
+`GeocodeCache` does the same for place names: each normalized name is
+geocoded once and kept for GEOCODE_CACHE_TTL.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+
+from dotenv import load_dotenv
+
+from utils.llm_cache import LRUTier, SQLiteTier
+from utils.metrics import Counter
+from utils.single_flight import SingleFlight
+
+load_dotenv()
+
+NEARBY_GEOHASH_PRECISION = int(os.getenv("NEARBY_GEOHASH_PRECISION", "6"))
+NEARBY_CACHE_TTL = float(os.getenv("NEARBY_CACHE_TTL", str(24 * 3600)))
+NEARBY_CACHE_STALE = float(os.getenv("NEARBY_CACHE_STALE", str(7 * 24 * 3600)))
+NEARBY_CACHE_SIZE = int(os.getenv("NEARBY_CACHE_SIZE", "4096"))
+NEARBY_CACHE_DB = os.getenv("NEARBY_CACHE_DB", "")
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(90 * 24 * 3600)))  # places don't move
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+
+NEARBY_LOOKUPS = Counter("nearby_cache_lookups_total", "Nearby-place cache lookups by result", ["result"])
+GEOCODE_LOOKUPS = Counter("geocode_cache_lookups_total", "Geocoding cache lookups by result", ["result"])
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lng: float, precision: int = NEARBY_GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = value * 2 + 1
+            rng[0] = mid
+        else:
+            value *= 2
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def tile_center(tile: str):
+    """(lat, lng) of the centre of a geohash tile."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in tile:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def _cacheable(places) -> bool:
+    # Error strings from the LocationIQ helpers must not stick in the cache.
+    return isinstance(places, list) and not any(str(p).startswith("⚠️") for p in places)
+
+
+class NearbyCache:
+    def __init__(self, tiers, ttl: float = NEARBY_CACHE_TTL, stale_ttl: float = NEARBY_CACHE_STALE,
+                 precision: int = NEARBY_GEOHASH_PRECISION):
+        self.tiers = list(tiers)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.precision = precision
+        self.flight = SingleFlight("nearby")
+        self.refreshing = set()  # background refresh tasks, kept so they aren't garbage collected
+
+    def _lookup(self, key: str, now: float):
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key, now)
+            if entry is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, *entry)
+                return json.loads(entry[0])
+        return None
+
+    async def _refresh(self, key: str, tile: str, tag: str, fetch):
+        lat, lng = tile_center(tile)
+        places = await fetch(lat, lng, tag)
+        if _cacheable(places):
+            now = time.time()
+            value = json.dumps({"fetched_at": now, "places": places})
+            for tier in self.tiers:
+                tier.set(key, value, now + self.ttl + self.stale_ttl)
+        return places
+
+    def _revalidate(self, key: str, tile: str, tag: str, fetch):
+        if key in self.flight.inflight:
+            return
+
+        async def run():
+            try:
+                await self.flight.do(key, lambda: self._refresh(key, tile, tag, fetch))
+            except Exception as e:
+                print(f"⚠️ Nearby refresh failed for {key}:", e)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self.refreshing.add(task)
+        task.add_done_callback(self.refreshing.discard)
+
+    async def get(self, lat: float, lng: float, tag: str, fetch):
+        """
+        Places near (lat, lng) for `tag`. `fetch(lat, lng, tag)` is the async
+        upstream lookup, called with the tile centre on a miss or refresh.
+        """
+        tag = (tag or "hospital").strip().lower()
+        tile = geohash(lat, lng, self.precision)
+        key = f"{tag}:{tile}"
+        entry = self._lookup(key, time.time())
+        if entry is not None:
+            if time.time() - entry["fetched_at"] < self.ttl:
+                NEARBY_LOOKUPS.inc(result="fresh")
+            else:
+                NEARBY_LOOKUPS.inc(result="stale")
+                self._revalidate(key, tile, tag, fetch)
+            return entry["places"]
+        NEARBY_LOOKUPS.inc(result="miss")
+        return await self.flight.do(key, lambda: self._refresh(key, tile, tag, fetch))
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+
+def build_nearby_cache() -> NearbyCache:
+    tiers = [LRUTier(NEARBY_CACHE_SIZE)]
+    if NEARBY_CACHE_DB:
+        tiers.append(SQLiteTier(NEARBY_CACHE_DB, table="nearby_cache"))
+    return NearbyCache(tiers)
+
+
+nearby_cache = build_nearby_cache()
+
+
+def normalize_place(name: str) -> str:
+    """Lowercased, without punctuation or extra spaces: "New Delhi, " -> "new delhi"."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w ]+", " ", (name or "").lower())).strip()
+
+
+class GeocodeCache:
+    """Place name -> (lat, lng), keyed on the normalized name. Only found places are stored."""
+
+    def __init__(self, tiers, ttl: float = GEOCODE_CACHE_TTL):
+        self.tiers = list(tiers)
+        self.ttl = ttl
+        self.flight = SingleFlight("geocode")
+
+    def _lookup(self, key: str):
+        now = time.time()
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key, now)
+            if entry is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, *entry)
+                return tuple(json.loads(entry[0]))
+        return None
+
+    async def get(self, place_name: str, geocode):
+        """Coordinates of `place_name`; `geocode(name)` is the async upstream lookup."""
+        key = normalize_place(place_name)
+        if not key:
+            return None, None
+        cached = self._lookup(key)
+        if cached is not None:
+            GEOCODE_LOOKUPS.inc(result="hit")
+            return cached
+        GEOCODE_LOOKUPS.inc(result="miss")
+
+        async def resolve():
+            lat, lng = await geocode(place_name)
+            if lat is not None:
+                for tier in self.tiers:
+                    tier.set(key, json.dumps([lat, lng]), time.time() + self.ttl)
+            return lat, lng
+
+        return await self.flight.do(key, resolve)
+
+
+def build_geocode_cache() -> GeocodeCache:
+    tiers = [LRUTier(GEOCODE_CACHE_SIZE)]
+    if NEARBY_CACHE_DB:
+        tiers.append(SQLiteTier(NEARBY_CACHE_DB, table="geocode_cache"))
+    return GeocodeCache(tiers)
+
+
+geocode_cache = build_geocode_cache()
@@ -1,37 +1,59 @@
 import os
-import requests
+from utils import http_client
+import asyncio
+from models.geo_cache import nearby_cache, geocode_cache
+from models.facility_index import load_index
+from utils.metrics import Counter
 from dotenv import load_dotenv
 load_dotenv()
 locationIq_api_key = os.getenv("LOCATIONIQ_API_KEY")
+LOCATIONIQ_BASE_URL = os.getenv("LOCATIONIQ_BASE_URL", "https://us1.locationiq.com/v1").rstrip("/")
 headers = {
     "User-Agent": "ruralbot-agent"
 }
-def get_lat_lng(place_name):
-    url= f"https://us1.locationiq.com/v1/search?key={locationIq_api_key}&q={place_name}&format=json"
-    res=requests.get(url,headers=headers)
+NEARBY_RADIUS_M = 5000
+NEARBY_DEADLINE = float(os.getenv("NEARBY_DEADLINE", "8"))
+# Head start for nearby.php before search.php is also asked; 0 races them from the start.
+NEARBY_FALLBACK_DELAY = float(os.getenv("NEARBY_FALLBACK_DELAY", "0"))
+NEARBY_LOOKUPS = Counter("nearby_search_total", "Nearby-place searches answered by the local index vs. LocationIQ", ["source"])
+# Offline index from models/facility_index.py; None until it has been built.
+facility_index = load_index()
+
+async def get_lat_lng(place_name):
+    # Each normalized place name is only geocoded once.
+    return await geocode_cache.get(place_name, geocode)
+
+async def geocode(place_name):
+    url= f"{LOCATIONIQ_BASE_URL}/search"
+    res=await http_client.get_async(url,params={"key": locationIq_api_key, "q": place_name, "format": "json"},headers=headers)
     data=res.json()
     print("NEARBY DATA:", data)  
-    if data:
+    if isinstance(data, list) and data:
         return data[0]['lat'], data[0]['lon']
     return None, None
 
-def get_fallback_places(lat, lng, query="hospital"):
+async def get_fallback_places(lat, lng, query="hospital"):
     # Define viewbox (left, top, right, bottom)
     left = lng - 0.05
     right = lng + 0.05
     top = lat + 0.05
     bottom = lat - 0.05
 
-    url = f"https://us1.locationiq.com/v1/search.php?key={locationIq_api_key}&q={query}&format=json&limit=5&viewbox={left},{top},{right},{bottom}&bounded=1"
+    url = f"{LOCATIONIQ_BASE_URL}/search.php?key={locationIq_api_key}&q={query}&format=json&limit=5&viewbox={left},{top},{right},{bottom}&bounded=1"
     print("FALLBACK URL:", url)
 
     try:
-        res = requests.get(url, headers=headers)
+        res = await http_client.get_async(url, headers=headers)
         data = res.json()
     except Exception as e:
         print("Fallback request failed:", e)
         return ["⚠️ Fallback API error"]
 
+    if not isinstance(data, list):
+        print("Fallback API error:", data)
+        # 404 "Unable to geocode" just means nothing matched in the viewbox.
+        return [] if res.status_code == 404 else ["⚠️ Fallback API error"]
+
     places = []
     for place in data:
         name = place.get("display_name", "Unknown")
@@ -54,10 +76,29 @@ def extract_places_from_list(data):
     return places
 
 
-def get_nearby_places(lat,lng,tag="hospital"):
-    url = f"https://us1.locationiq.com/v1/nearby.php?key={locationIq_api_key}&lat={lat}&lon={lng}&tag={tag}&radius=5000&format=json"
+def format_facility(facility):
+    label = facility["name"]
+    if facility.get("address"):
+        label += f", {facility['address']}"
+    gmap_link = f"https://www.google.com/maps/search/?api=1&query={facility['lat']},{facility['lon']}"
+    return f"{label} ({facility['distance_m'] / 1000:.1f} km)\n📍 {gmap_link}"
+
+
+async def get_nearby_places(lat,lng,tag="hospital"):
+    if facility_index is not None:
+        local = facility_index.nearest(lat, lng, k=5, kind=(tag or "hospital").strip().lower(), max_radius_m=NEARBY_RADIUS_M)
+        if local:
+            NEARBY_LOOKUPS.inc(source="local")
+            return [format_facility(f) for f in local]
+    # Area not covered offline: LocationIQ, cached per geohash tile.
+    NEARBY_LOOKUPS.inc(source="locationiq")
+    return await nearby_cache.get(lat, lng, tag, fetch_nearby_places)
+
+
+async def get_primary_places(lat,lng,tag="hospital"):
+    url = f"{LOCATIONIQ_BASE_URL}/nearby.php?key={locationIq_api_key}&lat={lat}&lon={lng}&tag={tag}&radius={NEARBY_RADIUS_M}&format=json"
     try:
-        res = requests.get(url, headers=headers)
+        res = await http_client.get_async(url, headers=headers)
         data = res.json()
     except Exception as e:
         print("Primary request failed:", e)
@@ -67,23 +108,52 @@ def get_nearby_places(lat,lng,tag="hospital"):
         print("✅ Response is a list — fallback or alt structure.")
         return extract_places_from_list(data)
     
-    if isinstance(data, dict) or "error" in data:
-        print("Primary API error:", data["error"])
-        return get_fallback_places(lat, lng, tag)
-    
-    print("NEARBY DATA:", data)  
-    places = []
-    for place in data.get("places",[])[:5]:
-        name=place.get("name","unknown")
-        address=place.get("address", {}).get("road", "")
-        lat2=place.get("lat")
-        lon2=place.get("lon")
-        gmap_link = f"https://www.google.com/maps/search/?api=1&query={lat2},{lon2}"
-        places.append(f"{name}, {address}\n📍 {gmap_link}")
-    return places
+    print("Primary API error:", data.get("error", data))
+    return ["⚠️ Primary API error"]
+
+
+def _good(places):
+    return bool(places) and not any(p.startswith("⚠️") for p in places)
+
+
+async def fetch_nearby_places(lat,lng,tag="hospital"):
+    """
+    Ask nearby.php and the bounded search.php fallback at the same time and
+    return the first non-empty answer, instead of trying them one after the
+    other. Gives up after NEARBY_DEADLINE seconds.
+    """
+    async def fallback():
+        await asyncio.sleep(NEARBY_FALLBACK_DELAY)
+        return await get_fallback_places(lat, lng, tag)
+
+    pending = {asyncio.create_task(get_primary_places(lat, lng, tag)), asyncio.create_task(fallback())}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + NEARBY_DEADLINE
+    answered = False  # an API replied, even if with nothing nearby
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(deadline - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                print("⚠️ Nearby search timed out")
+                break
+            for task in done:
+                try:
+                    places = task.result()
+                except Exception as e:
+                    print("Nearby lookup failed:", e)
+                    continue
+                if _good(places):
+                    return places
+                answered = answered or places == []
+    finally:
+        for task in pending:
+            task.cancel()
+    return [] if answered else ["⚠️ Nearby search failed"]
 
-def get_place_nearby_msg(lat,lng,tag):
-    places=get_nearby_places(lat,lng,tag)
+async def get_place_nearby_msg(lat,lng,tag):
+    places=await get_nearby_places(lat,lng,tag)
     if not places:
         return "⚠️ No places found nearby."
     
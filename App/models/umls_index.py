@@ -0,0 +1,166 @@
+"""
+Offline UMLS concept index.
+
+A SQLite file with the English names and synonyms of a UMLS subset, built
+from MRCONSO.RRF (optionally filtered to symptom/disease semantic types with
+MRSTY.RRF). `search(q)` answers in the same shape as the UTS search API, so
+`umlsclient.search_symptom` can try it first and only go to UTS on a miss.
+
+Build it once from a UMLS release:
+
+    python -m models.umls_index --mrconso META/MRCONSO.RRF --mrsty META/MRSTY.RRF --db umls_index.db
+
+Lookups try an exact match on the normalized name first, then an FTS5 match
+of all words ranked by bm25.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UMLS_INDEX_DB = os.getenv("UMLS_INDEX_DB", "umls_index.db")
+
+# Vocabularies with good lay-term coverage for symptoms and conditions.
+DEFAULT_SOURCES = ("MTH", "SNOMEDCT_US", "MSH", "MEDLINEPLUS", "ICD10CM", "CHV", "NCI", "MEDCIN")
+# Sign or Symptom, Disease or Syndrome, Finding, Injury or Poisoning,
+# Mental or Behavioral Dysfunction, Pathologic Function, Neoplastic Process.
+DEFAULT_SEMANTIC_TYPES = ("T184", "T047", "T033", "T037", "T048", "T046", "T191")
+
+# Column positions in MRCONSO.RRF and MRSTY.RRF.
+CUI, LAT, TS, STT, ISPREF, SAB, STR, SUPPRESS = 0, 1, 2, 4, 6, 11, 14, 16
+STY_CUI, STY_TUI = 0, 1
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w ]+", " ", text.lower())).strip()
+
+
+def _fts_query(text: str) -> str:
+    # Quote every word so user input can never be read as FTS5 syntax.
+    return " ".join(f'"{word}"' for word in normalize(text).split())
+
+
+class UMLSIndex:
+    def __init__(self, path: str = UMLS_INDEX_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def search(self, q: str, limit: int = 5):
+        """UTS-style results (`ui`, `name`, `rootSource`) for `q`, best first; [] on a miss."""
+        norm = normalize(q)
+        if not norm:
+            return []
+        with self.lock:
+            cuis = [row[0] for row in self.conn.execute(
+                "SELECT cui FROM terms WHERE norm = ? LIMIT ?", (norm, limit)
+            )]
+            if len(cuis) < limit:
+                for (cui,) in self.conn.execute(
+                    "SELECT cui FROM names WHERE names MATCH ? ORDER BY rank LIMIT ?",
+                    (_fts_query(q), limit * 10),
+                ):
+                    if cui not in cuis:
+                        cuis.append(cui)
+                    if len(cuis) == limit:
+                        break
+            names = dict(self.conn.execute(
+                f"SELECT cui, name FROM concepts WHERE cui IN ({','.join('?' * len(cuis))})", cuis
+            )) if cuis else {}
+        return [{"ui": cui, "name": names.get(cui, ""), "rootSource": "LOCAL"} for cui in cuis]
+
+
+def load_index(path: str = UMLS_INDEX_DB):
+    """The index at `path`, or None when it has not been built."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return UMLSIndex(path)
+    except sqlite3.Error as e:
+        print("⚠️ Could not open UMLS index:", e)
+        return None
+
+
+def _allowed_cuis(mrsty_path: str, semantic_types):
+    allowed = set()
+    with open(mrsty_path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("|")
+            if fields[STY_TUI] in semantic_types:
+                allowed.add(fields[STY_CUI])
+    return allowed
+
+
+def build_index(mrconso_path: str, db_path: str, sources=DEFAULT_SOURCES, mrsty_path: str = None,
+                semantic_types=DEFAULT_SEMANTIC_TYPES) -> int:
+    """(Re)build the index from MRCONSO.RRF; returns the number of concepts."""
+    allowed = _allowed_cuis(mrsty_path, set(semantic_types)) if mrsty_path else None
+    sources = set(sources) if sources else None
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript("""
+        CREATE TABLE concepts (cui TEXT PRIMARY KEY, name TEXT, preferred INTEGER);
+        CREATE TABLE terms (norm TEXT, cui TEXT);
+        CREATE VIRTUAL TABLE names USING fts5(cui UNINDEXED, str, tokenize = 'porter unicode61');
+    """)
+    seen = set()
+    with open(mrconso_path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("|")
+            if fields[LAT] != "ENG" or fields[SUPPRESS] not in ("N", ""):
+                continue
+            if sources and fields[SAB] not in sources:
+                continue
+            cui = fields[CUI]
+            if allowed is not None and cui not in allowed:
+                continue
+            norm = normalize(fields[STR])
+            if not norm or (cui, norm) in seen:
+                continue
+            seen.add((cui, norm))
+            preferred = int(fields[TS] == "P" and fields[STT] == "PF" and fields[ISPREF] == "Y")
+            # Keep the first preferred name as the display name.
+            conn.execute(
+                "INSERT INTO concepts VALUES (?, ?, ?) ON CONFLICT(cui) DO UPDATE SET "
+                "name = excluded.name, preferred = 1 WHERE excluded.preferred = 1 AND concepts.preferred = 0",
+                (cui, fields[STR], preferred),
+            )
+            conn.execute("INSERT INTO terms VALUES (?, ?)", (norm, cui))
+            conn.execute("INSERT INTO names VALUES (?, ?)", (cui, fields[STR]))
+    conn.execute("CREATE INDEX terms_norm ON terms (norm)")
+    conn.execute("INSERT INTO names(names) VALUES ('optimize')")
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM concepts").fetchone()[0]
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline UMLS concept index.")
+    parser.add_argument("--mrconso", required=True, help="path to MRCONSO.RRF")
+    parser.add_argument("--mrsty", help="path to MRSTY.RRF, to keep only --semantic-types")
+    parser.add_argument("--db", default=UMLS_INDEX_DB)
+    parser.add_argument("--sources", default=",".join(DEFAULT_SOURCES), help="comma separated SABs, empty for all")
+    parser.add_argument("--semantic-types", default=",".join(DEFAULT_SEMANTIC_TYPES))
+    args = parser.parse_args()
+    started = time.perf_counter()
+    count = build_index(
+        args.mrconso, args.db,
+        sources=[s for s in args.sources.split(",") if s],
+        mrsty_path=args.mrsty,
+        semantic_types=args.semantic_types.split(","),
+    )
+    print(f"✅ Indexed {count} concepts into {args.db} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,204 @@
-import requests
+import httpx
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from utils import http_client
+from utils.single_flight import SingleFlight
+from utils.metrics import Counter
+from utils.clinical_matcher import KeywordMatcher
+from models.umls_index import load_index
+from models.cui_graph import RelationCache, RelationGraph
 load_dotenv()
 umls_api_key= os.getenv("UMLS_API_KEY")
-AUTH_URL = "https://utslogin.nlm.nih.gov/cas/v1/api-key"
+# Base URLs can point at benchmarks/stand_in.py for load tests.
+AUTH_URL = os.getenv("UMLS_AUTH_URL", "https://utslogin.nlm.nih.gov/cas/v1/api-key")
+UMLS_API_URL = os.getenv("UMLS_API_URL", "https://uts-ws.nlm.nih.gov/rest").rstrip("/")
 SERVICE = "http://umlsks.nlm.nih.gov"
+TGT_TTL = float(os.getenv("UMLS_TGT_TTL", str(8 * 3600)))  # UTS keeps a TGT valid for 8 hours
+TGT_REFRESH_MARGIN = float(os.getenv("UMLS_TGT_REFRESH_MARGIN", "1800"))  # renew this long before expiry
+# Concurrent lookups for the same term share one round trip to UTS.
+umls_flight = SingleFlight("umls")
+UMLS_TICKETS = Counter("umls_tickets_total", "UMLS tickets requested from UTS", ["kind"])
+UMLS_LOOKUPS = Counter("umls_search_total", "Symptom searches answered by the local index vs. UTS", ["source"])
+# Offline index from models/umls_index.py; None until it has been built.
+local_index = load_index()
 
 def get_tgt():
-    res = requests.post(AUTH_URL, data={"apikey": umls_api_key})
-    print("TGT response:", res.text)
+    res = http_client.post(AUTH_URL, data={"apikey": umls_api_key}, retry=True)
+    res.raise_for_status()
+    UMLS_TICKETS.inc(kind="tgt")
     return res.text.split('action="')[1].split('"')[0]
 
 def get_st(tgt):
-    res = requests.post(tgt, data={"service": SERVICE})
-    print("ST response:", res.text)
+    res = http_client.post(tgt, data={"service": SERVICE}, retry=True)
+    res.raise_for_status()
+    UMLS_TICKETS.inc(kind="st")
     return res.text
 
+
+class TicketManager:
+    """
+    One ticket-granting ticket (TGT) for the whole process, plus single-use
+    service tickets minted from it on demand.
+
+    Once the TGT is within TGT_REFRESH_MARGIN of expiry, one caller renews it
+    while the others keep using the current one; callers only wait when there
+    is no valid TGT at all. A TGT that UTS rejects early is dropped and fetched
+    again once. Async handlers reach this through `asyncio.to_thread`, so a
+    thread lock covers both.
+    """
+
+    def __init__(self):
+        self.refresh_lock = threading.Lock()
+        self.tgt = None
+        self.expires_at = 0.0
+
+    def ticket_granting_ticket(self):
+        tgt, expires_at = self.tgt, self.expires_at
+        now = time.monotonic()
+        if tgt and now < expires_at - TGT_REFRESH_MARGIN:
+            return tgt
+        if tgt and now < expires_at:
+            if not self.refresh_lock.acquire(blocking=False):
+                return tgt  # someone else is already renewing it
+        else:
+            self.refresh_lock.acquire()
+        try:
+            if self.tgt and self.tgt != tgt:
+                return self.tgt  # renewed while we waited for the lock
+            self.tgt, self.expires_at = get_tgt(), time.monotonic() + TGT_TTL
+            return self.tgt
+        finally:
+            self.refresh_lock.release()
+
+    def invalidate(self, tgt):
+        with self.refresh_lock:
+            if self.tgt == tgt:
+                self.tgt, self.expires_at = None, 0.0
+
+    def service_ticket(self):
+        tgt = self.ticket_granting_ticket()
+        try:
+            return get_st(tgt)
+        except httpx.HTTPStatusError:
+            self.invalidate(tgt)
+            return get_st(self.ticket_granting_ticket())
+
+
+tickets = TicketManager()
+
 def search_symptom(q):
-    tgt = get_tgt()
-    st = get_st(tgt)
+    if local_index is not None:
+        results = local_index.search(q)
+        if results:
+            UMLS_LOOKUPS.inc(source="local")
+            return results
+    UMLS_LOOKUPS.inc(source="remote")
+    return umls_flight.do_sync(("search", q.strip().lower()), lambda: _search_symptom(q))
+
+def _search_symptom(q):
+    st = tickets.service_ticket()
     print("Querying UMLS with:", q)
-    resp = requests.get(
-        f"https://uts-ws.nlm.nih.gov/rest/search/current",
+    resp = http_client.get(
+        f"{UMLS_API_URL}/search/current",
         params={"string": q, "ticket": st, "pageSize": 5}
     )
     print("UMLS Response JSON:", resp.json())
     return resp.json().get("result", {}).get("results", [])
 
+# Relations per CUI, persisted in SQLite so walks over related conditions stay cheap.
+relation_graph = RelationGraph(
+    RelationCache(),
+    lambda cui: umls_flight.do_sync(("relations", cui), lambda: _get_related_cuis(cui)),
+)
+
 def get_related_cuis(cui):
-    tgt = get_tgt()
-    st = get_st(tgt)
-    resp = requests.get(
-        f"https://uts-ws.nlm.nih.gov/rest/content/current/CUI/{cui}/relations",
+    return relation_graph.get(cui)
+
+def prefetch_related_cuis(cuis):
+    """Relations for many CUIs at once, keyed by CUI."""
+    return relation_graph.prefetch(cuis)
+
+def related_conditions(cui, depth=2, breadth=10, max_nodes=100, labels=None):
+    return relation_graph.traverse(cui, depth=depth, breadth=breadth, max_nodes=max_nodes, labels=labels)
+
+def _get_related_cuis(cui):
+    st = tickets.service_ticket()
+    resp = http_client.get(
+        f"{UMLS_API_URL}/content/current/CUI/{cui}/relations",
         params={"ticket": st}
-    ).json()
-    return resp.get("result", [])
+    )
+    if resp.status_code == 404:  # UTS answers 404 for a concept without relations
+        return []
+    resp.raise_for_status()
+    return resp.json().get("result", [])
 
+def top_logged_symptoms(report_collection, limit=50, scan=5000):
+    """Most common symptoms in the latest saved symptom reports."""
+    counts = {}
+    for report in report_collection.find({}, {"symptoms": 1, "_id": 0}).sort("date", -1).limit(scan):
+        for symptom in str(report.get("symptoms") or "").lower().split(","):
+            symptom = symptom.strip()
+            if symptom:
+                counts[symptom] = counts.get(symptom, 0) + 1
+    return sorted(counts, key=counts.get, reverse=True)[:limit]
 
-def fallback_map_condition_to_specialist(condition: str) -> str:
-    condition = condition.lower()
-
-    rules = {
-        "rash": "dermatologist",
-        "skin": "dermatologist",
-        "itch": "dermatologist",
-        "headache": "neurologist",
-        "migraine": "neurologist",
-        "dizzy": "neurologist",
-        "breathing": "pulmonologist",
-        "asthma": "pulmonologist",
-        "cough": "pulmonologist",
-        "sugar": "endocrinologist",
-        "diabetes": "endocrinologist",
-        "chest pain": "cardiologist",
-        "heart": "cardiologist",
-        "palpitation": "cardiologist",
-        "back": "orthopedist",
-        "knee": "orthopedist",
-        "leg": "orthopedist",
-        "pain": "general physician",
-        "fever": "general physician",
-        "cold": "general physician",
-        "tired": "general physician",
-        "anxiety": "therapist",
-        "depression": "therapist",
-        "mental": "therapist",
-        "stress": "therapist",
-        "vomiting": "gastroenterologist",
-        "stomach": "gastroenterologist",
-        "abdomen": "gastroenterologist",
-        "throat": "ENT",
-        "ear": "ENT",
-        "nose": "ENT",
-        "eye": "ophthalmologist",
-        "vision": "ophthalmologist",
-        "blurry": "ophthalmologist",
-    }
-
-    for keyword, doctor in rules.items():
-        if keyword in condition:
-            return doctor
-
-    return "general physician"
+def warm_relation_cache(report_collection, top_n=50):
+    """Resolve the top logged symptoms to CUIs and prefetch their relations."""
+    started = time.perf_counter()
+    cuis = []
+    for symptom in top_logged_symptoms(report_collection, top_n):
+        try:
+            results = search_symptom(symptom)
+        except Exception as e:
+            print(f"⚠️ Could not resolve {symptom!r} for cache warming:", e)
+            continue
+        if results and results[0].get("ui"):
+            cuis.append(results[0]["ui"])
+    warmed = prefetch_related_cuis(cuis)
+    print(f"✅ Warmed UMLS relations for {len(warmed)} concepts in {time.perf_counter() - started:.1f}s")
+    return warmed
 
-def map_condition_to_specialist(condition):
-    print("CONDITION RECEIVED:", condition)
-    # Example rule-based mapping
-    rules = { "rash": "dermatologist",
+
+FALLBACK_SPECIALIST_RULES = {
+    "rash": "dermatologist",
+    "skin": "dermatologist",
+    "itch": "dermatologist",
+    "headache": "neurologist",
+    "migraine": "neurologist",
+    "dizzy": "neurologist",
+    "breathing": "pulmonologist",
+    "asthma": "pulmonologist",
+    "cough": "pulmonologist",
+    "sugar": "endocrinologist",
+    "diabetes": "endocrinologist",
+    "chest pain": "cardiologist",
+    "heart": "cardiologist",
+    "palpitation": "cardiologist",
+    "back": "orthopedist",
+    "knee": "orthopedist",
+    "leg": "orthopedist",
+    "pain": "general physician",
+    "fever": "general physician",
+    "cold": "general physician",
+    "tired": "general physician",
+    "anxiety": "therapist",
+    "depression": "therapist",
+    "mental": "therapist",
+    "stress": "therapist",
+    "vomiting": "gastroenterologist",
+    "stomach": "gastroenterologist",
+    "abdomen": "gastroenterologist",
+    "throat": "ENT",
+    "ear": "ENT",
+    "nose": "ENT",
+    "eye": "ophthalmologist",
+    "vision": "ophthalmologist",
+    "blurry": "ophthalmologist",
+}
+
+SPECIALIST_RULES = { "rash": "dermatologist",
     "skin": "dermatologist",
     "headache": "neurologist",
     "migraine": "neurologist",
@@ -104,7 +216,15 @@ def map_condition_to_specialist(condition):
     "cold": "general physician",
     "anxiety": "therapist",
     "stress": "therapist",}
-    for key in rules:
-        if key.lower() in condition.lower():
-            return rules[key]
-    return "general physician"
\ No newline at end of file
+
+# Built once; dict order is the priority when several keywords match.
+FALLBACK_SPECIALIST_MATCHER = KeywordMatcher(FALLBACK_SPECIALIST_RULES)
+SPECIALIST_MATCHER = KeywordMatcher(SPECIALIST_RULES)
+
+
+def fallback_map_condition_to_specialist(condition: str) -> str:
+    return FALLBACK_SPECIALIST_MATCHER.first(condition, "general physician")
+
+def map_condition_to_specialist(condition):
+    print("CONDITION RECEIVED:", condition)
+    return SPECIALIST_MATCHER.first(condition, "general physician")
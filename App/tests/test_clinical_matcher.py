@@ -0,0 +1,19 @@
+from utils.clinical_matcher import RED_FLAG_SYMPTOMS, apply_red_flag_advice, red_flag_matcher
+
+
+def test_red_flags_match_plural_and_inflected_forms():
+    assert red_flag_matcher.first("I have chest pains since morning", "") == RED_FLAG_SYMPTOMS["chest pain"]
+    assert red_flag_matcher.first("Severe headaches every evening", "") == RED_FLAG_SYMPTOMS["severe headache"]
+    assert red_flag_matcher.first("I keep vomiting", "") == RED_FLAG_SYMPTOMS["vomiting"]
+    assert RED_FLAG_SYMPTOMS["smell"] in apply_red_flag_advice("everything smells odd")
+
+
+def test_red_flags_follow_table_order():
+    text = "vomiting and chest pain"
+    assert red_flag_matcher.first(text) == RED_FLAG_SYMPTOMS["chest pain"]
+    assert red_flag_matcher.all(text) == [RED_FLAG_SYMPTOMS["chest pain"], RED_FLAG_SYMPTOMS["vomiting"]]
+
+
+def test_red_flags_need_a_word_start():
+    assert red_flag_matcher.first("my nosmell app", "") == ""
+    assert red_flag_matcher.first("I feel fine", "") == ""
@@ -0,0 +1,12 @@
+from models.cui_graph import RelationCache
+
+
+def test_cache_is_only_created_on_first_use(tmp_path):
+    path = tmp_path / "relations.db"
+    cache = RelationCache(str(path), max_entries=10, ttl=60)
+    assert not path.exists()
+
+    cache.set_many({"C1": [{"relatedId": "https://uts/C2"}]})
+    assert path.exists()
+    assert cache.get_many(["C1", "C3"]) == {"C1": [{"relatedId": "https://uts/C2"}]}
+    assert cache.size == 1
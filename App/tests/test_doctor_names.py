@@ -0,0 +1,111 @@
+import re
+
+import pytest
+
+from utils import doctor_available
+from utils.doctor_directory import DoctorDirectory
+from utils.doctor_names import NameIndex, norm_fields, normalize_name
+
+DOCTORS = [
+    {"_id": 1, "name": "Dr. Ramesh Kumar", "specialization": "Cardiologist", "specialization_norm": "cardiologist"},
+    {"_id": 2, "name": "Dr Ramesh Verma", "specialization": "Dermatologist", "specialization_norm": "dermatologist"},
+    {"_id": 3, "name": "Dr. Priya Sharma", "specialization": "Pediatrician", "specialization_norm": "pediatrician"},
+]
+
+
+class Cursor(list):
+    def limit(self, n):
+        return Cursor(self[:n])
+
+
+class FakeDoctors:
+    def __init__(self, docs):
+        self.docs = [{**doc, **norm_fields(doc)} for doc in docs]
+
+    def _matches(self, doc, query):
+        for field, cond in query.items():
+            if field == "$and":
+                if not all(self._matches(doc, part) for part in cond):
+                    return False
+            elif isinstance(cond, dict) and "$in" in cond:
+                if doc.get(field) not in cond["$in"]:
+                    return False
+            elif isinstance(cond, dict) and "$regex" in cond:
+                values = doc.get(field)
+                values = values if isinstance(values, list) else [values]
+                if not any(re.search(cond["$regex"], v or "") for v in values):
+                    return False
+            elif doc.get(field) != cond:
+                return False
+        return True
+
+    def find(self, query=None, projection=None):
+        return Cursor(dict(doc) for doc in self.docs if self._matches(doc, query or {}))
+
+
+@pytest.fixture
+def doctors(monkeypatch):
+    collection = FakeDoctors(DOCTORS)
+    directory = DoctorDirectory()
+    directory.collection = collection
+    directory.load()
+    monkeypatch.setattr(doctor_available, "directory", directory)
+    return collection
+
+
+def index():
+    names = NameIndex()
+    for doc in DOCTORS:
+        names.add(doc["_id"], doc["name"])
+    return names
+
+
+def test_normalize_name_drops_titles_and_punctuation():
+    assert normalize_name("Dr. Ramesh  Kumar") == "ramesh kumar"
+    assert normalize_name("Doctor PRIYA-Sharma") == "priya sharma"
+
+
+def test_misspelled_name_resolves():
+    assert index().search("Dr Rmesh Kumar") == [1]
+    assert index().search("Dr Shrama") == [3]
+
+
+def test_two_edits_on_a_short_name_is_no_match():
+    assert index().search("Dr Mahesh") == []
+
+
+def test_exact_single_match_can_book_directly(doctors):
+    doctor, exact = doctor_available.resolve_doctor("Dr Ramesh Kumar", "", doctors)
+    assert doctor["_id"] == 1 and exact
+
+
+def test_misspelled_name_needs_confirmation(doctors):
+    doctor, exact = doctor_available.resolve_doctor("Dr Rmesh Kumar", "", doctors)
+    assert doctor["_id"] == 1 and not exact
+
+
+def test_ambiguous_name_needs_confirmation(doctors):
+    doctor, exact = doctor_available.resolve_doctor("Dr Ramesh", "", doctors)
+    assert doctor["_id"] in (1, 2) and not exact
+    doctor, exact = doctor_available.resolve_doctor("Dr Ramesh", "dermatologist", doctors)
+    assert doctor["_id"] == 2 and exact
+
+
+def test_one_letter_off_is_only_a_guess(doctors):
+    # "Rajesh" is one edit from "Ramesh": a plausible typo, but maybe another doctor.
+    doctor, exact = doctor_available.resolve_doctor("Dr Rajesh Kumar", "", doctors)
+    assert doctor["_id"] == 1 and not exact
+
+
+def test_unknown_name_is_not_found(doctors):
+    assert doctor_available.resolve_doctor("Dr Mahesh", "", doctors) == (None, False)
+
+
+def test_fallback_matches_the_start_of_any_name_word():
+    doctors = FakeDoctors(DOCTORS)
+    assert doctor_available.directory.ready is False
+    assert doctor_available.resolve_doctor_ids("Dr Kumar", doctors) == [1]
+    assert doctor_available.resolve_doctor_ids("ramesh ver", doctors) == [2]
+    assert doctor_available.resolve_doctor_ids("Dr Mesh", doctors) == []
+    # Regex characters are dropped with the rest of the punctuation.
+    assert doctor_available.resolve_doctor_ids("Dr (Kumar.*", doctors) == [1]
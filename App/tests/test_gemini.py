@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+import gemini
+
+
+class FailingModel:
+    def __init__(self, error):
+        self.error = error
+
+    async def generate_content_async(self, contents, **kwargs):
+        raise self.error
+
+
+def test_only_429s_are_quota_errors():
+    assert gemini._classify(google_exceptions.ResourceExhausted("Quota exceeded")) == "quota"
+    assert gemini._classify(google_exceptions.TooManyRequests("429")) == "quota"
+    assert gemini._classify(google_exceptions.InvalidArgument("input token limit exceeded")) == "error"
+
+
+def _attempts(monkeypatch, error, times):
+    pool = gemini.KeyPool(["key"])
+    monkeypatch.setattr(gemini, "pool", pool)
+    monkeypatch.setattr(gemini, "GEMINI_TRANSPORT", None)
+    monkeypatch.setattr(pool, "model", lambda slot, model_name: FailingModel(error))
+    slot = pool.slots[0]
+
+    async def main():
+        return [
+            await gemini._attempt(slot, "prompt", gemini.DEFAULT_MODEL, {"route": "-", "prompt_class": "-"}, 5)
+            for _ in range(times)
+        ]
+
+    return slot, asyncio.run(main())
+
+
+def test_bad_requests_do_not_eject_the_key(monkeypatch):
+    slot, results = _attempts(monkeypatch, google_exceptions.InvalidArgument("bad prompt"), gemini.BREAKER_THRESHOLD + 2)
+    assert {outcome for outcome, _ in results} == {"error"}
+    assert slot.breaker.failures == 0
+    assert slot.breaker.available(time.monotonic())
+
+
+def test_bad_request_closes_a_probing_breaker(monkeypatch):
+    pool = gemini.KeyPool(["key"])
+    slot = pool.slots[0]
+    slot.breaker.open_until = time.monotonic() - 1
+    slot.breaker.failures = gemini.BREAKER_THRESHOLD
+    assert pool.acquire()[0] is slot and slot.breaker.probing
+    monkeypatch.setattr(gemini, "pool", pool)
+    monkeypatch.setattr(gemini, "GEMINI_TRANSPORT", None)
+    monkeypatch.setattr(pool, "model", lambda slot, model_name: FailingModel(google_exceptions.InvalidArgument("x")))
+    asyncio.run(gemini._attempt(slot, "prompt", gemini.DEFAULT_MODEL, {"route": "-", "prompt_class": "-"}, 5))
+    assert slot.breaker.available(time.monotonic())
+
+
+def test_server_errors_still_eject_the_key(monkeypatch):
+    slot, _ = _attempts(monkeypatch, google_exceptions.ServiceUnavailable("down"), gemini.BREAKER_THRESHOLD)
+    assert not slot.breaker.available(time.monotonic())
+
+
+class SlowStream:
+    """Streams a chunk every `interval` seconds, forever."""
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.interval)
+
+        class Chunk:
+            parts = ["x"]
+            text = "x"
+            usage_metadata = None
+        return Chunk()
+
+
+def test_stream_stops_at_the_call_deadline(monkeypatch):
+    pool = gemini.KeyPool(["key"])
+    monkeypatch.setattr(gemini, "pool", pool)
+    monkeypatch.setattr(gemini, "GEMINI_TRANSPORT", None)
+    monkeypatch.setattr(gemini, "CALL_DEADLINE", 0.3)
+    monkeypatch.setattr(gemini, "CALL_TIMEOUT", 5)
+    monkeypatch.setattr(pool, "model", lambda slot, model_name: SlowStream(0.05))
+    items = []
+    started = time.monotonic()
+    asyncio.run(gemini._stream("prompt", gemini.DEFAULT_MODEL, items.append, {"route": "-", "prompt_class": "-"}))
+    assert time.monotonic() - started < 1
+    assert items[-1] is gemini._STREAM_END
+    assert items[-2] == "⚠️ GPT error: Gemini did not answer in time."
+
+
+class HangingModel:
+    def __init__(self, started, cancelled):
+        self.started, self.cancelled = started, cancelled
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.started.append(1)
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled.append(1)
+            raise
+
+
+def test_cancelling_a_hedged_call_cancels_both_attempts(monkeypatch):
+    pool = gemini.KeyPool(["key1", "key2"])
+    started, cancelled = [], []
+    monkeypatch.setattr(gemini, "pool", pool)
+    monkeypatch.setattr(gemini, "GEMINI_TRANSPORT", None)
+    monkeypatch.setattr(gemini, "latencies", gemini.LatencyWindow())
+    monkeypatch.setattr(gemini, "HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(pool, "model", lambda slot, model_name: HangingModel(started, cancelled))
+
+    async def main():
+        slot, _ = pool.acquire()
+        call = gemini._hedged(slot, "prompt", gemini.DEFAULT_MODEL, {"route": "-", "prompt_class": "-"}, 30, {slot.index})
+        try:
+            await asyncio.wait_for(call, 0.2)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.05)
+        # Checked before asyncio.run() cancels leftover tasks on its own.
+        assert len(started) == 2
+        assert len(cancelled) == 2
+
+    asyncio.run(main())
+    assert all(not slot.breaker.probing and slot.breaker.failures == 0 for slot in pool.slots)
@@ -0,0 +1,25 @@
+import time
+
+from utils.llm_cache import SQLiteTier
+
+
+def rows(tier):
+    return {key for key, in tier.conn.execute(f"SELECT key FROM {tier.table}")}
+
+
+def test_expired_rows_are_pruned_every_n_writes(tmp_path):
+    tier = SQLiteTier(str(tmp_path / "cache.db"), prune_every=3)
+    now = time.time()
+    tier.set("old", "a", now - 10)
+    tier.set("fresh", "b", now + 3600)
+    assert rows(tier) == {"old", "fresh"}
+    tier.set("newer", "c", now + 3600)
+    assert rows(tier) == {"fresh", "newer"}
+
+
+def test_expired_rows_are_pruned_on_open(tmp_path):
+    path = str(tmp_path / "cache.db")
+    tier = SQLiteTier(path, prune_every=0)
+    tier.set("old", "a", time.time() - 10)
+    tier.set("fresh", "b", time.time() + 3600)
+    assert rows(SQLiteTier(path)) == {"fresh"}
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    flight = SingleFlight("test-cancelled-leader")
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.do("k", fn)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == [2, 2, 2]
+    assert flight.stats() == {"calls": 2, "coalesced": 3, "inflight": 0}
+
+
+def test_cancelled_follower_does_not_affect_the_others():
+    flight = SingleFlight("test-cancelled-follower")
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        quitter = asyncio.create_task(flight.do("k", fn))
+        stayer = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        quitter.cancel()
+        return await leader, await stayer
+
+    assert asyncio.run(main()) == ("answer", "answer")
+
+
+def test_leader_errors_are_shared():
+    flight = SingleFlight("test-errors")
+
+    async def fn():
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(flight.do("k", fn), flight.do("k", fn), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [ValueError, ValueError]
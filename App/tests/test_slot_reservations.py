@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from utils.slot_reservations import SlotTaken, backfill_reservations, claim_slot, claim_slot_async, slot_key
+
+
+class Reservations:
+    """In-memory collection with MongoDB's unique `_id` guarantee."""
+
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def insert_one(self, doc):
+        with self.lock:
+            if doc["_id"] in self.docs:
+                raise DuplicateKeyError("E11000 duplicate key error")
+            self.docs[doc["_id"]] = dict(doc)
+
+    def count_documents(self, query, limit=0):
+        doc = self.docs.get(query["_id"])
+        return int(doc is not None and all(doc.get(k) == v for k, v in query.items()))
+
+    def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.insert_one(doc)
+
+        class Result:
+            inserted_ids = [doc["_id"] for doc in docs]
+        return Result()
+
+
+class AsyncReservations(Reservations):
+    async def insert_one(self, doc):
+        await asyncio.sleep(0)
+        super().insert_one(doc)
+
+    async def count_documents(self, query, limit=0):
+        return super().count_documents(query, limit)
+
+
+def test_exactly_one_of_many_concurrent_sync_claims_wins():
+    reservations = Reservations()
+    bookings = 300
+    barrier = threading.Barrier(bookings)
+    outcomes = []
+
+    def book():
+        barrier.wait()
+        try:
+            claim_slot(reservations, ObjectId(), "9876543210", "Dr Ramesh", "2030-01-01", "10:00")
+            outcomes.append("booked")
+        except SlotTaken:
+            outcomes.append("conflict")
+
+    threads = [threading.Thread(target=book) for _ in range(bookings)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert outcomes.count("booked") == 1
+    assert outcomes.count("conflict") == bookings - 1
+
+
+def test_exactly_one_of_many_concurrent_async_claims_wins():
+    reservations = AsyncReservations()
+
+    async def book():
+        try:
+            await claim_slot_async(reservations, ObjectId(), "9876543210", "Dr Ramesh", "2030-01-01", "10:00")
+            return "booked"
+        except SlotTaken:
+            return "conflict"
+
+    async def main():
+        return await asyncio.gather(*(book() for _ in range(300)))
+
+    outcomes = asyncio.run(main())
+    assert outcomes.count("booked") == 1
+    assert outcomes.count("conflict") == 299
+
+
+def test_reclaiming_your_own_slot_is_a_no_op():
+    reservations = Reservations()
+    appointment_id = ObjectId()
+    claim_slot(reservations, appointment_id, "1", "Dr A", "2030-01-01", "10:00")
+    claim_slot(reservations, appointment_id, "1", "Dr A", "2030-01-01", "10:00")
+    try:
+        claim_slot(reservations, ObjectId(), "1", "Dr A", "2030-01-01", "10:00")
+    except SlotTaken:
+        pass
+    else:
+        raise AssertionError("another appointment claimed a taken slot")
+
+
+class Appointments:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        closed = query["status"]["$not"]
+        return [
+            doc for doc in self.docs
+            if doc.get("date") and doc.get("time") and not closed.search(doc.get("status") or "")
+        ]
+
+
+def test_backfill_skips_closed_appointments():
+    docs = [
+        {"_id": ObjectId(), "contact": "1", "date": "2030-01-01", "time": time, "status": status}
+        for time, status in [("09:00", "Pending"), ("10:00", "accepted"), ("11:00", "Cancelled"),
+                             ("12:00", "rejected"), ("13:00", "completed"), ("14:00", None)]
+    ]
+    reservations = Reservations()
+    assert backfill_reservations(Appointments(docs), reservations) == 3
+    assert set(reservations.docs) == {slot_key("1", "", "2030-01-01", t) for t in ("09:00", "10:00", "14:00")}
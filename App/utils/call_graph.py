@@ -0,0 +1,52 @@
+"""
+Tiny dependency graph for running LLM calls concurrently.
+
+Each node is an async function that receives the results of its
+dependencies. Nodes start as soon as their dependencies finish, so
+independent calls overlap and the latency of a route is its critical path
+instead of the sum of every call.
+"""
+import asyncio
+
+
+class CallGraph:
+    def __init__(self):
+        self.nodes = {}
+        self.tasks = {}
+
+    def add(self, name: str, fn, deps=(), when=None):
+        """
+        Register `fn(results)` under `name`.
+
+        `results` maps each dependency name to its value. If `when(results)`
+        returns False the node is skipped and its result is None.
+        Dependencies must be added before the nodes that use them.
+        """
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Unknown dependency '{dep}' for node '{name}'")
+        self.nodes[name] = (fn, tuple(deps), when)
+        return self
+
+    async def _run_node(self, name: str):
+        fn, deps, when = self.nodes[name]
+        values = await asyncio.gather(*(self.tasks[dep] for dep in deps))
+        results = dict(zip(deps, values))
+        if when is not None and not when(results):
+            return None
+        return await fn(results)
+
+    async def get(self, name: str):
+        """Await another node's result from inside a running node."""
+        return await self.tasks[name]
+
+    async def run(self) -> dict:
+        for name in self.nodes:
+            self.tasks[name] = asyncio.ensure_future(self._run_node(name))
+        try:
+            values = await asyncio.gather(*self.tasks.values())
+        except BaseException:
+            for task in self.tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(self.tasks.keys(), values))
@@ -0,0 +1,62 @@
+"""
+Shared keyword matching for specialist mapping and red flags.
+
+A `KeywordMatcher` is built once from a `{phrase: value}` table. A phrase's
+priority is its position in the table, so `first()` gives the same answer as
+walking the dict in order and taking the first phrase that is present.
+
+Each phrase is found with a plain substring search on the lowercased text
+(C speed, no regex per call), and whole-word tables confirm the hits with
+boundary patterns compiled up front. Only the start of a phrase has to be on
+a word boundary, so inflected forms ("chest pains", "severe headaches") still
+match; a missed red flag is worse than an extra note. A single alternation regex was measured
+too (benchmarks/clinical_matcher.py): CPython's regex engine tries every
+alternative at every position, which made it several times slower than
+substring search for tables of this size, on short and long texts alike.
+"""
+import re
+
+RED_FLAG_SYMPTOMS = {
+    "chest pain": "⚠️ Chest pain can be serious. Please consult a doctor immediately.",
+    "loss of smell": "👃 Loss of smell might mean a sinus issue or post-viral symptom. Keep monitoring.",
+    "smell": "👃 Smell issues often point to congestion or sinus problems.",
+    "dizziness": "⚠️ Dizziness may be a sign of dehydration or something more serious. Please rest and monitor.",
+    "shortness of breath": "⚠️ Trouble breathing could be a sign of something serious. See a doctor if it continues.",
+    "numbness": "⚠️ Numbness can be a nerve issue. Please get checked if it continues.",
+    "severe headache": "⚠️ Severe headaches that don’t go away might need medical attention.",
+    "vomiting": "⚠️ Persistent vomiting can lead to dehydration. Keep fluids up, and see a doctor if it doesn’t improve."
+}
+
+
+class KeywordMatcher:
+    def __init__(self, table: dict, whole_words: bool = False):
+        self.keys = [key.lower() for key in table]
+        self.values = list(table.values())
+        self.boundaries = [
+            re.compile(rf"\b{re.escape(key)}") if whole_words else None for key in self.keys
+        ]
+
+    def _found(self, text: str):
+        lower = text.lower()
+        for i, key in enumerate(self.keys):
+            if key in lower and (self.boundaries[i] is None or self.boundaries[i].search(lower)):
+                yield i
+
+    def matches(self, text: str):
+        """`(priority, phrase, value)` for every phrase in `text`, by priority."""
+        return [(i, self.keys[i], self.values[i]) for i in self._found(text)]
+
+    def first(self, text: str, default=None):
+        for i in self._found(text):
+            return self.values[i]
+        return default
+
+    def all(self, text: str):
+        return [self.values[i] for i in self._found(text)]
+
+
+red_flag_matcher = KeywordMatcher(RED_FLAG_SYMPTOMS, whole_words=True)
+
+
+def apply_red_flag_advice(text: str) -> str:
+    return "\n".join(red_flag_matcher.all(text))
@@ -0,0 +1,134 @@
+"""
+MongoDB index bootstrap and query-plan check.
+
+`INDEXES` declares the indexes every collection needs for the queries the
+routes actually run. `ensure_indexes(db)` creates them at startup;
+`create_indexes` is idempotent, so restarts are cheap. `check_query_plans(db)`
+explains each query shape in `QUERY_SHAPES` and reports any that fall back to
+a collection scan:
+
+    python -m utils.db_indexes            # create missing indexes
+    python -m utils.db_indexes --check    # also explain every query shape, exit 1 on COLLSCAN
+
+Keep both tables in step with the code: when a route queries a new field or
+sorts a new way, add its shape here.
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+
+load_dotenv()
+
+INDEXES = {
+    "users": [
+        IndexModel([("phone", ASCENDING)], name="phone"),
+    ],
+    "appointments": [
+        # Slot checks by doctor name, /doctor-slots, doctor_available.
+        IndexModel([("doctor_name", ASCENDING), ("date", ASCENDING), ("time", ASCENDING)], name="doctor_date_time"),
+        # Doctor dashboard and booked-slot aggregation.
+        IndexModel([("contact", ASCENDING), ("date", ASCENDING), ("time", ASCENDING)], name="contact_date_time"),
+        IndexModel([("phone", ASCENDING)], name="phone"),
+    ],
+    "doctors": [
+        IndexModel([("contact", ASCENDING)], name="contact"),
+        IndexModel([("specialization", ASCENDING), ("city", ASCENDING)], name="specialization_city"),
+        IndexModel([("city", ASCENDING)], name="city"),
+        IndexModel([("specialist", ASCENDING)], name="specialist"),
+        # Normalized copies from utils/doctor_names.py, for name and specialization lookups.
+        IndexModel([("name_tokens", ASCENDING)], name="name_tokens"),
+        IndexModel([("specialization_norm", ASCENDING)], name="specialization_norm"),
+    ],
+    "symptom_reports": [
+        IndexModel([("phone", ASCENDING), ("date", DESCENDING)], name="phone_date"),
+        IndexModel([("date", DESCENDING)], name="date"),
+    ],
+    "report": [
+        IndexModel([("phone", ASCENDING), ("type", ASCENDING), ("timestamp", DESCENDING)], name="phone_type_timestamp"),
+    ],
+    "chat-hi": [
+        IndexModel([("phone", ASCENDING), ("created_at", DESCENDING)], name="phone_created_at"),
+    ],
+}
+
+# (route or caller, collection, filter, sort) with sample values. Doctor names
+# are matched on `name_tokens` words with an anchored prefix, which can use its index.
+QUERY_SHAPES = [
+    ("/ask", "users", {"phone": "0"}, None),
+    ("/get-doctor-appointment", "appointments", {"contact": "0"}, None),
+    ("/all_doctors booked slots", "appointments",
+     {"contact": {"$in": ["0"]}, "status": {"$regex": "^accepted$", "$options": "i"}}, None),
+    ("check_slot_availability", "appointments", {"doctor_name": "x", "date": "2025-01-01", "time": "10:00"}, None),
+    ("/doctor-slots", "appointments", {"doctor_name": "x", "date": "2025-01-01"}, None),
+    ("/get-user-appointments", "appointments", {"phone": "0"}, None),
+    ("/doctor-login", "doctors", {"contact": "0"}, None),
+    ("/all_doctors", "doctors", {"specialization": "x", "city": "x"}, None),
+    ("/all_doctors by city", "doctors", {"city": "x"}, None),
+    ("/find-doctors", "doctors", {"specialization": "x"}, None),
+    ("get_doctors_by_specialist", "doctors", {"specialist": "x"}, None),
+    ("check_doctor_availability", "doctors", {"_id": {"$in": []}, "specialization_norm": "x"}, None),
+    ("check_doctor_availability by specialization", "doctors", {"specialization_norm": "x"}, None),
+    ("resolve_doctor_ids", "doctors", {"$and": [{"name_tokens": {"$regex": "^x"}}]}, None),
+    ("/get-reports", "symptom_reports", {"phone": "0"}, None),
+    ("get_health_summary_from_symptoms", "symptom_reports", {"phone": "0"}, [("date", DESCENDING)]),
+    ("top_logged_symptoms", "symptom_reports", {}, [("date", DESCENDING)]),
+    ("get_latest_reports", "report", {"phone": "0", "type": "lab_report"}, [("timestamp", DESCENDING)]),
+    ("/history", "chat-hi", {"phone": "0"}, [("created_at", DESCENDING)]),
+]
+
+
+def ensure_indexes(db) -> dict:
+    """Create every declared index that is missing; returns {collection: [index names]}."""
+    created = {}
+    for name, indexes in INDEXES.items():
+        created[name] = db[name].create_indexes(indexes)
+    return created
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def check_query_plans(db):
+    """(caller, collection, winning plan stages) for every shape whose plan contains a COLLSCAN."""
+    problems = []
+    for caller, name, query, sort in QUERY_SHAPES:
+        cursor = db[name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_stages(plan))
+        if "COLLSCAN" in stages:
+            problems.append((caller, name, stages))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check query plans.")
+    parser.add_argument("--check", action="store_true", help="explain every query shape, exit 1 on COLLSCAN")
+    parser.add_argument("--db", default="ruralbot")
+    args = parser.parse_args()
+    db = MongoClient(os.getenv("MONGO_URL"), tls=True)[args.db]
+    for name, indexes in ensure_indexes(db).items():
+        print(f"✅ {name}: {', '.join(indexes)}")
+    if args.check:
+        problems = check_query_plans(db)
+        for caller, name, stages in problems:
+            print(f"⚠️ {caller} scans all of {name}: {' > '.join(stages)}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ All {len(QUERY_SHAPES)} query shapes use an index")
+
+
+if __name__ == "__main__":
+    main()
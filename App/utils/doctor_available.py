@@ -1,9 +1,29 @@
 
+import re
 from dateparser import parse
 from dateparser.search import search_dates
 from pymongo.collection import Collection
 from collections import defaultdict
 from datetime import date as dt_date
+from utils.doctor_directory import directory
+from utils.doctor_names import name_tokens, normalize_name, normalize_text
+
+
+def resolve_doctor_ids(name: str, doctor_collection: Collection, limit: int = 10) -> list:
+    """
+    IDs of the doctors `name` refers to, best match first. Uses the fuzzy name
+    index when the directory is loaded, else every word as a prefix of some
+    word of the name ("Dr Kumar" finds "Ramesh Kumar"), on the indexed
+    `name_tokens` array.
+    """
+    if directory.ready:
+        return directory.resolve_name(name, limit)
+    words = name_tokens(name)
+    if not words:
+        return []
+    query = {"$and": [{"name_tokens": {"$regex": "^" + re.escape(word)}} for word in words]}
+    cursor = doctor_collection.find(query, {"_id": 1}).limit(limit)
+    return [doc["_id"] for doc in cursor]
 
 def check_doctor_availability(name: str, specialization:str, date: str = "", city: str = "", doctor_collection: Collection = None, appointment_collection: Collection = None) -> str:
     """
@@ -14,12 +34,15 @@ def check_doctor_availability(name: str, specialization:str, date: str = "", cit
         return "⚠️ Please provide a doctor's name or specialization."
     query={}
     if name:
-        query["name"] = {"$regex": f".*{name}.*", "$options": "i"} # Fuzzy match anywhere in the name
+        ids = resolve_doctor_ids(name, doctor_collection)
+        if not ids:
+            return f"❌ No doctors found matching '{name}' in {city or 'your area'}."
+        query["_id"] = {"$in": ids}
     if specialization:
-        query["specialization"] = {"$regex": specialization, "$options": "i"}
+        query["specialization_norm"] = normalize_text(specialization)
 
     if city:
-        query["city"] = {"$regex": city, "$options": "i"}
+        query["city"] = {"$regex": re.escape(city), "$options": "i"}
     matching_doctors = list(doctor_collection.find(query))
     if not matching_doctors:
         return f"❌ No doctors found matching '{name or specialization}' in {city or 'your area'}."
@@ -35,42 +58,15 @@ def check_doctor_availability(name: str, specialization:str, date: str = "", cit
         except:
             return "⚠️ Invalid date format. Use YYYY-MM-DD."
     responses = []
-    for doc in matching_doctors:
+    for doc, grouped_slots in free_slots(matching_doctors, appointment_collection, target_date, today):
         doc_name = doc.get("name", "Unknown")
-        slots = doc.get("available_slots", {})
         doc_city = doc.get("city", "N/A")
         doc_spec = doc.get("specialization", "N/A")
 
-        # Filter by date (if provided) and unbooked
-        free_slots=[]
-
-        if target_date:
-            if target_date not in slots:
-                responses.append(f"⚠️ {doc_name} ({doc_spec} in {doc_city}) is not available on {target_date}.")
-                continue
-
-        for slot_date, times in slots.items():
-            if target_date  and slot_date != target_date:
-                continue
-            if slot_date < today:
-                continue
-        
-            for time in times:
-                is_booked = appointment_collection.find_one({  # Must be inside the date check
-                        "doctor_name": doc_name,
-                        "date": slot_date,
-                        "time": time
-                    })
-                if not is_booked:
-                    free_slots.append({
-                    "date": slot_date,
-                    "time": time
-            })
-
-        grouped_slots = defaultdict(list)
-        for slot in free_slots:
-            grouped_slots[slot["date"]].append(slot["time"])
-            
+        if target_date and target_date not in doc.get("available_slots", {}):
+            responses.append(f"⚠️ {doc_name} ({doc_spec} in {doc_city}) is not available on {target_date}.")
+            continue
+
         if grouped_slots:
             slot_strings = []
             for date, times in grouped_slots.items():
@@ -83,11 +79,74 @@ def check_doctor_availability(name: str, specialization:str, date: str = "", cit
     responses = list(set(responses)) 
     return "\n\n".join(responses)
 
+
+def booked_slots(appointment_collection: Collection, doctor_names, dates) -> set:
+    """(doctor_name, date, time) of every booked slot for these doctors and dates, in one query."""
+    if not doctor_names or not dates:
+        return set()
+    cursor = appointment_collection.find(
+        {"doctor_name": {"$in": sorted(doctor_names)}, "date": {"$in": sorted(dates)}},
+        {"_id": 0, "doctor_name": 1, "date": 1, "time": 1},
+    )
+    return {(appt.get("doctor_name"), appt.get("date"), appt.get("time")) for appt in cursor}
+
+
+def free_slots(doctors, appointment_collection: Collection, target_date: str, today: str):
+    """
+    (doctor, {date: [free times]}) for each doctor, from today on (or only
+    `target_date`). Bookings for all of them are fetched with one query and
+    subtracted in memory, instead of one find_one per slot.
+    """
+    wanted = []
+    for doc in doctors:
+        slots = doc.get("available_slots", {})
+        dates = [d for d in slots if (not target_date or d == target_date) and d >= today]
+        wanted.append((doc, dates))
+    booked = booked_slots(
+        appointment_collection,
+        {doc.get("name", "Unknown") for doc, dates in wanted if dates},
+        {d for _, dates in wanted for d in dates},
+    )
+    result = []
+    for doc, dates in wanted:
+        doc_name = doc.get("name", "Unknown")
+        grouped = defaultdict(list)
+        for slot_date in dates:
+            for time in doc["available_slots"][slot_date]:
+                if (doc_name, slot_date, time) not in booked:
+                    grouped[slot_date].append(time)
+        result.append((doc, dict(grouped)))
+    return result
+
+
+def resolve_doctor(name: str, specialization: str, doctor_collection: Collection):
+    """
+    `(doctor, exact)` for the doctor `name` most likely means, or `(None, False)`.
+    `exact` is True only when a single doctor has every word of `name` in
+    their name as typed; anything else is a guess the user has to confirm.
+    """
+    ids = resolve_doctor_ids(name, doctor_collection)
+    if not ids:
+        return None, False
+    query = {"_id": {"$in": ids}}
+    if specialization:
+        query["specialization_norm"] = normalize_text(specialization)
+    doctors = sorted(doctor_collection.find(query), key=lambda doc: ids.index(doc["_id"]))
+    if not doctors:
+        return None, False
+    words = set(name_tokens(name))
+    exact = [doc for doc in doctors if words <= set(name_tokens(doc.get("name", "")))]
+    if len(exact) == 1:
+        return exact[0], True
+    return doctors[0], False
+
   
 def get_all_specializations(doctor_collection):
     """
     Return a list of unique specializations from the doctor collection.
     """
+    if directory.ready:
+        return directory.specializations()
     return list(doctor_collection.distinct("specialization"))
 
 
@@ -98,18 +157,17 @@ def extract_doctor_name(query: str, doctor_collection)->str:
     1. Match 'Dr. Name' or 'Doctor Name'
     2. Else, match any known name from DB inside query
     """
-    import re
     name_match = re.search(r"(Dr\.?\s?\w+|Doctor\s+\w+)", query, re.I) #re.search(pattern, string, flags) Yeh function poore string me pattern ko match karne ki koshish karta hai.
     if name_match:
         raw_name = name_match.group(1).strip()
         cleaned = re.sub(r"\b(dr\.?|doctor)\b", "", raw_name, flags=re.I).strip()
         return cleaned
+    if directory.ready:
+        return directory.name_in(query)
     all_doctors = doctor_collection.find({})
     for doc in all_doctors:
-        doc_name = doc.get("name", "").lower()
-        # ✅ Clean the name using re.sub to remove titles like Dr. / Doctor
-        clean_name = re.sub(r"\b(dr\.?|doctor)\b", "", doc_name, flags=re.I)
-        name_parts = clean_name.strip().split()
+        # ✅ Clean the name to remove titles like Dr. / Doctor
+        name_parts = normalize_name(doc.get("name", "")).split()
         for part in name_parts:
             if part in query.lower():
                 return doc.get("name")
@@ -0,0 +1,244 @@
+"""
+Process-local replica of the doctor directory.
+
+The `doctors` collection is small and changes rarely, yet the agent, the
+booking graph and several routes query it on every call. `DoctorDirectory`
+keeps a copy in memory with the lookups they need: by contact, by
+specialization, by city, the fuzzy name index from utils/doctor_names.py and
+the set of specializations.
+Lookups take microseconds and return copies, so callers can edit them freely.
+
+`start(collection)` opens a change stream, loads everything and then follows
+the stream in a background thread. The stream is opened first so nothing
+written during the load is missed; replaying a change the load already saw
+is harmless. Change streams need a replica set (Atlas has one); against
+a standalone server or a local stand-in the watcher falls back to reloading
+every DOCTOR_DIRECTORY_POLL_SECONDS. Routes that write doctors also call
+`upsert()`, so they read their own writes without waiting for either.
+"""
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.doctor_names import NameIndex
+from utils.metrics import CallbackMetric, Counter
+
+load_dotenv()
+
+POLL_SECONDS = float(os.getenv("DOCTOR_DIRECTORY_POLL_SECONDS", "30"))
+RETRY_SECONDS = 5.0
+
+DIRECTORY_UPDATES = Counter(
+    "doctor_directory_updates_total", "Doctor directory refreshes by source", ["source"]
+)
+
+
+class DoctorDirectory:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.collection = None
+        self.ready = False
+        self.mode = "off"  # "change_stream" or "polling" once started
+        self.loaded_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.by_id = {}
+        self.by_contact = {}
+        self.by_specialization = defaultdict(set)
+        self.by_city = defaultdict(set)
+        self.names = NameIndex()
+
+    # -------------------------------------------------------------- updates
+
+    def _add(self, doc):
+        _id = doc["_id"]
+        self.by_id[_id] = doc
+        if doc.get("contact"):
+            self.by_contact[doc["contact"]] = _id
+        self.by_specialization[doc.get("specialization")].add(_id)
+        self.by_city[doc.get("city")].add(_id)
+        self.names.add(_id, doc.get("name", ""))
+
+    def _remove(self, _id):
+        doc = self.by_id.pop(_id, None)
+        if doc is None:
+            return
+        if self.by_contact.get(doc.get("contact")) == _id:
+            del self.by_contact[doc["contact"]]
+        for index, key in ((self.by_specialization, doc.get("specialization")), (self.by_city, doc.get("city"))):
+            index[key].discard(_id)
+            if not index[key]:
+                del index[key]
+        self.names.remove(_id)
+
+    def load(self):
+        docs = list(self.collection.find({}))
+        with self.lock:
+            # Stays False if a document can't be indexed, so lookups go to MongoDB.
+            self.ready = False
+            self._reset()
+            for doc in docs:
+                self._add(doc)
+            self.ready = True
+            self.loaded_at = time.time()
+        return len(docs)
+
+    def upsert(self, doc: dict):
+        with self.lock:
+            self._remove(doc["_id"])
+            self._add(dict(doc))
+
+    def delete(self, _id):
+        with self.lock:
+            self._remove(_id)
+
+    def start(self, collection, poll_seconds: float = POLL_SECONDS):
+        """Load the directory now and keep it fresh from a daemon thread."""
+        self.collection = collection
+        try:
+            stream = self._watch()
+        except OperationFailure as e:
+            # Standalone servers have no change streams (code 40573); poll instead.
+            print("⚠️ Doctor directory: change streams unavailable, polling instead:", e)
+            stream = None
+        try:
+            self.load()
+        except Exception:
+            if stream is not None:
+                stream.close()
+            raise
+        DIRECTORY_UPDATES.inc(source="load")
+        if stream is None:
+            target, args = self._poll, (poll_seconds,)
+        else:
+            target, args = self._follow, (stream, poll_seconds)
+        threading.Thread(target=target, args=args, name="doctor-directory", daemon=True).start()
+
+    def _watch(self):
+        stream = self.collection.watch(full_document="updateLookup")
+        self.mode = "change_stream"
+        return stream
+
+    def _follow(self, stream, poll_seconds: float):
+        while True:
+            try:
+                if stream is None:
+                    # Reopen before reloading, as in start().
+                    stream = self._watch()
+                    self.load()
+                    DIRECTORY_UPDATES.inc(source="load")
+                with stream:
+                    for change in stream:
+                        try:
+                            self._apply(change)
+                        except PyMongoError:
+                            raise
+                        except Exception as e:
+                            print("⚠️ Doctor directory: could not apply a change, reloading:", e)
+                            self.load()
+                            DIRECTORY_UPDATES.inc(source="load")
+                stream = None  # closed after an invalidate; reopen
+            except OperationFailure as e:
+                print("⚠️ Doctor directory: change streams unavailable, polling instead:", e)
+                self._poll(poll_seconds)
+                return
+            except Exception as e:
+                # Serve from MongoDB until the directory is reloaded.
+                self.ready = False
+                print("⚠️ Doctor directory: change stream lost, reloading:", e)
+                if stream is not None:
+                    stream.close()
+                stream = None
+                time.sleep(RETRY_SECONDS)
+
+    def _apply(self, change: dict):
+        op = change["operationType"]
+        if op in ("insert", "update", "replace"):
+            doc = change.get("fullDocument")
+            if doc is None:  # deleted again before the lookup ran
+                self.delete(change["documentKey"]["_id"])
+            else:
+                self.upsert(doc)
+        elif op == "delete":
+            self.delete(change["documentKey"]["_id"])
+        else:  # drop, rename, invalidate
+            self.load()
+        DIRECTORY_UPDATES.inc(source=op)
+
+    def _poll(self, poll_seconds: float):
+        self.mode = "polling"
+        while True:
+            time.sleep(poll_seconds)
+            try:
+                self.load()
+                DIRECTORY_UPDATES.inc(source="poll")
+            except Exception as e:
+                print("⚠️ Doctor directory poll failed:", e)
+
+    # -------------------------------------------------------------- lookups
+
+    @staticmethod
+    def _copy(doc, with_id: bool):
+        doc = dict(doc)
+        if not with_id:
+            doc.pop("_id", None)
+        return doc
+
+    def get_by_contact(self, contact: str, with_id: bool = True):
+        with self.lock:
+            _id = self.by_contact.get(contact)
+            return self._copy(self.by_id[_id], with_id) if _id is not None else None
+
+    def find(self, specialization: str = None, city: str = None, with_id: bool = True):
+        """Doctors whose specialization and city equal the given values (None means any)."""
+        with self.lock:
+            ids = None
+            for index, value in ((self.by_specialization, specialization), (self.by_city, city)):
+                if value is not None:
+                    matches = index.get(value, set())
+                    ids = matches if ids is None else ids & matches
+            # Keep load order, like an unsorted find().
+            docs = [doc for _id, doc in self.by_id.items() if ids is None or _id in ids]
+            return [self._copy(doc, with_id) for doc in docs]
+
+    def specializations(self):
+        with self.lock:
+            return [spec for spec in self.by_specialization if spec]
+
+    def name_in(self, text: str) -> str:
+        """Name of the first doctor (in load order) with a name part among the words of `text`."""
+        words = set(re.findall(r"\w+", (text or "").lower()))
+        with self.lock:
+            ids = set()
+            for word in words:
+                ids |= self.names.token_ids.get(word, set())
+            for _id, doc in self.by_id.items():
+                if _id in ids:
+                    return doc.get("name")
+        return ""
+
+    def resolve_name(self, text: str, limit: int = 10):
+        """IDs of the doctors `text` most likely refers to, typos allowed; see NameIndex.search."""
+        with self.lock:
+            return self.names.search(text, limit)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "doctors": len(self.by_id),
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+
+directory = DoctorDirectory()
+
+CallbackMetric(
+    "doctor_directory_size", "Doctors in the in-memory directory", [], lambda: {(): len(directory.by_id)},
+)
@@ -0,0 +1,160 @@
+"""
+Doctor name normalization and fuzzy resolution.
+
+Doctor documents carry `name_norm`, `name_tokens` and `specialization_norm`
+(lowercased, titles and punctuation removed; `name_tokens` is the name split
+into words). Lookups can then match exactly, or by an anchored prefix on any
+word of the name, on an indexed field instead of an unanchored
+case-insensitive regex built from user text.
+
+`NameIndex` resolves what users actually type ("Dr Rmesh", "ramesh kumar",
+"Ram") to doctor IDs. Candidate name parts are found by shared trigrams, then
+checked with an edit distance (transpositions count as one edit) that allows
+more typos in longer words. A query word also matches a name part it is a
+prefix of, the way the old `.*name.*` regex did.
+"""
+import re
+from collections import defaultdict
+
+from pymongo import UpdateOne
+
+TITLE_RE = re.compile(r"\b(dr|doctor)\b\.?", re.I)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w ]+", " ", (text or "").lower())).strip()
+
+
+def normalize_name(name: str) -> str:
+    """Lowercased, without titles or punctuation: "Dr. Ramesh  Kumar" -> "ramesh kumar"."""
+    return normalize_text(TITLE_RE.sub(" ", name or ""))
+
+
+def name_tokens(name: str):
+    return normalize_name(name).split()
+
+
+def norm_fields(doc: dict) -> dict:
+    """The normalized fields stored on a doctor document."""
+    return {
+        "name_norm": normalize_name(doc.get("name", "")),
+        "name_tokens": name_tokens(doc.get("name", "")),
+        "specialization_norm": normalize_text(doc.get("specialization", "")),
+    }
+
+
+def backfill_norm_fields(doctor_collection) -> int:
+    """Set the normalized fields wherever they are missing or stale; returns the number updated."""
+    updates = []
+    projection = {"name": 1, "specialization": 1, "name_norm": 1, "name_tokens": 1, "specialization_norm": 1}
+    for doc in doctor_collection.find({}, projection):
+        fields = norm_fields(doc)
+        if any(doc.get(key) != value for key, value in fields.items()):
+            updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+    if updates:
+        doctor_collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def _trigrams(token: str):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(token: str) -> int:
+    # Strict on purpose: with two edits on six letters "mahesh" and "rajesh" both became "ramesh".
+    return 0 if len(token) <= 3 else 1 if len(token) <= 7 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or `limit + 1` as soon as it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class NameIndex:
+    """Trigram index over the name parts of doctors, keyed by doctor ID."""
+
+    def __init__(self):
+        self.names = {}                   # id -> name tokens
+        self.token_ids = defaultdict(set)  # name token -> ids
+        self.gram_tokens = defaultdict(set)  # trigram -> name tokens
+
+    def add(self, _id, name: str):
+        self.remove(_id)
+        tokens = name_tokens(name)
+        self.names[_id] = tokens
+        for token in tokens:
+            if not self.token_ids[token]:
+                for gram in _trigrams(token):
+                    self.gram_tokens[gram].add(token)
+            self.token_ids[token].add(_id)
+
+    def remove(self, _id):
+        for token in self.names.pop(_id, ()):
+            self.token_ids[token].discard(_id)
+            if not self.token_ids[token]:
+                del self.token_ids[token]
+                for gram in _trigrams(token):
+                    self.gram_tokens[gram].discard(token)
+                    if not self.gram_tokens[gram]:
+                        del self.gram_tokens[gram]
+
+    def _token_matches(self, word: str):
+        """{name token: similarity in (0, 1]} for the name parts `word` may refer to."""
+        if word in self.token_ids:
+            return {word: 1.0}
+        candidates = set()
+        for gram in _trigrams(word):
+            candidates |= self.gram_tokens.get(gram, set())
+        limit = max_typos(word)
+        found = {}
+        for token in candidates:
+            if len(word) >= 3 and token.startswith(word):
+                found[token] = len(word) / len(token)
+                continue
+            distance = edit_distance(word, token, limit)
+            if distance <= limit:
+                found[token] = 1 - distance / max(len(word), len(token))
+        return found
+
+    def search(self, text: str, limit: int = 10):
+        """
+        IDs of the doctors `text` most likely names, best first. Doctors that
+        match more of the query words rank first; if some of those match every
+        word exactly, only they are returned.
+        """
+        words = name_tokens(text)
+        if not words:
+            return []
+        scores = defaultdict(lambda: [0, 0.0, 0])  # id -> [words matched, similarity, exact words]
+        for word in words:
+            best = {}
+            for token, similarity in self._token_matches(word).items():
+                for _id in self.token_ids[token]:
+                    best[_id] = max(best.get(_id, 0.0), similarity)
+            for _id, similarity in best.items():
+                score = scores[_id]
+                score[0] += 1
+                score[1] += similarity
+                score[2] += similarity == 1.0
+        if not scores:
+            return []
+        top = max(score[0] for score in scores.values())
+        ranked = [(_id, score) for _id, score in scores.items() if score[0] == top]
+        if any(score[2] == top for _, score in ranked):
+            ranked = [(_id, score) for _id, score in ranked if score[2] == top]
+        ranked.sort(key=lambda item: -item[1][1])
+        return [_id for _id, _ in ranked[:limit]]
@@ -0,0 +1,163 @@
+"""
+Shared outbound HTTP layer for UMLS, LocationIQ and Firebase.
+
+One pooled `httpx.AsyncClient` per upstream host, each with its own
+connection limit and keep-alive pool, so a slow host can't starve the others
+and repeat calls skip the TLS handshake. Every request gets default timeouts
+and retries with exponential backoff on connection errors and 429/5xx
+responses. Non-idempotent requests (POST) are only retried when the request
+never reached the server, unless the caller passes `retry=True`.
+
+The clients live on a private event loop, the same way `gemini.py` does it,
+so async handlers (`await get_async(...)`) and sync code in threads
+(`get(...)`) share one set of connections.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+from utils.metrics import Counter, Histogram
+
+load_dotenv()
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.25"))  # first retry delay, doubled each time
+MAX_BACKOFF = 5.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Errors raised before the request was sent, safe to retry for any method.
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+DEFAULT_HEADERS = {"User-Agent": "ruralbot-agent"}
+
+HTTP_REQUESTS = Counter(
+    "http_client_requests_total", "Outbound HTTP requests by upstream host and outcome", ["host", "outcome"]
+)
+HTTP_LATENCY = Histogram(
+    "http_client_request_duration_seconds", "Latency of outbound HTTP requests, retries included", ["host"],
+    (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+
+_clients = {}
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def _client(host: str) -> httpx.AsyncClient:
+    # Only called on the worker loop, so no lock is needed.
+    client = _clients.get(host)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            headers=DEFAULT_HEADERS,
+        )
+        _clients[host] = client
+    return client
+
+
+def _backoff(attempt: int, response: httpx.Response = None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF)
+    return min(BACKOFF * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+
+async def _send(method: str, url: str, retries: int, retry: bool, **kwargs) -> httpx.Response:
+    host = urlsplit(url).netloc
+    client = _client(host)
+    retry_any = retry or method in IDEMPOTENT_METHODS
+    started = time.perf_counter()
+    attempt = 0
+    try:
+        while True:
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= retries or not (retry_any or isinstance(e, NOT_SENT_ERRORS)):
+                    HTTP_REQUESTS.inc(host=host, outcome=type(e).__name__)
+                    raise
+                HTTP_REQUESTS.inc(host=host, outcome="retry")
+                await asyncio.sleep(_backoff(attempt))
+            else:
+                if response.status_code in RETRY_STATUSES and retry_any and attempt < retries:
+                    HTTP_REQUESTS.inc(host=host, outcome="retry")
+                    await asyncio.sleep(_backoff(attempt, response))
+                else:
+                    HTTP_REQUESTS.inc(host=host, outcome=str(response.status_code))
+                    return response
+            attempt += 1
+    finally:
+        HTTP_LATENCY.observe(time.perf_counter() - started, host=host)
+
+
+async def request_async(method: str, url: str, retries: int = RETRIES, retry: bool = False, **kwargs) -> httpx.Response:
+    """
+    Send a request through the shared pool. Keyword arguments go to
+    `httpx.AsyncClient.request` (params, data, json, headers, timeout).
+    """
+    coro = _send(method.upper(), url, retries, retry, **kwargs)
+    loop = _worker_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def request(method: str, url: str, retries: int = RETRIES, retry: bool = False, **kwargs) -> httpx.Response:
+    """Blocking version of `request_async` for sync code. Never call it on an event loop."""
+    coro = _send(method.upper(), url, retries, retry, **kwargs)
+    return asyncio.run_coroutine_threadsafe(coro, _worker_loop()).result()
+
+
+async def get_async(url: str, **kwargs) -> httpx.Response:
+    return await request_async("GET", url, **kwargs)
+
+
+async def post_async(url: str, **kwargs) -> httpx.Response:
+    return await request_async("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+async def _close_all():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def close():
+    """Close every pooled connection; called on app shutdown."""
+    if _loop is not None:
+        asyncio.run_coroutine_threadsafe(_close_all(), _loop).result(timeout=10)
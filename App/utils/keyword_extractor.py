@@ -0,0 +1,235 @@
+"""
+Local fast path for clinical keyword extraction.
+
+Turns messages like "my head hurts since morning" into "headache" with a
+symptom lexicon and a few body-part templates instead of a Gemini round trip.
+The lexicon starts from the keys of `FALLBACK_SPECIALIST_RULES` and adds a
+curated synonym table (including common Hinglish words our users type).
+
+`match_keyword(text)` returns the keyword when the match is confident enough
+and None otherwise, in which case the caller asks the LLM as before. Every
+lookup is counted so the hit rate shows up in /stats and /metrics.
+"""
+import os
+import re
+import threading
+
+from dotenv import load_dotenv
+
+from models.umlsclient import FALLBACK_SPECIALIST_RULES
+from utils.metrics import Counter
+
+load_dotenv()
+
+MIN_CONFIDENCE = float(os.getenv("KEYWORD_FAST_PATH_MIN_CONFIDENCE", "0.75"))
+
+# How the specialist-rule keys read as a symptom. None means the key is a
+# body part or topic that only makes sense through the templates below.
+FALLBACK_KEY_CANONICAL = {
+    "itch": "itching",
+    "dizzy": "dizziness",
+    "breathing": "shortness of breath",
+    "sugar": "diabetes",
+    "palpitation": "palpitations",
+    "cold": "common cold",
+    "tired": "fatigue",
+    "blurry": "blurred vision",
+    "skin": None,
+    "heart": None,
+    "back": None,
+    "knee": None,
+    "leg": None,
+    "mental": None,
+    "stomach": None,
+    "abdomen": None,
+    "throat": None,
+    "ear": None,
+    "nose": None,
+    "eye": None,
+    "vision": None,
+}
+
+SYMPTOM_SYNONYMS = {
+    "fever": ["fever", "feverish", "high temperature", "temperature", "bukhar", "bukhaar"],
+    "cough": ["cough", "coughing", "khansi", "khasi"],
+    "dry cough": ["dry cough"],
+    "headache": ["headache", "headaches", "head ache", "sir dard", "sar dard", "head is pounding", "pounding head"],
+    "migraine": ["migraine", "migraines"],
+    "dizziness": ["dizziness", "dizzy", "lightheaded", "light headed", "vertigo", "chakkar", "room is spinning"],
+    "shortness of breath": [
+        "shortness of breath", "short of breath", "breathless", "breathlessness",
+        "can't breathe", "cannot breathe", "difficulty breathing", "trouble breathing",
+        "hard to breathe", "breathing problem", "saans",
+    ],
+    "asthma": ["asthma", "wheezing", "wheeze"],
+    "chest pain": ["chest pain", "chest tightness", "tight chest", "pain in chest"],
+    "palpitations": ["palpitations", "heart racing", "racing heart", "heart is racing", "fast heartbeat", "heart pounding"],
+    "rash": ["rash", "rashes", "hives", "red spots"],
+    "itching": ["itching", "itchy", "khujli"],
+    "diabetes": ["diabetes", "diabetic", "high sugar", "blood sugar"],
+    "common cold": ["common cold", "runny nose", "blocked nose", "stuffy nose", "sneezing", "nazla", "zukam"],
+    "flu": ["flu", "influenza"],
+    "fatigue": ["fatigue", "tiredness", "exhausted", "exhaustion", "weakness", "no energy", "kamzori"],
+    "anxiety": ["anxiety", "anxious", "panic attack", "panic attacks", "nervousness"],
+    "depression": ["depression", "depressed", "hopeless", "feeling low"],
+    "stress": ["stress", "stressed"],
+    "insomnia": ["insomnia", "can't sleep", "cannot sleep", "trouble sleeping", "sleepless"],
+    "vomiting": ["vomiting", "vomit", "vomited", "throwing up", "threw up", "ulti"],
+    "nausea": ["nausea", "nauseous", "queasy", "feel like vomiting"],
+    "diarrhea": ["diarrhea", "diarrhoea", "loose motion", "loose motions", "loose stools", "dast"],
+    "constipation": ["constipation", "constipated"],
+    "stomach pain": ["stomach pain", "stomach ache", "stomachache", "tummy ache", "belly pain", "abdominal pain", "pet dard", "cramps"],
+    "acidity": ["acidity", "heartburn", "acid reflux", "gas trouble"],
+    "blurred vision": ["blurred vision", "blurry vision", "can't see clearly", "cannot see clearly"],
+    "red eye": ["red eye", "red eyes", "pink eye", "eye infection"],
+    "toothache": ["toothache", "tooth ache", "tooth pain"],
+    "sore throat": ["sore throat", "scratchy throat", "throat infection", "gala kharab"],
+    "joint pain": ["joint pain", "joints pain", "arthritis"],
+    "body ache": ["body ache", "body aches", "body pain", "aching all over"],
+    "numbness": ["numbness", "numb", "tingling", "pins and needles"],
+    "loss of smell": ["loss of smell", "can't smell", "cannot smell", "lost my sense of smell"],
+    "burning urination": ["burning urination", "burning while urinating", "painful urination", "burning pee"],
+    "chills": ["chills", "shivering"],
+    "swelling": ["swelling", "swollen"],
+}
+
+# Too vague to search UMLS with on their own; only used when nothing better matched.
+GENERIC_TERMS = {"pain", "sick", "unwell", "not feeling well"}
+
+BODY_PARTS = {
+    "head": "headache",
+    "stomach": "stomach pain",
+    "tummy": "stomach pain",
+    "belly": "stomach pain",
+    "abdomen": "stomach pain",
+    "chest": "chest pain",
+    "heart": "chest pain",
+    "back": "back pain",
+    "lower back": "back pain",
+    "throat": "sore throat",
+    "ear": "ear pain",
+    "ears": "ear pain",
+    "eye": "eye pain",
+    "eyes": "eye pain",
+    "tooth": "toothache",
+    "teeth": "toothache",
+    "knee": "knee pain",
+    "knees": "knee pain",
+    "leg": "leg pain",
+    "legs": "leg pain",
+    "joint": "joint pain",
+    "joints": "joint pain",
+    "neck": "neck pain",
+    "shoulder": "shoulder pain",
+    "skin": "rash",
+}
+
+PAIN_WORDS = r"(?:hurts|hurting|hurt|aches|aching|ache|pains|paining|pain|is sore|are sore|sore|dard)"
+# A negation cue up to two words before the match, within the same clause.
+NEGATION_RE = re.compile(
+    r"\b(?:no|not|without|never|don'?t have|do not have|didn'?t have|free of)\s+"
+    r"(?:(?!but\b|and\b|though\b)\w+\s+){0,2}$"
+)
+
+CONF_LEXICON = 0.95
+CONF_TEMPLATE = 0.9
+CONF_MULTIPLE = 0.8
+CONF_GENERIC = 0.4
+
+
+def _build_lexicon() -> dict:
+    lexicon = {}
+    for key in FALLBACK_SPECIALIST_RULES:
+        canonical = FALLBACK_KEY_CANONICAL.get(key, key)
+        if canonical:
+            lexicon[key] = canonical
+    for canonical, phrases in SYMPTOM_SYNONYMS.items():
+        for phrase in phrases:
+            lexicon[phrase] = canonical
+    for term in GENERIC_TERMS:
+        lexicon.setdefault(term, term)
+    return lexicon
+
+
+def _alternation(phrases) -> str:
+    # Longest first so "chest pain" wins over "pain" at the same position.
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+LEXICON = _build_lexicon()
+LEXICON_RE = re.compile(rf"(?<![a-z])({_alternation(LEXICON)})(?![a-z])")
+_parts = _alternation(BODY_PARTS)
+TEMPLATE_RES = [
+    re.compile(rf"(?<![a-z])(?:my |the )?(?P<part>{_parts})\s+(?:is |are |has been |have been |keeps |keep )?{PAIN_WORDS}(?![a-z])"),
+    re.compile(rf"(?<![a-z]){PAIN_WORDS}\s+(?:in|on)\s+(?:my |the )?(?P<part>{_parts})(?![a-z])"),
+    re.compile(rf"(?<![a-z])(?P<part>{_parts})\s*(?:ache|pain)(?![a-z])"),
+]
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[.,;!?]+", " , ", text)  # keep clause breaks for the negation check
+    text = re.sub(r"[^a-z0-9', ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _negated(text: str, start: int) -> bool:
+    return bool(NEGATION_RE.search(text[max(0, start - 30):start]))
+
+
+def extract_keyword(text: str):
+    """
+    Return `(keyword, confidence)` for the first symptom mentioned in `text`,
+    or `(None, 0.0)` when nothing in the lexicon matches.
+    """
+    text = _normalize(text)
+    found = []  # (position, canonical, confidence)
+    for m in LEXICON_RE.finditer(text):
+        if not _negated(text, m.start()):
+            found.append((m.start(), LEXICON[m.group(1)], CONF_LEXICON))
+    for pattern in TEMPLATE_RES:
+        for m in pattern.finditer(text):
+            if not _negated(text, m.start()):
+                found.append((m.start(), BODY_PARTS[m.group("part")], CONF_TEMPLATE))
+    if not found:
+        return None, 0.0
+
+    specific = [f for f in found if f[1] not in GENERIC_TERMS]
+    if not specific:
+        return min(found)[1], CONF_GENERIC
+    specific.sort()
+    keyword, confidence = specific[0][1], specific[0][2]
+    if len({canonical for _, canonical, _ in specific}) > 1:
+        confidence = min(confidence, CONF_MULTIPLE)
+    return keyword, confidence
+
+
+FAST_PATH_LOOKUPS = Counter(
+    "keyword_fast_path_total", "Clinical keyword lookups answered locally vs. sent to the LLM", ["result"]
+)
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def match_keyword(text: str, min_confidence: float = MIN_CONFIDENCE):
+    """Keyword for `text` if the local extractor is confident, else None."""
+    global _hits, _misses
+    keyword, confidence = extract_keyword(text)
+    hit = keyword is not None and confidence >= min_confidence
+    with _lock:
+        if hit:
+            _hits += 1
+        else:
+            _misses += 1
+    FAST_PATH_LOOKUPS.inc(result="local" if hit else "llm")
+    return keyword if hit else None
+
+
+def stats() -> dict:
+    total = _hits + _misses
+    return {
+        "local": _hits,
+        "llm": _misses,
+        "hit_rate": round(_hits / total, 3) if total else 0.0,
+    }
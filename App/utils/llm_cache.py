@@ -0,0 +1,187 @@
+"""
+Response cache for LLM calls.
+
+Entries are keyed on (model, role_prompt, prompt) and only stored for calls
+that pass a `prompt_class`, since free-form conversation prompts never repeat.
+Each class gets its own TTL and hit/miss counters. Lookups go through the
+tiers in order (memory LRU first, then the optional SQLite tier) and a hit in
+a slower tier is promoted to the faster ones.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from dotenv import load_dotenv
+
+from utils.metrics import CallbackMetric
+
+load_dotenv()
+
+DAY = 24 * 3600
+
+# TTL in seconds per prompt class. Facts about a condition barely change, the
+# phrasing wrappers are refreshed more often so answers don't feel canned.
+PROMPT_CLASS_TTLS = {
+    "keyword": 7 * DAY,
+    "severity": 7 * DAY,
+    "explain": DAY,
+    "remedy": DAY,
+    "wrapper": 6 * 3600,
+}
+DEFAULT_TTL = 3600
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")  # e.g. "ruralbot.db" to persist across restarts
+LLM_CACHE_PRUNE_EVERY = int(os.getenv("LLM_CACHE_PRUNE_EVERY", "1000"))  # SQLite writes between expiry sweeps
+
+
+class LRUTier:
+    """In-memory tier with LRU eviction."""
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str, now: float):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value, expires_at
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteTier:
+    """
+    Persistent tier stored in a table of an existing SQLite file. Expired rows
+    are deleted when the tier is opened and every `prune_every` writes.
+    """
+
+    def __init__(self, path: str, table: str = "llm_cache", prune_every: int = LLM_CACHE_PRUNE_EVERY):
+        self.table = table
+        self.prune_every = prune_every
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, response TEXT, expires_at REAL)"
+            )
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+        self.prune()
+
+    def get(self, key: str, now: float):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT response, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self.writes += 1
+            if self.prune_every and self.writes % self.prune_every == 0:
+                self.conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def prune(self, now: float = None):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now or time.time(),))
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {self.table}")
+
+
+class ResponseCache:
+    def __init__(self, tiers, ttls=None, default_ttl: float = DEFAULT_TTL):
+        self.tiers = list(tiers)
+        self.ttls = dict(PROMPT_CLASS_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    @staticmethod
+    def make_key(model: str, role_prompt: str, prompt: str) -> str:
+        raw = "\x00".join((model, role_prompt, prompt))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, role_prompt: str, prompt: str, prompt_class: str):
+        key = self.make_key(model, role_prompt, prompt)
+        now = time.time()
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key, now)
+            if entry is not None:
+                value, expires_at = entry
+                for faster in self.tiers[:i]:
+                    faster.set(key, value, expires_at)
+                self.hits[prompt_class] += 1
+                return value
+        self.misses[prompt_class] += 1
+        return None
+
+    def set(self, model: str, role_prompt: str, prompt: str, prompt_class: str, value: str):
+        key = self.make_key(model, role_prompt, prompt)
+        expires_at = time.time() + self.ttls.get(prompt_class, self.default_ttl)
+        for tier in self.tiers:
+            tier.set(key, value, expires_at)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> dict:
+        classes = set(self.hits) | set(self.misses)
+        return {
+            cls: {"hits": self.hits[cls], "misses": self.misses[cls]}
+            for cls in sorted(classes)
+        }
+
+
+def build_default_cache() -> ResponseCache:
+    tiers = [LRUTier(LLM_CACHE_SIZE)]
+    if LLM_CACHE_DB:
+        tiers.append(SQLiteTier(LLM_CACHE_DB))
+    return ResponseCache(tiers)
+
+
+response_cache = build_default_cache()
+
+
+def _cache_samples():
+    samples = {}
+    for cls, counts in response_cache.stats().items():
+        samples[(cls, "hit")] = counts["hits"]
+        samples[(cls, "miss")] = counts["misses"]
+    return samples
+
+
+CallbackMetric(
+    "llm_cache_lookups_total", "LLM response cache lookups by prompt class",
+    ["prompt_class", "result"], _cache_samples, kind="counter",
+)
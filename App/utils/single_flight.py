@@ -0,0 +1,123 @@
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same key while a call for it is already in
+flight, they wait on that call's result instead of issuing their own. Works
+for both async callers (`do`) and sync callers running in threads
+(`do_sync`), which share the same in-flight table.
+
+Only the leader's own errors are shared. If the leader is cancelled (its
+client disconnected, it lost a hedge race), the followers are not failed with
+it: the first of them to notice takes over and makes the call itself.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from utils.metrics import CallbackMetric
+
+_registry = {}
+
+
+class _LeaderGone(Exception):
+    """The leader was cancelled before finishing; followers should retry."""
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.calls = 0      # calls that actually went upstream
+        self.coalesced = 0  # calls answered by someone else's in-flight request
+        _registry[name] = self
+
+    def _join(self, key, retry=False):
+        with self.lock:
+            fut = self.inflight.get(key)
+            if fut is not None:
+                self.coalesced += not retry
+                return fut, False
+            fut = Future()
+            self.inflight[key] = fut
+            self.calls += 1
+            return fut, True
+
+    def _finish(self, key, fut, result=None, error=None):
+        with self.lock:
+            if self.inflight.get(key) is fut:
+                del self.inflight[key]
+        if fut.done():
+            return
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    async def do(self, key, fn):
+        """Run `await fn()` once for every concurrent caller with the same key."""
+        retry = False
+        while True:
+            fut, leader = self._join(key, retry)
+            if leader:
+                break
+            try:
+                # Shielded so a cancelled follower doesn't cancel the shared future.
+                return await asyncio.shield(asyncio.wrap_future(fut))
+            except _LeaderGone:
+                retry = True
+        try:
+            result = await fn()
+        except Exception as e:
+            self._finish(key, fut, error=e)
+            raise
+        except BaseException:
+            # Cancelled: hand the call over to a follower instead of failing them all.
+            self._finish(key, fut, error=_LeaderGone())
+            raise
+        self._finish(key, fut, result=result)
+        return result
+
+    def do_sync(self, key, fn):
+        """Blocking version of `do` for code running in threads."""
+        retry = False
+        while True:
+            fut, leader = self._join(key, retry)
+            if leader:
+                break
+            try:
+                return fut.result()
+            except _LeaderGone:
+                retry = True
+        try:
+            result = fn()
+        except Exception as e:
+            self._finish(key, fut, error=e)
+            raise
+        except BaseException:
+            self._finish(key, fut, error=_LeaderGone())
+            raise
+        self._finish(key, fut, result=result)
+        return result
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self.inflight)}
+
+
+def stats() -> dict:
+    """Counters for every single-flight group, keyed by group name."""
+    return {name: flight.stats() for name, flight in _registry.items()}
+
+
+def _flight_samples():
+    samples = {}
+    for name, flight in _registry.items():
+        samples[(name, "upstream")] = flight.calls
+        samples[(name, "coalesced")] = flight.coalesced
+    return samples
+
+
+CallbackMetric(
+    "single_flight_calls_total", "Calls that went upstream vs. were served by an in-flight duplicate",
+    ["group", "result"], _flight_samples, kind="counter",
+)
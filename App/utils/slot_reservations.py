@@ -0,0 +1,102 @@
+"""
+Atomic appointment slot reservations.
+
+Each booked slot has one document in `slot_reservations` whose `_id` is the
+slot key (doctor contact, date, time). Claiming a slot is a single
+`insert_one`, and MongoDB's unique `_id` index guarantees only one of any
+number of concurrent claims succeeds. The losers get `SlotTaken` straight
+away, which the routes turn into a 409. A claim is released when its
+appointment is cancelled, rejected or moved to another slot.
+
+Sync helpers are for the booking graph, which runs in a worker thread; the
+`_async` ones are for route handlers.
+"""
+import re
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+SLOT_COLLECTION = "slot_reservations"
+
+# Statuses set from the doctor dashboard after which an appointment no longer holds its slot.
+CLOSED_STATUS_RE = re.compile(r"^\s*(cancel|reject|declin|complet|done)", re.I)
+
+
+class SlotTaken(Exception):
+    pass
+
+
+def is_closed(status) -> bool:
+    return bool(CLOSED_STATUS_RE.match(status or ""))
+
+
+def slot_key(contact: str, doctor_name: str, date: str, time: str) -> str:
+    # Contact identifies a doctor; the name is only a fallback for old records without one.
+    doctor = (contact or "").strip() or (doctor_name or "").strip().lower()
+    return f"{doctor}|{(date or '').strip()}|{(time or '').strip()}"
+
+
+def _reservation(appointment_id, contact, doctor_name, date, time) -> dict:
+    return {
+        "_id": slot_key(contact, doctor_name, date, time),
+        "appointment_id": appointment_id,
+        "contact": contact,
+        "doctor_name": doctor_name,
+        "date": date,
+        "time": time,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+def claim_slot(reservations, appointment_id, contact, doctor_name, date, time):
+    """Reserve the slot for `appointment_id`, or raise `SlotTaken`. Rebooking its own slot is a no-op."""
+    try:
+        reservations.insert_one(_reservation(appointment_id, contact, doctor_name, date, time))
+    except DuplicateKeyError:
+        key = slot_key(contact, doctor_name, date, time)
+        if reservations.count_documents({"_id": key, "appointment_id": appointment_id}, limit=1):
+            return
+        raise SlotTaken(key)
+
+
+async def claim_slot_async(reservations, appointment_id, contact, doctor_name, date, time):
+    """Reserve the slot for `appointment_id`, or raise `SlotTaken`. Rebooking its own slot is a no-op."""
+    try:
+        await reservations.insert_one(_reservation(appointment_id, contact, doctor_name, date, time))
+    except DuplicateKeyError:
+        key = slot_key(contact, doctor_name, date, time)
+        if await reservations.count_documents({"_id": key, "appointment_id": appointment_id}, limit=1):
+            return
+        raise SlotTaken(key)
+
+
+def release_slot(reservations, appointment: dict):
+    reservations.delete_one({
+        "_id": slot_key(appointment.get("contact"), appointment.get("doctor_name"), appointment.get("date"), appointment.get("time")),
+        "appointment_id": appointment["_id"],
+    })
+
+
+async def release_slot_async(reservations, appointment: dict):
+    await reservations.delete_one({
+        "_id": slot_key(appointment.get("contact"), appointment.get("doctor_name"), appointment.get("date"), appointment.get("time")),
+        "appointment_id": appointment["_id"],
+    })
+
+
+def backfill_reservations(appointments, reservations) -> int:
+    """Reserve the slots of open appointments booked before reservations existed; safe to rerun."""
+    docs = [
+        _reservation(appt["_id"], appt.get("contact"), appt.get("doctor_name"), appt.get("date"), appt.get("time"))
+        for appt in appointments.find(
+            {"date": {"$nin": [None, ""]}, "time": {"$nin": [None, ""]}, "status": {"$not": CLOSED_STATUS_RE}},
+            {"contact": 1, "doctor_name": 1, "date": 1, "time": 1},
+        )
+    ]
+    if not docs:
+        return 0
+    try:
+        return len(reservations.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Slots that already have a reservation (or duplicate legacy bookings) are expected.
+        return e.details.get("nInserted", 0)
@@ -0,0 +1,56 @@
+"""
+Server-Sent Events helpers for the streaming chat routes.
+
+A streaming route wraps the same coroutine its JSON twin uses, passing an
+`emit` callback. Every `await emit(text)` becomes a `token` event; the
+coroutine's return value is sent as a final `done` event carrying the
+complete JSON payload, which clients should treat as authoritative (it may
+differ from the concatenated tokens, e.g. when a duplicate answer is
+swapped for a canned one).
+"""
+import asyncio
+import json
+
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # keep nginx from buffering the stream
+}
+
+
+def format_event(event: str, data) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def _relay(run):
+    queue = asyncio.Queue()
+
+    async def emit(text: str):
+        if text:
+            await queue.put(("token", {"text": text}))
+
+    async def runner():
+        try:
+            result = await run(emit)
+            await queue.put(("done", result))
+        except Exception as e:
+            await queue.put(("error", {"error": str(e)}))
+
+    task = asyncio.create_task(runner())
+    try:
+        while True:
+            event, data = await queue.get()
+            yield format_event(event, data)
+            if event in ("done", "error"):
+                break
+    finally:
+        # Client went away mid-stream: stop the work behind it.
+        if not task.done():
+            task.cancel()
+
+
+def sse_response(run) -> StreamingResponse:
+    """Stream `await run(emit)` to the client as Server-Sent Events."""
+    return StreamingResponse(_relay(run), media_type="text/event-stream", headers=SSE_HEADERS)